@@ -29,6 +29,7 @@ INSTALLED_APPS = [
     'payments',
     'chatbot',
     'resources',
+    'jobs',
 ]
 
 MIDDLEWARE = [
@@ -109,6 +110,11 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Cytology uploads: thumbnails are made by the run_jobs worker
+CYTOLOGY_MAX_UPLOAD_MB = int(os.environ.get('CYTOLOGY_MAX_UPLOAD_MB', '25'))
+CYTOLOGY_THUMBNAIL_SIZE = int(os.environ.get('CYTOLOGY_THUMBNAIL_SIZE', '256'))
+CYTOLOGY_THUMBNAIL_QUALITY = int(os.environ.get('CYTOLOGY_THUMBNAIL_QUALITY', '80'))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Custom User Model
@@ -230,6 +236,85 @@ LOGGING = {
 # AI Model Configuration
 AI_MODEL_PATH = os.path.join(BASE_DIR, 'ai_models')
 RISK_PREDICTION_MODEL = 'model.pkl'
+# Load the model when the WSGI app is imported (e.g. in a gunicorn --preload master)
+# so forked workers share its memory pages instead of each unpickling a copy
+AI_MODEL_PRELOAD = os.environ.get('AI_MODEL_PRELOAD', 'False').lower() == 'true'
+# Seconds between checks of the model registry for a new model (-1 disables hot reload)
+AI_MODEL_RELOAD_INTERVAL = float(os.environ.get('AI_MODEL_RELOAD_INTERVAL', '30'))
+RISK_PREDICTION_MAX_BATCH_SIZE = int(os.environ.get('RISK_PREDICTION_MAX_BATCH_SIZE', '500'))
+# Coalesce concurrent single predictions into batched model calls
+RISK_PREDICTION_MICROBATCH = os.environ.get('RISK_PREDICTION_MICROBATCH', 'False').lower() == 'true'
+RISK_PREDICTION_MICROBATCH_MAX_SIZE = int(os.environ.get('RISK_PREDICTION_MICROBATCH_MAX_SIZE', '32'))
+RISK_PREDICTION_MICROBATCH_MAX_WAIT_MS = float(os.environ.get('RISK_PREDICTION_MICROBATCH_MAX_WAIT_MS', '5'))
+# A request waiting longer than this on the batcher is scored directly instead
+RISK_PREDICTION_MICROBATCH_TIMEOUT_MS = float(os.environ.get('RISK_PREDICTION_MICROBATCH_TIMEOUT_MS', '2000'))
+# Cache full prediction payloads keyed by canonical input and model version.
+# Set RISK_PREDICTION_CACHE_ALIAS to a CACHES alias to share entries across workers.
+RISK_PREDICTION_CACHE = os.environ.get('RISK_PREDICTION_CACHE', 'False').lower() == 'true'
+RISK_PREDICTION_CACHE_SIZE = int(os.environ.get('RISK_PREDICTION_CACHE_SIZE', '10000'))
+RISK_PREDICTION_CACHE_TTL = int(os.environ.get('RISK_PREDICTION_CACHE_TTL', '3600'))
+RISK_PREDICTION_CACHE_ALIAS = os.environ.get('RISK_PREDICTION_CACHE_ALIAS') or None
+# Memoize predictions for the finite input space in an in-process table
+RISK_PREDICTION_LOOKUP_TABLE = os.environ.get('RISK_PREDICTION_LOOKUP_TABLE', 'False').lower() == 'true'
+RISK_PREDICTION_LOOKUP_TABLE_SIZE = int(os.environ.get('RISK_PREDICTION_LOOKUP_TABLE_SIZE', '200000'))
+
+# Patient search
+PATIENT_SEARCH_DEFAULT_LIMIT = int(os.environ.get('PATIENT_SEARCH_DEFAULT_LIMIT', '20'))
+PATIENT_SEARCH_MAX_RESULTS = int(os.environ.get('PATIENT_SEARCH_MAX_RESULTS', '500'))
+
+# Follow-up work queue
+FOLLOW_UP_LEASE_MINUTES = int(os.environ.get('FOLLOW_UP_LEASE_MINUTES', '30'))
+FOLLOW_UP_MAX_LEASE_COUNT = int(os.environ.get('FOLLOW_UP_MAX_LEASE_COUNT', '20'))
+
+# Screening data export
+SCREENING_EXPORT_CHUNK_SIZE = int(os.environ.get('SCREENING_EXPORT_CHUNK_SIZE', '5000'))
+
+# Background jobs, run by `manage.py run_jobs`
+JOBS_RUN_INLINE = os.environ.get('JOBS_RUN_INLINE', 'False').lower() == 'true'
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', '5'))
+JOBS_RETRY_BASE_SECONDS = int(os.environ.get('JOBS_RETRY_BASE_SECONDS', '30'))
+JOBS_RETRY_MAX_SECONDS = int(os.environ.get('JOBS_RETRY_MAX_SECONDS', '3600'))
+# Must exceed the longest job, or a slow job is handed to a second worker
+JOBS_LEASE_SECONDS = int(os.environ.get('JOBS_LEASE_SECONDS', '600'))
+JOBS_WORKER_CONCURRENCY = int(os.environ.get('JOBS_WORKER_CONCURRENCY', '4'))
+JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', '2'))
+JOBS_RETAIN_DAYS = int(os.environ.get('JOBS_RETAIN_DAYS', '7'))
+
+# Offline sync
+SYNC_MAX_BATCH_SIZE = int(os.environ.get('SYNC_MAX_BATCH_SIZE', '2000'))
+SYNC_CHANGES_PAGE_SIZE = int(os.environ.get('SYNC_CHANGES_PAGE_SIZE', '200'))
+SYNC_CHANGES_MAX_PAGE_SIZE = int(os.environ.get('SYNC_CHANGES_MAX_PAGE_SIZE', '1000'))
+SYNC_CHANGES_LAG_SECONDS = float(os.environ.get('SYNC_CHANGES_LAG_SECONDS', '2'))
+# Tombstones older than this are removed by prune_sync_tombstones; a client whose
+# watermark is older has to sync again from the start
+SYNC_TOMBSTONE_RETAIN_DAYS = int(os.environ.get('SYNC_TOMBSTONE_RETAIN_DAYS', '90'))
+
+# Chatbot: FAISS indexes written by `manage.py build_chatbot_index`
+CHATBOT_INDEX_DIR = os.environ.get('CHATBOT_INDEX_DIR', os.path.join(BASE_DIR, 'chatbot_index'))
+CHATBOT_EMBEDDING_CACHE_PATH = os.environ.get(
+    'CHATBOT_EMBEDDING_CACHE_PATH', os.path.join(CHATBOT_INDEX_DIR, 'embedding_cache.sqlite3')
+)
+CHATBOT_EMBEDDING_BATCH_SIZE = int(os.environ.get('CHATBOT_EMBEDDING_BATCH_SIZE', '64'))
+CHATBOT_EMBEDDING_CONCURRENCY = int(os.environ.get('CHATBOT_EMBEDDING_CONCURRENCY', '4'))
+CHATBOT_EMBEDDING_TIMEOUT = float(os.environ.get('CHATBOT_EMBEDDING_TIMEOUT', '30'))
+# 'azure' or 'local' (hashed character n-grams, no network); each needs its own built index
+CHATBOT_EMBEDDING_BACKEND = os.environ.get('CHATBOT_EMBEDDING_BACKEND', 'azure')
+CHATBOT_LOCAL_EMBEDDING_DIM = int(os.environ.get('CHATBOT_LOCAL_EMBEDDING_DIM', '2048'))
+# 'azure' or 'stub' (echoes the retrieved context); the fallback answers when Azure chat fails
+CHATBOT_CHAT_BACKEND = os.environ.get('CHATBOT_CHAT_BACKEND', 'azure')
+CHATBOT_CHAT_FALLBACK = os.environ.get('CHATBOT_CHAT_FALLBACK', '')
+# Answer price, stock and contact lookups straight from the data sheets, skipping search and the LLM
+CHATBOT_TABLE_ROUTING = os.environ.get('CHATBOT_TABLE_ROUTING', 'True').lower() == 'true'
+# Reuse answers to repeated questions: exact match on the normalised text, then nearest
+# cached query embedding within CHATBOT_ANSWER_CACHE_MAX_DISTANCE for the embedding backend
+# (cosine; 0 turns it off). Off for local: hashed n-grams put "stage I" next to "stage II"
+CHATBOT_ANSWER_CACHE = os.environ.get('CHATBOT_ANSWER_CACHE', 'True').lower() == 'true'
+CHATBOT_ANSWER_CACHE_SIZE = int(os.environ.get('CHATBOT_ANSWER_CACHE_SIZE', '1000'))
+CHATBOT_ANSWER_CACHE_TTL = int(os.environ.get('CHATBOT_ANSWER_CACHE_TTL', '3600'))
+CHATBOT_ANSWER_CACHE_MAX_DISTANCE = {
+    'azure': float(os.environ.get('CHATBOT_ANSWER_CACHE_MAX_DISTANCE_AZURE', '0.05')),
+    'local': float(os.environ.get('CHATBOT_ANSWER_CACHE_MAX_DISTANCE_LOCAL', '0')),
+}
 
 # Payment Gateway Configuration
 PAYMENT_GATEWAY = {
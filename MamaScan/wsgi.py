@@ -7,10 +7,21 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
+import gc
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MamaScan.settings')
 
 application = get_wsgi_application()
+
+if settings.AI_MODEL_PRELOAD:
+    from screening.ai_service import risk_predictor
+
+    risk_predictor.ensure_loaded()
+    # Move everything loaded so far out of the collector's generations so
+    # forked workers don't dirty the shared copy-on-write pages during GC
+    gc.freeze()
+
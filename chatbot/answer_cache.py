@@ -0,0 +1,186 @@
+# chatbot/answer_cache.py
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Case, spacing and punctuation folded, so "What is HPV?" and "what is hpv" share an entry"""
+    return ' '.join(re.findall(r'\w+', str(query).lower()))
+
+
+# Words whose next word is a label, as in "stage II", "CIN 3" or "HPV type 16"
+LABEL_WORDS = frozenset({'stage', 'grade', 'cin', 'type', 'level', 'phase'})
+
+
+def query_markers(key: str) -> FrozenSet[str]:
+    """Numbers and stage-like labels of a normalised query.
+
+    They change the answer while barely moving the embedding, so a semantic
+    hit must carry the same ones.
+    """
+    words = key.split()
+    return frozenset(
+        word for position, word in enumerate(words)
+        if any(c.isdigit() for c in word) or (position and words[position - 1] in LABEL_WORDS)
+    )
+
+
+class AnswerCache:
+    """In-process LRU of chatbot answers with a TTL, looked up two ways.
+
+    get() matches the normalised query exactly, before any embedding call.
+    get_similar() compares a query embedding against the cached ones and
+    reuses the answer of the nearest within max_distance (cosine distance)
+    whose query has the same numbers and stage labels.
+    Entries belong to one index version; a lookup or store with another
+    version empties the cache.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, max_distance: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.version = None
+        # key -> (expires_at, answer, slot); slot is the entry's row in _vectors
+        self._entries = OrderedDict()
+        self._vectors: Optional[np.ndarray] = None
+        self._live = np.zeros(max_entries, dtype=bool)
+        self._slot_keys = [None] * max_entries
+        self._slot_markers = [None] * max_entries
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _use_version(self, version) -> None:
+        if version != self.version:
+            self._clear()
+            self.version = version
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._live[:] = False
+        self._slot_keys = [None] * self.max_entries
+        self._slot_markers = [None] * self.max_entries
+        self._free = list(range(self.max_entries - 1, -1, -1))
+
+    def _remove(self, key: str) -> None:
+        _, _, slot = self._entries.pop(key)
+        self._live[slot] = False
+        self._slot_keys[slot] = None
+        self._slot_markers[slot] = None
+        self._free.append(slot)
+
+    def _fresh(self, key: str, now: float) -> Optional[str]:
+        expires_at, answer, _ = self._entries[key]
+        if expires_at <= now:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return answer
+
+    def get(self, query: str, version) -> Optional[str]:
+        key = normalize_query(query)
+        with self._lock:
+            self._use_version(version)
+            answer = self._fresh(key, time.monotonic()) if key in self._entries else None
+            if answer is not None:
+                self.hits += 1
+            return answer
+
+    def get_similar(self, query: str, vector, version) -> Optional[str]:
+        """Answer cached for the nearest query embedding, if within max_distance"""
+        markers = query_markers(normalize_query(query))
+        vector = _unit(vector)
+        with self._lock:
+            self._use_version(version)
+            answer = None
+            if (self.max_distance > 0 and self._vectors is not None
+                    and self._vectors.shape[1] == len(vector)):
+                # Only entries with the same numbers and stage labels are candidates
+                slots = [slot for slot in np.flatnonzero(self._live) if self._slot_markers[slot] == markers]
+                if slots:
+                    similarities = self._vectors[slots] @ vector
+                    best = int(np.argmax(similarities))
+                    if 1.0 - similarities[best] <= self.max_distance:
+                        answer = self._fresh(self._slot_keys[slots[best]], time.monotonic())
+            if answer is None:
+                self.misses += 1
+            else:
+                self.semantic_hits += 1
+            return answer
+
+    def set(self, query: str, vector, answer: str, version) -> None:
+        key = normalize_query(query)
+        vector = _unit(vector)
+        with self._lock:
+            self._use_version(version)
+            if self._vectors is None or self._vectors.shape[1] != len(vector):
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+                self._clear()
+            if key in self._entries:
+                self._remove(key)
+            while not self._free:
+                self._remove(next(iter(self._entries)))
+            slot = self._free.pop()
+            self._vectors[slot] = vector
+            self._live[slot] = True
+            self._slot_keys[slot] = key
+            self._slot_markers[slot] = query_markers(key)
+            self._entries[key] = (time.monotonic() + self.ttl, answer, slot)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'max_distance': self.max_distance,
+                'index_version': self.version,
+                'hits': self.hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Process-wide cache, or None when CHATBOT_ANSWER_CACHE is off.
+
+    The semantic threshold is the one set for the embedding backend in use.
+    """
+    global _cache
+    from django.conf import settings
+
+    if not settings.CHATBOT_ANSWER_CACHE:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnswerCache(
+                    settings.CHATBOT_ANSWER_CACHE_SIZE,
+                    settings.CHATBOT_ANSWER_CACHE_TTL,
+                    settings.CHATBOT_ANSWER_CACHE_MAX_DISTANCE.get(settings.CHATBOT_EMBEDDING_BACKEND, 0.0),
+                )
+    return _cache
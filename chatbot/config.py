@@ -0,0 +1,18 @@
+# chatbot/config.py
+import os
+
+# Embedding model credentials (for vector search)
+EMBED_ENDPOINT = os.getenv("AZURE_EMBED_ENDPOINT")
+EMBED_KEY = os.getenv("AZURE_EMBED_KEY")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
+EMBEDDING_API_VERSION = os.getenv("EMBEDDING_API_VERSION")
+
+# Chat model credentials (for completions)
+CHAT_ENDPOINT = os.getenv("AZURE_CHAT_ENDPOINT")
+CHAT_KEY = os.getenv("AZURE_CHAT_KEY")
+CHAT_DEPLOYMENT = os.getenv("CHAT_MODEL")
+CHAT_API_VERSION = os.getenv("API_VERSION")
+
+# Vector size of the Azure embedding model; the local backend uses CHATBOT_LOCAL_EMBEDDING_DIM
+INDEX_DIM = 1536
+JSON_PATH = os.path.join(os.path.dirname(__file__), "data", "clinical_data.json")
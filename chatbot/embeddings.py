@@ -0,0 +1,216 @@
+# chatbot/embeddings.py
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from django.core.exceptions import ImproperlyConfigured
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingUnavailable(Exception):
+    """The embedding backend could not embed the texts, e.g. during an outage"""
+
+
+def embedding_key(text: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk embedding store keyed by SHA-256 of model name and text.
+
+    Vectors are kept as raw float32 blobs in SQLite, so a rebuild after
+    editing a few records only embeds the edited ones.
+    """
+    # Stay under SQLite's bound-parameter limit
+    LOOKUP_CHUNK = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL)'
+        )
+        self._connection.commit()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), self.LOOKUP_CHUNK):
+                chunk = keys[start:start + self.LOOKUP_CHUNK]
+                rows = self._connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)',
+                [(key, len(vector), np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class EmbeddingBackend:
+    """Turns texts into float32 vectors for the FAISS index.
+
+    `name` identifies the vector space: an index built with one backend can
+    only be searched with query vectors from the same one.
+    """
+    name = ''
+    dim = 0
+    requests_made = 0
+
+    def embed(self, texts: Sequence[str], store: bool = True) -> np.ndarray:
+        """One row per text; store=False keeps one-off texts such as user queries out of any cache"""
+        raise NotImplementedError
+
+
+class LocalHashingEmbedder(EmbeddingBackend):
+    """Character n-gram vectors from scikit-learn's HashingVectorizer.
+
+    Runs on the CPU with no network and nothing to download or fit, so the
+    retrieval path works on air-gapped machines and during Azure outages.
+    Rows are L2-normalised, so the L2 index ranks them by cosine similarity.
+    """
+
+    def __init__(self, dim: int = 2048, ngram_range=(3, 5)):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.dim = dim
+        self.name = f"local-char-{ngram_range[0]}-{ngram_range[1]}"
+        self.vectorizer = HashingVectorizer(
+            analyzer='char_wb', ngram_range=ngram_range, n_features=dim,
+            alternate_sign=False, norm=None, lowercase=True
+        )
+
+    def embed(self, texts: Sequence[str], store: bool = True) -> np.ndarray:
+        counts = self.vectorizer.transform(list(texts)).astype(np.float32)
+        # Damp repeated n-grams, then normalise each row
+        counts.data = np.log1p(counts.data)
+        vectors = counts.toarray()
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class AzureEmbeddingClient(EmbeddingBackend):
+    """Azure OpenAI embeddings, many inputs per request over pooled connections.
+
+    Texts are de-duplicated and looked up in the cache first; the misses
+    are sent in batches of batch_size, at most max_workers at a time, and
+    stored unless store=False.
+    Throttling (429) and server errors are retried with backoff; requests
+    that still fail raise EmbeddingUnavailable.
+    """
+
+    def __init__(self, endpoint: str, key: str, model: str, api_version: str, dim: int,
+                 cache: Optional[EmbeddingCache] = None, batch_size: int = 64,
+                 max_workers: int = 4, timeout: float = 30):
+        self.url = f"{endpoint}/openai/deployments/{model}/embeddings?api-version={api_version}"
+        self.model = model
+        self.name = f"azure:{model}"
+        self.dim = dim
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json", "api-key": key or ''})
+        retry = Retry(
+            total=5, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=None, respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.requests_made = 0
+
+    def _post_batch(self, texts: List[str]) -> List[np.ndarray]:
+        response = self.session.post(self.url, json={"input": texts}, timeout=self.timeout)
+        response.raise_for_status()
+        # Results carry their input position; do not rely on response order
+        data = sorted(response.json()['data'], key=lambda item: item['index'])
+        return [np.asarray(item['embedding'], dtype=np.float32) for item in data]
+
+    def embed(self, texts: Sequence[str], store: bool = True) -> np.ndarray:
+        """float32 matrix with one row per text, in input order"""
+        keys = [embedding_key(text, self.model) for text in texts]
+        vectors = self.cache.get_many(list(set(keys))) if self.cache else {}
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            missing_keys = list(missing)
+            batches = [
+                missing_keys[start:start + self.batch_size]
+                for start in range(0, len(missing_keys), self.batch_size)
+            ]
+            try:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+                    results = pool.map(lambda batch: self._post_batch([missing[key] for key in batch]), batches)
+                    fetched = {
+                        key: vector
+                        for batch, batch_vectors in zip(batches, results)
+                        for key, vector in zip(batch, batch_vectors)
+                    }
+            except (requests.RequestException, KeyError, ValueError) as e:
+                raise EmbeddingUnavailable(str(e)) from e
+            self.requests_made += len(batches)
+            logger.info(f"Embedded {len(fetched)} texts in {len(batches)} requests, {len(keys) - len(missing)} cached")
+            if self.cache and store:
+                self.cache.put_many(fetched)
+            vectors.update(fetched)
+
+        if not keys:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.vstack([vectors[key] for key in keys])
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_embedding_client() -> EmbeddingBackend:
+    """Process-wide backend chosen by CHATBOT_EMBEDDING_BACKEND, so connections and cache are shared"""
+    global _client
+    if _client is None:
+        from django.conf import settings
+        from .config import EMBED_ENDPOINT, EMBED_KEY, EMBEDDING_MODEL, EMBEDDING_API_VERSION, INDEX_DIM
+
+        with _client_lock:
+            if _client is None:
+                if settings.CHATBOT_EMBEDDING_BACKEND == 'local':
+                    _client = LocalHashingEmbedder(settings.CHATBOT_LOCAL_EMBEDDING_DIM)
+                elif settings.CHATBOT_EMBEDDING_BACKEND == 'azure':
+                    if not (EMBED_ENDPOINT and EMBEDDING_MODEL):
+                        raise ImproperlyConfigured("AZURE_EMBED_ENDPOINT and EMBEDDING_MODEL must be set")
+                    _client = AzureEmbeddingClient(
+                        EMBED_ENDPOINT, EMBED_KEY, EMBEDDING_MODEL, EMBEDDING_API_VERSION, INDEX_DIM,
+                        cache=EmbeddingCache(settings.CHATBOT_EMBEDDING_CACHE_PATH),
+                        batch_size=settings.CHATBOT_EMBEDDING_BATCH_SIZE,
+                        max_workers=settings.CHATBOT_EMBEDDING_CONCURRENCY,
+                        timeout=settings.CHATBOT_EMBEDDING_TIMEOUT,
+                    )
+                else:
+                    raise ImproperlyConfigured(f"Unknown CHATBOT_EMBEDDING_BACKEND {settings.CHATBOT_EMBEDDING_BACKEND!r}")
+    return _client
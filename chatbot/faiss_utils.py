@@ -49,14 +49,22 @@
 
 import faiss
 import numpy as np
+import hashlib
 import json
-import requests
+import os
+import shutil
+import tempfile
 from django.conf import settings
 
+INDEX_FILE = 'index.faiss'
+TEXTS_FILE = 'texts.json'
+MANIFEST_FILE = 'manifest.json'
+
 class FaissIndex:
     def __init__(self, dim):
         self.index = faiss.IndexFlatL2(dim)
         self.texts = []
+        self.manifest = {}
 
     def add(self, embeddings, texts):
         self.index.add(np.array(embeddings).astype('float32'))
@@ -64,9 +72,57 @@ class FaissIndex:
 
     def search(self, query_embedding, top_k=3):
         D, I = self.index.search(np.array([query_embedding]).astype('float32'), top_k)
-        return [self.texts[i] for i in I[0]]
-
-def load_data_and_build_index(json_path, azure_endpoint, azure_key, embedding_model, dim):
+        return [self.texts[i] for i in I[0] if i >= 0]
+
+    def save(self, directory, manifest):
+        """Write the index, its aligned texts and a manifest; the directory appears complete or not at all"""
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=parent, prefix='.building-')
+        try:
+            faiss.write_index(self.index, os.path.join(staging, INDEX_FILE))
+            with open(os.path.join(staging, TEXTS_FILE), 'w', encoding='utf-8') as f:
+                json.dump(self.texts, f, ensure_ascii=False)
+            with open(os.path.join(staging, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+                json.dump(dict(manifest, count=len(self.texts)), f, indent=2)
+            if os.path.isdir(directory):
+                # Rebuilding in place: swap the old copy out first
+                retired = tempfile.mkdtemp(dir=parent, prefix='.retired-')
+                os.replace(directory, os.path.join(retired, 'index'))
+                os.replace(staging, directory)
+                shutil.rmtree(retired, ignore_errors=True)
+            else:
+                os.replace(staging, directory)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    @classmethod
+    def load(cls, directory):
+        """Read a saved index, memory-mapped so workers share the pages instead of each copying them"""
+        path = os.path.join(directory, INDEX_FILE)
+        mmap_flag = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP)
+        try:
+            index = faiss.read_index(path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            # Not every index type or faiss build supports mmap
+            index = faiss.read_index(path)
+        with open(os.path.join(directory, TEXTS_FILE), 'r', encoding='utf-8') as f:
+            texts = json.load(f)
+        if index.ntotal != len(texts):
+            raise ValueError(f"Index at {directory} has {index.ntotal} vectors but {len(texts)} texts")
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        loaded = cls.__new__(cls)
+        loaded.index = index
+        loaded.texts = texts
+        loaded.manifest = manifest
+        return loaded
+
+def load_texts(json_path):
     with open(json_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
     # Flatten all records from all sheets
@@ -76,20 +132,24 @@ def load_data_and_build_index(json_path, azure_endpoint, azure_key, embedding_mo
             # Concatenate all values into a single string for embedding
             text = " | ".join(f"{k}: {v}" for k, v in item.items())
             texts.append(text)
-    embeddings = [get_azure_embedding(text, azure_endpoint, azure_key, embedding_model) for text in texts]
+    return texts
+
+def index_version(json_path, embedding_name, dim):
+    """Key of the index built from this source file with this embedding backend"""
+    digest = hashlib.sha256()
+    with open(json_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    digest.update(f"\0{embedding_name}\0{dim}".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def index_directory(version):
+    return os.path.join(settings.CHATBOT_INDEX_DIR, version)
+
+def load_data_and_build_index(json_path, embedding_client, dim):
+    texts = load_texts(json_path)
+    # Batched and cached: only records not embedded before cost a request
+    embeddings = embedding_client.embed(texts)
     index = FaissIndex(dim)
     index.add(embeddings, texts)
     return index
-
-
-
-def get_azure_embedding(text, azure_endpoint, azure_key, deployment_name):
-    url = f"{azure_endpoint}/openai/deployments/{deployment_name}/embeddings?api-version=2023-05-15"
-    headers = {
-        "Content-Type": "application/json",
-        "api-key": azure_key
-    }
-    payload = {"input": text}
-    response = requests.post(url, headers=headers, json=payload)
-    response.raise_for_status()
-    return response.json()['data'][0]['embedding']
\ No newline at end of file
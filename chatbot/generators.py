@@ -0,0 +1,122 @@
+# chatbot/generators.py
+import logging
+import threading
+from typing import List, Optional, Tuple
+
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+
+class ChatUnavailable(Exception):
+    """The chat backend could not produce an answer, e.g. during an outage"""
+
+
+class ChatGenerator:
+    """Writes an answer to a query from the retrieved knowledge base entries"""
+    name = ''
+
+    def generate(self, query: str, docs: List[str]) -> str:
+        raise NotImplementedError
+
+
+class StubChatGenerator(ChatGenerator):
+    """Answers with the retrieved entries verbatim; no network, instant and deterministic.
+
+    For development, load tests of the retrieval path and Azure outages.
+    """
+    name = 'stub'
+
+    def generate(self, query: str, docs: List[str]) -> str:
+        if not docs:
+            return "I could not find anything about that in the knowledge base."
+        return "Here is what the knowledge base has on that:\n" + "\n".join(f"- {doc}" for doc in docs)
+
+
+class AzureChatGenerator(ChatGenerator):
+    name = 'azure'
+
+    def __init__(self, endpoint: str, key: str, deployment: str, api_version: str):
+        from openai import AzureOpenAI
+
+        self.deployment = deployment
+        self.client = AzureOpenAI(
+            api_version=api_version,
+            azure_endpoint=endpoint,
+            api_key=key,
+        )
+
+    def generate(self, query: str, docs: List[str]) -> str:
+        import openai
+
+        system_prompt = "You are a helpful assistant."
+        user_prompt = f"Context: {' '.join(docs)}\n\nQuestion: {query}\nAnswer:"
+        try:
+            response = self.client.chat.completions.create(
+                stream=False,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                max_completion_tokens=800,
+                temperature=1.0,
+                top_p=1.0,
+                frequency_penalty=0.0,
+                presence_penalty=0.0,
+                model=self.deployment,
+            )
+        except openai.APIError as e:
+            raise ChatUnavailable(str(e)) from e
+        return response.choices[0].message.content.strip()
+
+
+def _build_generator(backend: str) -> ChatGenerator:
+    if backend == 'stub':
+        return StubChatGenerator()
+    if backend == 'azure':
+        from .config import CHAT_ENDPOINT, CHAT_KEY, CHAT_DEPLOYMENT, CHAT_API_VERSION
+
+        if not (CHAT_ENDPOINT and CHAT_DEPLOYMENT):
+            raise ImproperlyConfigured("AZURE_CHAT_ENDPOINT and CHAT_MODEL must be set")
+        return AzureChatGenerator(CHAT_ENDPOINT, CHAT_KEY, CHAT_DEPLOYMENT, CHAT_API_VERSION)
+    raise ImproperlyConfigured(f"Unknown chat backend {backend!r}")
+
+
+_generators = {}
+_lock = threading.Lock()
+
+
+def _get_generator(backend: str) -> ChatGenerator:
+    if backend not in _generators:
+        with _lock:
+            if backend not in _generators:
+                _generators[backend] = _build_generator(backend)
+    return _generators[backend]
+
+
+def get_chat_generator() -> ChatGenerator:
+    """Process-wide generator chosen by CHATBOT_CHAT_BACKEND"""
+    from django.conf import settings
+
+    return _get_generator(settings.CHATBOT_CHAT_BACKEND)
+
+
+def get_fallback_chat_generator() -> Optional[ChatGenerator]:
+    """Generator chosen by CHATBOT_CHAT_FALLBACK, or None when there is no fallback"""
+    from django.conf import settings
+
+    if not settings.CHATBOT_CHAT_FALLBACK:
+        return None
+    return _get_generator(settings.CHATBOT_CHAT_FALLBACK)
+
+
+def generate_answer(query: str, docs: List[str]) -> Tuple[str, bool]:
+    """(answer, whether the fallback generator wrote it)"""
+    try:
+        return get_chat_generator().generate(query, docs), False
+    except ChatUnavailable as e:
+        fallback = get_fallback_chat_generator()
+        if fallback is None:
+            raise
+        logger.warning(f"Chat backend unavailable, answering with {fallback.name}: {e}")
+        return fallback.generate(query, docs), True
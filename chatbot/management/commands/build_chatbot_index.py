@@ -0,0 +1,46 @@
+import os
+import time
+from datetime import datetime, timezone
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from chatbot.config import JSON_PATH
+from chatbot.embeddings import EmbeddingUnavailable, get_embedding_client
+from chatbot.faiss_utils import index_directory, index_version, load_data_and_build_index
+
+
+class Command(BaseCommand):
+    help = "Embed the chatbot knowledge base and write the FAISS index the chat view loads"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', default=JSON_PATH, help="Clinical data JSON to index")
+        parser.add_argument('--force', action='store_true', help="Rebuild even if this version is already on disk")
+
+    def handle(self, *args, **options):
+        try:
+            client = get_embedding_client()
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        version = index_version(options['data'], client.name, client.dim)
+        directory = index_directory(version)
+        if os.path.isdir(directory) and not options['force']:
+            self.stdout.write(f"Index {version} is already built at {directory}")
+            return
+
+        started = time.perf_counter()
+        requests_before = client.requests_made
+        try:
+            index = load_data_and_build_index(options['data'], client, client.dim)
+        except EmbeddingUnavailable as e:
+            raise CommandError(f"Embedding backend unavailable: {e}")
+        index.save(directory, {
+            'version': version,
+            'embedding_backend': client.name,
+            'dim': client.dim,
+            'source': os.path.basename(options['data']),
+            'built_at': datetime.now(timezone.utc).isoformat(),
+        })
+        self.stdout.write(self.style.SUCCESS(
+            f"Built index {version} with {len(index.texts)} entries in {time.perf_counter() - started:.1f}s "
+            f"({client.requests_made - requests_before} embedding requests) at {directory}"
+        ))
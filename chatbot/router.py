@@ -0,0 +1,171 @@
+# chatbot/router.py
+import logging
+import re
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from .tables import GENERIC_TOKENS, ClinicalTables, get_clinical_tables, tokenize
+
+logger = logging.getLogger(__name__)
+
+CONTACT_WORDS = {'contact', 'contacts', 'phone', 'telephone', 'call', 'number', 'address', 'email', 'fax', 'reach'}
+CHEAPEST_WORDS = {'cheapest', 'lowest', 'least', 'cheaper', 'affordable'}
+DEAREST_WORDS = {'expensive', 'highest', 'costliest', 'priciest', 'dearest'}
+COST_WORDS = {'cost', 'costs', 'price', 'prices', 'priced', 'much', 'fee', 'fees', 'charge', 'charges'}
+STOCK_WORDS = {'stock', 'stocks', 'available', 'availability', 'inventory', 'units'}
+NHIF_WORDS = {'nhif', 'covered', 'cover', 'coverage', 'copay', 'pocket', 'insurance'}
+COST_QUESTION_WORDS = COST_WORDS | CHEAPEST_WORDS | DEAREST_WORDS | STOCK_WORDS | NHIF_WORDS
+# Words that name neither an item nor a place
+FILLER_WORDS = {
+    'what', 'whats', 'which', 'where', 'how', 'is', 'are', 'does', 'do', 'can', 'could', 'will',
+    'i', 'me', 'my', 'we', 'you', 'it', 'there', 'please', 'tell', 'show', 'give', 'find', 'know', 'want',
+    'get', 'buy', 'pay', 'to', 'by', 'on', 'with', 'near', 'from', 'per', 'any', 'most', 'all', 'list',
+    'many', 'out', 'kes', 'ksh', 'shillings', 'or',
+}
+COST_TABLES = ('resources', 'treatments')
+
+# More matching rows than this is a listing, not a lookup
+MAX_ROWS = 10
+
+
+def money(value) -> str:
+    return f"KES {value:,.2f}"
+
+
+def describe_row(table: str, row) -> str:
+    if table == 'resources':
+        return f"{row.item} at {row.facility}: {money(row.cost)}, {row.stock} in stock"
+    return (
+        f"{row.item} at {row.facility}: {money(row.cost)} "
+        f"(NHIF covered: {row.nhif_covered or 'unknown'}, copay {money(row.copay)}, "
+        f"out of pocket {money(row.out_of_pocket)})"
+    )
+
+
+def summarize(table: str, frame) -> str:
+    """Price range of one item across many rows, with the cheapest"""
+    row = next(frame.sort_values('cost', kind='stable').itertuples())
+    return (
+        f"{row.item}: {money(frame['cost'].min())} to {money(frame['cost'].max())} "
+        f"across {frame['facility'].nunique()} facilities; cheapest {describe_row(table, row)}"
+    )
+
+
+def describe_contact(row) -> str:
+    details = [
+        f"{label} {value}"
+        for label, value in (('phone', row.phone), ('fax', row.fax), ('email', row.email))
+        if value
+    ]
+    place = ', '.join(value for value in (row.region, row.address) if value)
+    return f"{row.facility} ({place}): {', '.join(details) or 'no phone or email listed'}"
+
+
+def location_positions(tables: ClinicalTables, table: str, tokens) -> Optional[np.ndarray]:
+    """Rows at the facility or region the question names, or None if it names none"""
+    found = [
+        tables.positions(table, column, tables.match(table, column, tokens))
+        for column in ('facility', 'region')
+    ]
+    if not any(len(positions) for positions in found):
+        return None
+    return np.union1d(*found)
+
+
+def names_unknown_place(tables: ClinicalTables, query: str) -> bool:
+    """True for "... in Kisumu" when no facility or region is called Kisumu"""
+    return any(
+        not tables.knows_token(word)
+        for word in re.findall(r'\b(?:in|at|near)\s+([a-z0-9]+)', query.lower())
+        if word not in ('the', 'a', 'an', 'stock')
+    )
+
+
+def answer_contact(tables: ClinicalTables, tokens) -> Optional[str]:
+    keys = tables.match('contacts', 'facility', tokens) or tables.match('contacts', 'region', tokens)
+    if not keys:
+        return None
+    frame = tables.rows('contacts', facility=keys)
+    if frame.empty:
+        frame = tables.rows('contacts', region=keys)
+    if frame.empty or len(frame) > MAX_ROWS:
+        return None
+    return '\n'.join(describe_contact(row) for row in frame.itertuples())
+
+
+def unmatched_words(tables: ClinicalTables, column: str, matches: Dict[str, List[str]], tokens) -> Set[str]:
+    """Words of the question naming no matched value, place, intent or filler, e.g. hpv in "HPV test price"."""
+    named = set()
+    for table, keys in matches.items():
+        for key in keys:
+            named |= tables.terms[table][column][key]
+    return {
+        token for token in tokens - named - COST_QUESTION_WORDS - FILLER_WORDS - GENERIC_TOKENS
+        if not tables.knows_token(token)
+    }
+
+
+def answer_costs(tables: ClinicalTables, tokens, query: str) -> Optional[str]:
+    column = 'item'
+    matches = {table: tables.match(table, column, tokens) for table in COST_TABLES}
+    if not any(matches.values()):
+        # Only a category named in full: "lab test", not the "test" in "HPV test"
+        column = 'category'
+        matches = {
+            table: [key for key in tables.match(table, column, tokens) if tables.terms[table][column][key] <= tokens]
+            for table in COST_TABLES
+        }
+    # The sheet whose names best match; both on a tie
+    scores = {
+        table: len(tables.terms[table][column][keys[0]] & tokens) if keys else 0
+        for table, keys in matches.items()
+    }
+    best = max(scores.values())
+    if not best or names_unknown_place(tables, query):
+        return None
+    matches = {table: keys for table, keys in matches.items() if scores[table] == best}
+    # A word the sheets cannot place means the question is about something else
+    if unmatched_words(tables, column, matches, tokens):
+        return None
+
+    cheapest = bool(tokens & CHEAPEST_WORDS)
+    dearest = bool(tokens & DEAREST_WORDS)
+    lines: List[str] = []
+    for table, keys in matches.items():
+        frame = tables.rows(table, **{column: keys})
+        at = location_positions(tables, table, tokens)
+        if at is not None:
+            frame = frame[frame.index.isin(at)]
+        if frame.empty:
+            continue
+        frame = frame.sort_values('cost', ascending=not dearest, kind='stable')
+        if cheapest or dearest:
+            row = next(frame.itertuples())
+            lines.append(f"{'Cheapest' if cheapest else 'Most expensive'}: {describe_row(table, row)}")
+        elif len(frame) <= MAX_ROWS:
+            lines.extend(describe_row(table, row) for row in frame.itertuples())
+        else:
+            lines.extend(summarize(table, item_rows) for _, item_rows in frame.groupby('item', sort=True))
+    return '\n'.join(lines) or None
+
+
+def route_query(tables: ClinicalTables, query: str) -> Optional[str]:
+    """Exact answer from the clinical tables, or None if the question needs search and the LLM"""
+    tokens = set(tokenize(query))
+    if tokens & CONTACT_WORDS:
+        return answer_contact(tables, tokens)
+    if tokens & COST_QUESTION_WORDS:
+        return answer_costs(tables, tokens, query)
+    return None
+
+
+def answer_from_tables(query: str) -> Optional[str]:
+    if not query:
+        return None
+    try:
+        tables = get_clinical_tables()
+    except (OSError, ValueError) as e:
+        logger.error(f"Clinical tables not available: {e}")
+        return None
+    return route_query(tables, query)
@@ -0,0 +1,147 @@
+# chatbot/tables.py
+import json
+import re
+import threading
+from typing import Dict, FrozenSet, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# table -> (sheet in clinical_data.json, {sheet column: table column})
+SHEETS = {
+    'resources': ('ResourcesInventoryCostSheet', {
+        'Facility': 'facility', 'Region': 'region', 'Category': 'category', 'Item': 'item',
+        'Cost (KES)': 'cost', 'Available Stock': 'stock',
+    }),
+    'treatments': ('TreatmentCostsSheet', {
+        'Facility': 'facility', 'Region': 'region', 'Category': 'category', 'Service': 'item',
+        'Base Cost (KES)': 'cost', 'NHIF Covered': 'nhif_covered',
+        'Insurance Copay (KES)': 'copay', 'Out-of-Pocket (KES)': 'out_of_pocket',
+    }),
+    'contacts': ('ContactSheet', {
+        'Hospital': 'facility', 'Location': 'region', 'Address': 'address',
+        'Phone': 'phone', 'Fax': 'fax', 'Email': 'email',
+    }),
+}
+INDEXED_COLUMNS = ('facility', 'region', 'category', 'item')
+
+# Words too common in names to identify a row on their own
+GENERIC_TOKENS = frozenset({
+    'the', 'a', 'an', 'of', 'and', 'for', 'in', 'at', 'hospital', 'county', 'referral', 'level',
+    'sub', 'teaching', 'medical', 'centre', 'center', 'nursing', 'home', 'mission', 'pair',
+})
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r'[a-z0-9]+', str(text).lower())
+
+
+def normalize(text: str) -> str:
+    return ' '.join(tokenize(text))
+
+
+def _clean_contacts(frame: pd.DataFrame) -> pd.DataFrame:
+    # The sheet was pasted with a stray header row and repeats some hospitals
+    frame = frame[(frame['phone'] != '') | (frame['address'] != '')]
+    frame = frame[frame['facility'].str.lower() != 'hospital']
+    return frame.drop_duplicates('facility')
+
+
+class ClinicalTables:
+    """Column-oriented copy of the clinical data sheets with value indexes.
+
+    Each table keeps its rows as a pandas DataFrame. For the facility, region,
+    category and item columns, `indexes` maps a normalised value to the row
+    positions holding it and `terms` holds the words that identify it in a
+    question.
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame]):
+        self.frames = frames
+        self.indexes: Dict[str, Dict[str, Dict[str, np.ndarray]]] = {}
+        self.terms: Dict[str, Dict[str, Dict[str, FrozenSet[str]]]] = {}
+        for name, frame in frames.items():
+            self.indexes[name], self.terms[name] = {}, {}
+            for column in INDEXED_COLUMNS:
+                if column not in frame:
+                    continue
+                keys = frame[column].map(normalize)
+                self.indexes[name][column] = {
+                    key: positions for key, positions in keys.groupby(keys).indices.items() if key
+                }
+                self.terms[name][column] = {
+                    key: frozenset(key.split()) - GENERIC_TOKENS for key in self.indexes[name][column]
+                }
+
+    @classmethod
+    def from_json(cls, json_path: str) -> 'ClinicalTables':
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        frames = {}
+        for name, (sheet, columns) in SHEETS.items():
+            frame = pd.DataFrame.from_records(data.get(sheet, []), columns=list(columns)).rename(columns=columns)
+            for column in frame.columns:
+                if frame[column].dtype == object:
+                    frame[column] = frame[column].fillna('').astype(str).str.strip()
+            if 'item' in frame:
+                frame = frame[frame['item'] != '']
+            if name == 'contacts':
+                frame = _clean_contacts(frame)
+            frames[name] = frame.reset_index(drop=True)
+        return cls(frames)
+
+    def match(self, table: str, column: str, tokens) -> List[str]:
+        """Values of `column` sharing the most identifying words with `tokens`.
+
+        Ties go to the value with the fewest words the question left out, so
+        "Nairobi Hospital" picks THE NAIROBI HOSPITAL over NAIROBI WEST HOSPITAL.
+        """
+        tokens = set(tokens)
+        scored = []
+        for key, terms in self.terms[table].get(column, {}).items():
+            hits = len(terms & tokens)
+            # At least half of the value's own words, so "test" alone names no test
+            if hits and hits * 2 >= len(terms):
+                scored.append((hits, hits / len(terms), key))
+        if not scored:
+            return []
+        best = max(scored)[:2]
+        return [key for hits, share, key in sorted(scored, reverse=True) if (hits, share) == best]
+
+    def knows_token(self, token: str) -> bool:
+        """Whether `token` is part of any facility or region name"""
+        return any(
+            token in key.split()
+            for table in self.indexes.values()
+            for column in ('facility', 'region')
+            for key in table.get(column, {})
+        )
+
+    def positions(self, table: str, column: str, keys) -> np.ndarray:
+        index = self.indexes[table].get(column, {})
+        found = [index[key] for key in keys if key in index]
+        return np.unique(np.concatenate(found)) if found else np.array([], dtype=np.intp)
+
+    def rows(self, table: str, **criteria) -> pd.DataFrame:
+        """Rows whose indexed columns take one of the given normalised values, ANDed across columns"""
+        frame = self.frames[table]
+        selected: Optional[np.ndarray] = None
+        for column, keys in criteria.items():
+            positions = self.positions(table, column, keys)
+            selected = positions if selected is None else np.intersect1d(selected, positions)
+        return frame if selected is None else frame.iloc[selected]
+
+
+_tables = None
+_lock = threading.Lock()
+
+
+def get_clinical_tables() -> ClinicalTables:
+    global _tables
+    if _tables is None:
+        from .config import JSON_PATH
+
+        with _lock:
+            if _tables is None:
+                _tables = ClinicalTables.from_json(JSON_PATH)
+    return _tables
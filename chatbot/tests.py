@@ -1,3 +1,211 @@
-from django.test import TestCase
+import tempfile
+from datetime import datetime, timezone
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import requests
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import User
+from .answer_cache import AnswerCache
+from .config import JSON_PATH
+from .embeddings import AzureEmbeddingClient, EmbeddingCache, EmbeddingUnavailable, LocalHashingEmbedder
+from .faiss_utils import index_directory, index_version, load_data_and_build_index
+from .generators import ChatUnavailable, StubChatGenerator, generate_answer
+from .router import answer_from_tables
+from .views import ChatbotAPIView, get_faiss_index, get_query_embedding
+
+
+class TableRoutingTests(SimpleTestCase):
+    """Only questions the sheets answer exactly skip search and the LLM"""
+
+    def test_lookups_answered_from_tables(self):
+        answer = answer_from_tables("cheapest pap smear in Kitale")
+        self.assertTrue(answer.startswith("Cheapest: Pap Smear at Kitale County Hospital"))
+        answer = answer_from_tables("contact for the Nairobi Hospital")
+        self.assertTrue(answer.startswith("THE NAIROBI HOSPITAL"))
+        self.assertEqual(len(answer.splitlines()), 1)
+        answer = answer_from_tables("cost of a lab test at Moi")
+        self.assertIn("Moi Teaching and Referral Hospital", answer)
+
+    def test_unknown_items_and_places_fall_through(self):
+        for query in (
+            "What is the price of HPV test in Nakuru?",
+            "price of HIV test at Moi",
+            "price of test",
+            "cheapest LEEP in Kisumu",
+            "contact for Pumwani",
+            "what is cervical cancer",
+        ):
+            with self.subTest(query=query):
+                self.assertIsNone(answer_from_tables(query))
+
+
+class AnswerCacheTests(SimpleTestCase):
+    """Near-duplicate questions share an answer only when they ask about the same thing"""
+
+    def setUp(self):
+        self.embedder = LocalHashingEmbedder(dim=256)
+        self.cache = AnswerCache(max_entries=10, ttl=60, max_distance=0.5)
+
+    def store(self, query, answer, version='v1'):
+        self.cache.set(query, self.embedder.embed([query])[0], answer, version)
+
+    def similar(self, query, version='v1'):
+        return self.cache.get_similar(query, self.embedder.embed([query])[0], version)
+
+    def test_numbers_and_stages_must_match(self):
+        self.store("treatment for stage I cervical cancer", "stage I answer")
+        self.store("how common is HPV 16", "HPV 16 answer")
+        self.assertEqual(self.similar("treatment of stage I cervical cancer"), "stage I answer")
+        self.assertIsNone(self.similar("treatment for stage II cervical cancer"))
+        self.assertIsNone(self.similar("how common is HPV 18"))
+
+    def test_new_index_version_empties_cache(self):
+        self.store("what is a pap smear", "answer")
+        self.assertEqual(self.cache.get("What is a Pap smear?", 'v1'), "answer")
+        self.assertIsNone(self.cache.get("what is a pap smear", 'v2'))
+        self.assertIsNone(self.similar("what is a pap smear", 'v1'))
+
+
+class ChatbotQueryValidationTests(SimpleTestCase):
+    """A request without a question is rejected before any lookup"""
+
+    def post(self, data):
+        request = APIRequestFactory().post('/api/chatbot/', data, format='json')
+        force_authenticate(request, user=User(email='chv@example.com', username='chv'))
+        return ChatbotAPIView.as_view()(request)
+
+    def test_missing_or_blank_query(self):
+        for data in ({}, {'query': ''}, {'query': '   '}, {'query': 5}, ['price of pap smear']):
+            with self.subTest(data=data):
+                response = self.post(data)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data, {'error': 'query is required'})
+
+
+class FaissIndexReloadTests(SimpleTestCase):
+    """Workers pick up a rebuilt index without a restart"""
+
+    def build(self, client, version):
+        index = load_data_and_build_index(JSON_PATH, client, client.dim)
+        index.save(index_directory(version), {
+            'version': version, 'built_at': datetime.now(timezone.utc).isoformat(),
+        })
+
+    def test_rebuild_is_reloaded(self):
+        client = LocalHashingEmbedder(dim=64)
+        version = index_version(JSON_PATH, client.name, client.dim)
+        with tempfile.TemporaryDirectory() as root, override_settings(CHATBOT_INDEX_DIR=root), \
+                mock.patch('chatbot.views.get_embedding_client', return_value=client):
+            self.assertIsNone(get_faiss_index())
+            self.build(client, version)
+            first = get_faiss_index()
+            self.assertIsNotNone(first)
+            self.assertIs(get_faiss_index(), first)
+
+            self.build(client, version)
+            second = get_faiss_index()
+            self.assertIsNot(second, first)
+            self.assertEqual(len(second.texts), len(first.texts))
+
+
+@override_settings(
+    CHATBOT_TABLE_ROUTING=False, CHATBOT_ANSWER_CACHE=False,
+    CHATBOT_CHAT_BACKEND='stub', CHATBOT_CHAT_FALLBACK='',
+)
+class ChatbotRetrievalTests(SimpleTestCase):
+    """The chat view works offline with the local backend and the stub generator"""
+
+    query = "what is a pap smear"
+
+    def setUp(self):
+        self.client = LocalHashingEmbedder(dim=64)
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        settings_override = override_settings(CHATBOT_INDEX_DIR=root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = mock.patch('chatbot.views.get_embedding_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        version = index_version(JSON_PATH, self.client.name, self.client.dim)
+        self.index = load_data_and_build_index(JSON_PATH, self.client, self.client.dim)
+        self.index.save(index_directory(version), {
+            'version': version, 'built_at': datetime.now(timezone.utc).isoformat(),
+        })
+
+    def post(self, query):
+        request = APIRequestFactory().post('/api/chatbot/', {'query': query}, format='json')
+        force_authenticate(request, user=User(email='chv@example.com', username='chv'))
+        return ChatbotAPIView.as_view()(request)
+
+    def test_answers_from_retrieved_entries(self):
+        response = self.post(self.query)
+        self.assertEqual(response.status_code, 200)
+        docs = self.index.search(self.client.embed([self.query])[0])
+        self.assertEqual(response.data['answer'], StubChatGenerator().generate(self.query, docs))
+        self.assertTrue(response.data['answer'].startswith("Here is what the knowledge base has on that:"))
+
+    def test_chat_outage_falls_back_to_stub_when_configured(self):
+        failing = mock.Mock(**{'generate.side_effect': ChatUnavailable('down')})
+        with mock.patch('chatbot.generators.get_chat_generator', return_value=failing):
+            self.assertEqual(self.post(self.query).status_code, 503)
+            with override_settings(CHATBOT_CHAT_FALLBACK='stub'):
+                answer, fallback = generate_answer(self.query, ['entry'])
+                self.assertEqual(self.post(self.query).status_code, 200)
+        self.assertEqual((answer, fallback), (StubChatGenerator().generate(self.query, ['entry']), True))
+
+    def test_embedding_outage_is_503(self):
+        azure = AzureEmbeddingClient('https://embeddings.invalid', 'key', 'model', 'v1', 64, max_workers=1)
+        with mock.patch.object(azure.session, 'post', side_effect=requests.ConnectionError('down')):
+            with self.assertRaises(EmbeddingUnavailable):
+                azure.embed([self.query])
+            with mock.patch('chatbot.views.get_query_embedding', lambda text: azure.embed([text])[0]):
+                response = self.post(self.query)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data, {'error': 'The chatbot is temporarily unavailable.'})
+
+
+class EmbeddingCacheTests(SimpleTestCase):
+    """Only texts missing from the cache are sent, deduplicated and batched; queries are not stored"""
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.cache = EmbeddingCache(f"{root.name}/embeddings.sqlite3")
+        self.addCleanup(self.cache.close)
+        self.client = AzureEmbeddingClient(
+            'https://embeddings.invalid', 'key', 'model', 'v1', 4, cache=self.cache, batch_size=2, max_workers=1
+        )
+        self.sent = []
+        patcher = mock.patch.object(self.client, '_post_batch', self.post_batch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_batch(self, texts):
+        self.sent.append(list(texts))
+        return [np.full(4, len(text), dtype=np.float32) for text in texts]
+
+    def test_misses_are_batched_and_stored(self):
+        vectors = self.client.embed(['a', 'bb', 'a', 'ccc'])
+        self.assertEqual([row[0] for row in vectors], [1, 2, 1, 3])
+        self.assertEqual(sorted(text for batch in self.sent for text in batch), ['a', 'bb', 'ccc'])
+        self.assertEqual((len(self.sent), self.client.requests_made), (2, 2))
+
+        self.sent.clear()
+        vectors = self.client.embed(['ccc', 'dddd', 'a'])
+        self.assertEqual([row[0] for row in vectors], [3, 4, 1])
+        self.assertEqual(self.sent, [['dddd']])
+
+        self.sent.clear()
+        self.client.embed(['a', 'bb', 'ccc', 'dddd'])
+        self.assertEqual(self.sent, [])
+
+    def test_query_embeddings_are_not_stored(self):
+        with mock.patch('chatbot.views.get_embedding_client', return_value=self.client):
+            self.assertEqual(get_query_embedding('what is a pap smear')[0], 19)
+            get_query_embedding('what is a pap smear')
+        self.assertEqual(len(self.sent), 2)
+        self.assertEqual(self.cache._connection.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0], 0)
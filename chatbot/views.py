@@ -78,71 +78,124 @@
 
     
 
+import logging
 import os
-import requests
+import threading
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .faiss_utils import load_data_and_build_index
-
-from openai import AzureOpenAI
-
-# Embedding model credentials (for vector search)
-EMBED_ENDPOINT = os.getenv("AZURE_EMBED_ENDPOINT")
-EMBED_KEY = os.getenv("AZURE_EMBED_KEY")
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
-EMBEDDING_API_VERSION = os.getenv("EMBEDDING_API_VERSION")
-
-# Chat model credentials (for completions)
-CHAT_ENDPOINT = os.getenv("AZURE_CHAT_ENDPOINT")
-CHAT_KEY = os.getenv("AZURE_CHAT_KEY")
-CHAT_DEPLOYMENT = os.getenv("CHAT_MODEL")
-CHAT_API_VERSION = os.getenv("API_VERSION")
-
-INDEX_DIM = 1536
-JSON_PATH = os.path.join(os.path.dirname(__file__), "data", "clinical_data.json")
-
-def get_azure_embedding(text):
-    url = f"{EMBED_ENDPOINT}/openai/deployments/{EMBEDDING_MODEL}/embeddings?api-version={EMBEDDING_API_VERSION}"
-    headers = {
-        "Content-Type": "application/json",
-        "api-key": EMBED_KEY
-    }
-    payload = {"input": text}
-    response = requests.post(url, headers=headers, json=payload)
-    response.raise_for_status()
-    return response.json()['data'][0]['embedding']
-
-faiss_index = load_data_and_build_index(JSON_PATH, EMBED_ENDPOINT, EMBED_KEY, EMBEDDING_MODEL, INDEX_DIM)
-
-# Initialize AzureOpenAI client for chat
-chat_client = AzureOpenAI(
-    api_version=CHAT_API_VERSION,
-    azure_endpoint=CHAT_ENDPOINT,
-    api_key=CHAT_KEY,
-)
-
-def generate_azure_answer(query, docs):
-    system_prompt = "You are a helpful assistant."
-    user_prompt = f"Context: {' '.join(docs)}\n\nQuestion: {query}\nAnswer:"
-    response = chat_client.chat.completions.create(
-        stream=False,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        max_completion_tokens=800,
-        temperature=1.0,
-        top_p=1.0,
-        frequency_penalty=0.0,
-        presence_penalty=0.0,
-        model=CHAT_DEPLOYMENT,
-    )
-    return response.choices[0].message.content.strip()
+from .answer_cache import get_answer_cache
+from .config import JSON_PATH
+from .embeddings import EmbeddingUnavailable, get_embedding_client
+from .faiss_utils import MANIFEST_FILE, FaissIndex, index_directory, index_version
+from .generators import ChatUnavailable, generate_answer
+from .router import answer_from_tables
+
+logger = logging.getLogger(__name__)
+
+def get_query_embedding(text):
+    # Queries are one-off; only index-build embeddings are worth keeping on disk
+    return get_embedding_client().embed([text], store=False)[0]
+
+# The index is built offline by `manage.py build_chatbot_index`, loaded on first use and
+# reloaded when the data file changes or the index is rebuilt, without restarting workers
+_loaded = None  # ((directory, manifest stamp), FaissIndex)
+_version = None  # ((data file stamp, backend, dim), index version)
+_lock = threading.Lock()
+
+def _stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+def get_faiss_index():
+    """The persisted index for the current data file and embedding backend, or None if not built"""
+    global _loaded, _version
+    try:
+        client = get_embedding_client()
+    except ImproperlyConfigured as e:
+        logger.error(f"Chatbot embedding backend is not configured: {e}")
+        return None
+    source = (_stamp(JSON_PATH), client.name, client.dim)
+    versioned = _version
+    if versioned is None or versioned[0] != source:
+        # The data file is only hashed again when it changes
+        try:
+            versioned = _version = (source, index_version(JSON_PATH, client.name, client.dim))
+        except OSError as e:
+            logger.error(f"Chatbot data file not readable: {e}")
+            return None
+    directory = index_directory(versioned[1])
+    # A rebuild swaps in a new directory, so the manifest's stamp changes
+    key = (directory, _stamp(os.path.join(directory, MANIFEST_FILE)))
+    loaded = _loaded
+    if loaded is not None and loaded[0] == key:
+        return loaded[1]
+    with _lock:
+        if _loaded is not None and _loaded[0] == key:
+            return _loaded[1]
+        try:
+            faiss_index = FaissIndex.load(directory)
+        except (OSError, RuntimeError, ValueError) as e:
+            logger.error(f"Chatbot index not available at {directory}, run build_chatbot_index: {e}")
+            return None
+        if _loaded is not None:
+            logger.info(f"Reloaded chatbot index from {directory}")
+        _loaded = (key, faiss_index)
+    return faiss_index
 
 class ChatbotAPIView(APIView):
     def post(self, request):
-        user_query = request.data.get("query")
-        embedding = get_azure_embedding(user_query)
+        user_query = request.data.get("query") if isinstance(request.data, dict) else None
+        if not isinstance(user_query, str) or not user_query.strip():
+            return Response({"error": "query is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if settings.CHATBOT_TABLE_ROUTING:
+            # Lookups like "cheapest Pap smear in Kitale" have an exact answer in the sheets
+            answer = answer_from_tables(user_query)
+            if answer is not None:
+                return Response({"answer": answer})
+
+        faiss_index = get_faiss_index()
+        if faiss_index is None:
+            return Response(
+                {"error": "The chatbot knowledge base is not available yet."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        # A forced rebuild keeps the version but not the build time; either change empties the cache
+        version = (faiss_index.manifest.get('version'), faiss_index.manifest.get('built_at'))
+        cache = get_answer_cache()
+        if cache is not None:
+            answer = cache.get(user_query, version)
+            if answer is not None:
+                return Response({"answer": answer})
+
+        try:
+            embedding = get_query_embedding(user_query)
+        except EmbeddingUnavailable as e:
+            logger.error(f"Embedding backend unavailable: {e}")
+            return Response(
+                {"error": "The chatbot is temporarily unavailable."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        if cache is not None:
+            answer = cache.get_similar(user_query, embedding, version)
+            if answer is not None:
+                return Response({"answer": answer})
+
         docs = faiss_index.search(embedding)
-        answer = generate_azure_answer(user_query, docs)
-        return Response({"answer": answer})
\ No newline at end of file
+        try:
+            answer, fallback = generate_answer(user_query, docs)
+        except ChatUnavailable as e:
+            logger.error(f"Chat backend unavailable: {e}")
+            return Response(
+                {"error": "The chatbot is temporarily unavailable."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        # Stand-in answers from an outage are not worth keeping
+        if cache is not None and not fallback:
+            cache.set(user_query, embedding, answer, version)
+        return Response({"answer": answer})
@@ -0,0 +1,14 @@
+# gunicorn.conf.py
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))
+
+# Import the app (and with it the AI model) once in the master process;
+# forked workers then share the loaded model copy-on-write.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+if preload_app:
+    os.environ.setdefault('AI_MODEL_PRELOAD', 'True')
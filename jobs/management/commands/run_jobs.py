@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs on a thread or process pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.JOBS_WORKER_CONCURRENCY,
+            help="Jobs run at the same time"
+        )
+        parser.add_argument(
+            '--pool', choices=['thread', 'process'], default='thread',
+            help="Threads suit I/O-bound jobs such as SMS calls; processes suit CPU-bound ones"
+        )
+        parser.add_argument('--poll-interval', type=float, default=settings.JOBS_POLL_INTERVAL)
+        parser.add_argument('--burst', action='store_true', help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        worker = Worker(options['concurrency'], options['pool'], options['poll_interval'])
+        worker.install_signal_handlers()
+        self.stdout.write(
+            f"Worker {worker.name} running {options['concurrency']} {options['pool']}(s)"
+        )
+        processed = worker.run(burst=options['burst'])
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker.name} stopped after {processed} jobs"))
@@ -0,0 +1,160 @@
+# jobs/queue.py
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+REGISTRY: Dict[str, 'JobHandler'] = {}
+
+
+class JobHandler:
+    """A registered job function; call .enqueue(**payload) to run it in the background"""
+
+    def __init__(self, func: Callable, name: str, max_attempts: Optional[int]):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, run_after=None, **payload) -> Job:
+        return enqueue(self.name, run_after=run_after, **payload)
+
+
+def job(name: Optional[str] = None, max_attempts: Optional[int] = None):
+    """Register a function as a background job.
+
+    The payload is stored as JSON, so arguments must be JSON-serialisable
+    (pass ids, not model instances). Jobs may run more than once if a
+    worker dies mid-run, so handlers must be idempotent.
+    """
+    def decorator(func):
+        handler = JobHandler(func, name or f"{func.__module__}.{func.__name__}", max_attempts)
+        REGISTRY[handler.name] = handler
+        return handler
+    return decorator
+
+
+def enqueue(name: str, run_after=None, **payload) -> Job:
+    """Queue a registered job; it is written in the caller's transaction"""
+    if name not in REGISTRY:
+        raise ValueError(f"Unknown job {name}")
+    queued = Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=REGISTRY[name].max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        run_after=run_after or timezone.now(),
+    )
+    if settings.JOBS_RUN_INLINE:
+        # No worker running, e.g. local development: run once the data is committed
+        transaction.on_commit(lambda: run_inline(queued.pk))
+    return queued
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, in seconds, after the given failed attempt"""
+    delay = min(settings.JOBS_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.JOBS_RETRY_MAX_SECONDS)
+    # Jitter keeps jobs that failed together from retrying in lockstep
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _ready(now):
+    """Due pending jobs, and running jobs whose worker let the lease lapse"""
+    return Q(status=Job.PENDING, run_after__lte=now) | Q(status=Job.RUNNING, locked_until__lt=now)
+
+
+def claim_jobs(worker: str, limit: int) -> List[int]:
+    """Lease up to `limit` due jobs to this worker; returns their ids.
+
+    Candidates are locked with SKIP LOCKED where the database supports it,
+    so concurrent workers take different jobs instead of waiting. The
+    conditional UPDATE re-checks readiness, so a job is never leased to two
+    workers even where row locks are unavailable.
+    """
+    now = timezone.now()
+    locked_until = now + timedelta(seconds=settings.JOBS_LEASE_SECONDS)
+    with transaction.atomic():
+        candidates = Job.objects.filter(_ready(now)).order_by('run_after', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('id', flat=True)[:limit])
+        Job.objects.filter(id__in=ids).filter(_ready(now)).update(
+            status=Job.RUNNING, locked_by=worker, locked_until=locked_until,
+            attempts=F('attempts') + 1, updated_at=now
+        )
+    return list(
+        Job.objects.filter(id__in=ids, status=Job.RUNNING, locked_by=worker, locked_until=locked_until)
+        .order_by('run_after', 'id').values_list('id', flat=True)
+    )
+
+
+def execute_job(job_id: int, worker: str) -> bool:
+    """Run a job leased to this worker and record the outcome; True on success.
+
+    The handler runs in a transaction, so a failed attempt leaves nothing
+    half-written behind for the retry.
+    """
+    queued = Job.objects.filter(pk=job_id, status=Job.RUNNING, locked_by=worker).first()
+    if queued is None:
+        # The lease lapsed and another worker took the job
+        return False
+    handler = REGISTRY.get(queued.name)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job {queued.name}")
+        with transaction.atomic():
+            handler.func(**queued.payload)
+    except Exception as e:
+        now = timezone.now()
+        updates = dict(last_error=traceback.format_exc(), locked_by='', locked_until=None, updated_at=now)
+        if handler is None or queued.attempts >= queued.max_attempts:
+            logger.error(f"Job {queued.name} #{queued.pk} failed permanently after {queued.attempts} attempts: {e}")
+            updates.update(status=Job.FAILED, finished_at=now)
+        else:
+            delay = retry_delay(queued.attempts)
+            logger.warning(f"Job {queued.name} #{queued.pk} failed on attempt {queued.attempts}, retrying in {delay:.0f}s: {e}")
+            updates.update(status=Job.PENDING, run_after=now + timedelta(seconds=delay))
+        Job.objects.filter(pk=job_id, locked_by=worker).update(**updates)
+        return False
+
+    now = timezone.now()
+    Job.objects.filter(pk=job_id, locked_by=worker).update(
+        status=Job.SUCCEEDED, last_error='', locked_by='', locked_until=None, finished_at=now, updated_at=now
+    )
+    return True
+
+
+def run_inline(job_id: int) -> bool:
+    """Lease and run one job in this process, for JOBS_RUN_INLINE"""
+    worker = f"inline:{worker_name()}"
+    now = timezone.now()
+    leased = Job.objects.filter(pk=job_id).filter(_ready(now)).update(
+        status=Job.RUNNING, locked_by=worker,
+        locked_until=now + timedelta(seconds=settings.JOBS_LEASE_SECONDS),
+        attempts=F('attempts') + 1, updated_at=now
+    )
+    return bool(leased) and execute_job(job_id, worker)
+
+
+def purge_finished(days: int) -> int:
+    """Delete jobs that succeeded more than `days` ago; failed jobs are kept for inspection"""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Job.objects.filter(status=Job.SUCCEEDED, finished_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,196 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import queue
+from .models import Job
+from .queue import claim_jobs, enqueue, execute_job, job, purge_finished, retry_delay, run_inline
+from .worker import Worker
+
+CALLS = []
+RUNNING_SEEN = []
+
+
+@job('tests.record')
+def record_call(n):
+    CALLS.append(n)
+
+
+@job('tests.fail', max_attempts=2)
+def fail_call(n):
+    # Written in the handler's transaction, so it must not survive the failure
+    Job.objects.create(name='tests.side_effect')
+    raise RuntimeError('boom')
+
+
+@job('tests.count_running')
+def count_running(n):
+    RUNNING_SEEN.append(Job.objects.filter(status=Job.RUNNING).count())
+
+
+@override_settings(JOBS_RUN_INLINE=False, JOBS_LEASE_SECONDS=600)
+class ClaimJobsTests(TestCase):
+    """Leases go to one worker at a time and only for due jobs"""
+
+    def test_claims_due_jobs_in_order_up_to_limit(self):
+        first, second, third = (enqueue('tests.record', n=n) for n in range(3))
+        enqueue('tests.record', run_after=timezone.now() + timedelta(hours=1), n=99)
+        self.assertEqual(claim_jobs('worker-a', 2), [first.pk, second.pk])
+        self.assertEqual(claim_jobs('worker-b', 5), [third.pk])
+        self.assertEqual(claim_jobs('worker-c', 5), [])
+        leased = Job.objects.get(pk=first.pk)
+        self.assertEqual((leased.status, leased.locked_by, leased.attempts), (Job.RUNNING, 'worker-a', 1))
+        self.assertIsNotNone(leased.locked_until)
+
+    def test_lapsed_lease_is_claimed_again(self):
+        queued = enqueue('tests.record', n=1)
+        self.assertEqual(claim_jobs('worker-a', 1), [queued.pk])
+        Job.objects.filter(pk=queued.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim_jobs('worker-b', 1), [queued.pk])
+        queued.refresh_from_db()
+        self.assertEqual((queued.locked_by, queued.attempts), ('worker-b', 2))
+        # The first worker lost the lease, so it must not run the job
+        self.assertFalse(execute_job(queued.pk, 'worker-a'))
+        self.assertEqual(CALLS, [])
+
+    def test_job_taken_between_select_and_update_is_not_claimed(self):
+        queued = enqueue('tests.record', n=1)
+        ready = queue._ready
+        calls = []
+
+        def racing_ready(now):
+            calls.append(now)
+            if len(calls) == 2:
+                # Another worker leases the candidates after they were selected
+                Job.objects.filter(pk=queued.pk).update(
+                    status=Job.RUNNING, locked_by='worker-b', locked_until=now + timedelta(minutes=10)
+                )
+            return ready(now)
+
+        with mock.patch.object(queue, '_ready', racing_ready):
+            self.assertEqual(claim_jobs('worker-a', 1), [])
+        queued.refresh_from_db()
+        self.assertEqual((queued.locked_by, queued.attempts), ('worker-b', 0))
+
+
+class RetryDelayTests(TestCase):
+    """Exponential backoff with jitter, capped"""
+
+    @override_settings(JOBS_RETRY_BASE_SECONDS=30, JOBS_RETRY_MAX_SECONDS=3600)
+    def test_backoff_doubles_and_is_capped(self):
+        for attempts, delay in ((1, 30), (2, 60), (3, 120), (7, 1920), (8, 3600), (20, 3600)):
+            with self.subTest(attempts=attempts):
+                samples = [retry_delay(attempts) for _ in range(200)]
+                self.assertGreaterEqual(min(samples), delay / 2)
+                self.assertLessEqual(max(samples), delay)
+                # Jittered, so jobs that failed together spread out
+                self.assertGreater(len(set(samples)), 1)
+
+
+@override_settings(JOBS_RUN_INLINE=False, JOBS_RETRY_BASE_SECONDS=30, JOBS_RETRY_MAX_SECONDS=3600)
+class ExecuteJobTests(TestCase):
+    """Outcomes are recorded on the job row"""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def lease(self, queued):
+        self.assertEqual(claim_jobs('worker-a', 1), [queued.pk])
+
+    def test_success(self):
+        queued = enqueue('tests.record', n=7)
+        self.lease(queued)
+        self.assertTrue(execute_job(queued.pk, 'worker-a'))
+        queued.refresh_from_db()
+        self.assertEqual(CALLS, [7])
+        self.assertEqual((queued.status, queued.locked_by, queued.locked_until), (Job.SUCCEEDED, '', None))
+        self.assertIsNotNone(queued.finished_at)
+
+    def test_failure_is_retried_later(self):
+        queued = enqueue('tests.fail', n=0)
+        self.lease(queued)
+        before = timezone.now()
+        self.assertFalse(execute_job(queued.pk, 'worker-a'))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts, queued.locked_by), (Job.PENDING, 1, ''))
+        self.assertIn('RuntimeError: boom', queued.last_error)
+        self.assertFalse(Job.objects.filter(name='tests.side_effect').exists())
+        self.assertGreaterEqual(queued.run_after, before + timedelta(seconds=15))
+        self.assertIsNone(queued.finished_at)
+
+    def test_failure_on_last_attempt_is_permanent(self):
+        queued = enqueue('tests.fail', n=0)
+        self.assertEqual(queued.max_attempts, 2)
+        Job.objects.filter(pk=queued.pk).update(attempts=1)
+        self.lease(queued)
+        self.assertFalse(execute_job(queued.pk, 'worker-a'))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Job.FAILED, 2))
+        self.assertIsNotNone(queued.finished_at)
+        self.assertEqual(claim_jobs('worker-b', 1), [])
+
+    def test_unregistered_handler_fails_permanently(self):
+        queued = Job.objects.create(name='tests.missing', payload={})
+        self.lease(queued)
+        self.assertFalse(execute_job(queued.pk, 'worker-a'))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.FAILED)
+        self.assertIn('No handler registered', queued.last_error)
+
+    def test_unknown_job_name_is_rejected(self):
+        with self.assertRaises(ValueError):
+            enqueue('tests.missing')
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_inline_jobs_run_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            queued = enqueue('tests.record', n=3)
+            self.assertEqual(CALLS, [])
+        queued.refresh_from_db()
+        self.assertEqual((CALLS, queued.status), ([3], Job.SUCCEEDED))
+        # A job that already ran is not leased again
+        self.assertFalse(run_inline(queued.pk))
+
+    def test_purge_keeps_failed_and_recent_jobs(self):
+        old = timezone.now() - timedelta(days=8)
+        done = Job.objects.create(name='tests.record', status=Job.SUCCEEDED, finished_at=old)
+        failed = Job.objects.create(name='tests.record', status=Job.FAILED, finished_at=old)
+        recent = Job.objects.create(name='tests.record', status=Job.SUCCEEDED, finished_at=timezone.now())
+        self.assertEqual(purge_finished(7), 1)
+        self.assertEqual(
+            set(Job.objects.values_list('pk', flat=True)), {failed.pk, recent.pk}
+        )
+        self.assertFalse(Job.objects.filter(pk=done.pk).exists())
+
+
+@override_settings(JOBS_RUN_INLINE=False, JOBS_RETRY_BASE_SECONDS=30)
+class WorkerBurstTests(TransactionTestCase):
+    """A burst worker drains the due jobs and exits"""
+
+    def setUp(self):
+        CALLS.clear()
+        RUNNING_SEEN.clear()
+
+    def test_burst_runs_due_jobs_and_exits(self):
+        for n in range(4):
+            enqueue('tests.record', n=n)
+        failing = enqueue('tests.fail', n=0)
+        later = enqueue('tests.record', run_after=timezone.now() + timedelta(hours=1), n=99)
+        self.assertEqual(Worker(1, poll_interval=0.05).run(burst=True), 5)
+        self.assertEqual(sorted(CALLS), [0, 1, 2, 3])
+        self.assertEqual(Job.objects.filter(status=Job.SUCCEEDED).count(), 4)
+        failing.refresh_from_db()
+        later.refresh_from_db()
+        # Retried later rather than again in this burst
+        self.assertEqual((failing.status, failing.attempts), (Job.PENDING, 1))
+        self.assertEqual((later.status, later.attempts), (Job.PENDING, 0))
+
+    def test_leases_only_what_it_can_run(self):
+        with transaction.atomic():
+            for n in range(3):
+                enqueue('tests.count_running', n=n)
+        self.assertEqual(Worker(1, poll_interval=0.05).run(burst=True), 3)
+        self.assertEqual(RUNNING_SEEN, [1, 1, 1])
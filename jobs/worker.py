@@ -0,0 +1,100 @@
+# jobs/worker.py
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.db import connection, connections
+
+from .queue import claim_jobs, execute_job, purge_finished, worker_name
+
+logger = logging.getLogger(__name__)
+
+PURGE_INTERVAL_SECONDS = 3600
+
+
+def _init_process():
+    # Spawned children start from a blank interpreter
+    django.setup()
+
+
+def _execute(job_id: int, worker: str) -> bool:
+    try:
+        return execute_job(job_id, worker)
+    finally:
+        # Pool threads and processes each hold their own connection
+        connection.close()
+
+
+class Worker:
+    """Polls the job table and runs due jobs on a thread or process pool.
+
+    Jobs are leased in the main thread only as fast as pool slots free up,
+    so a busy worker never holds leases on jobs it cannot start yet.
+    """
+
+    def __init__(self, concurrency: int, pool: str = 'thread', poll_interval: float = 2.0):
+        self.concurrency = concurrency
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.name = worker_name()
+        self.stopping = threading.Event()
+
+    def _executor(self):
+        if self.pool == 'process':
+            # Forked children must not share the parent's database sockets
+            connections.close_all()
+            return ProcessPoolExecutor(max_workers=self.concurrency, initializer=_init_process)
+        return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job-worker')
+
+    def stop(self, *args):
+        logger.info(f"Worker {self.name} stopping after running jobs finish")
+        self.stopping.set()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def run(self, burst: bool = False) -> int:
+        """Run jobs until stopped, or until the queue is empty when burst is set; returns jobs run"""
+        processed = 0
+        last_purge = 0.0
+        in_flight = set()
+        executor = self._executor()
+        try:
+            while not self.stopping.is_set():
+                if time.monotonic() - last_purge > PURGE_INTERVAL_SECONDS:
+                    purged = purge_finished(settings.JOBS_RETAIN_DAYS)
+                    if purged:
+                        logger.info(f"Purged {purged} finished jobs")
+                    last_purge = time.monotonic()
+
+                free = self.concurrency - len(in_flight)
+                claimed = claim_jobs(self.name, free) if free else []
+                for job_id in claimed:
+                    in_flight.add(executor.submit(_execute, job_id, self.name))
+
+                if not in_flight:
+                    if burst:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                # Wake when a slot frees up, or poll again for new work
+                done, in_flight = wait(in_flight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                processed += self._collect(done)
+            processed += self._collect(wait(in_flight).done)
+        finally:
+            executor.shutdown(wait=True)
+            connection.close()
+        return processed
+
+    def _collect(self, done) -> int:
+        for future in done:
+            exc = future.exception()
+            if exc is not None:
+                # execute_job records handler errors itself; this is the worker machinery failing
+                logger.error(f"Worker {self.name} could not run a job: {exc}")
+        return len(done)
@@ -0,0 +1,78 @@
+# screening/aggregates.py
+from collections import defaultdict
+from typing import Dict, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+class AggregateDelta:
+    """Accumulates changes to an aggregate table and applies them in one pass.
+
+    Subclasses name the table: its model, the fields of its unique key
+    (in key order) and its additive measure fields. Contributions are
+    (key, measures) pairs; rows() maps the accumulated keys to table rows.
+    """
+    model = None
+    key_fields: Tuple[str, ...] = ()
+    measure_fields: Tuple[str, ...] = ()
+
+    def __init__(self):
+        self.deltas: Dict[Tuple, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def add(self, contribution, times: int = 1) -> None:
+        if contribution is None:
+            return
+        key, measures = contribution
+        for field, value in measures.items():
+            self.deltas[key][field] += times * value
+
+    def change(self, old, new) -> None:
+        self.add(old, -1)
+        self.add(new, 1)
+
+    def change_all(self, before: Dict, after: Dict) -> None:
+        """Move each object from its `before` contribution to its `after` one"""
+        for pk in set(before) | set(after):
+            self.change(before.get(pk), after.get(pk))
+
+    def rows(self) -> Dict[Tuple, Dict[str, int]]:
+        """Non-zero changes per table row"""
+        return {key: {f: v for f, v in measures.items() if v} for key, measures in self.deltas.items()}
+
+    def apply(self) -> None:
+        with transaction.atomic():
+            for key, measures in sorted(self.rows().items()):
+                if measures:
+                    self._apply_row(key, measures)
+
+    @classmethod
+    def _apply_row(cls, key, measures: Dict[str, int]) -> None:
+        lookup = dict(zip(cls.key_fields, key))
+        updates = {field: F(field) + value for field, value in measures.items()}
+        updates['updated_at'] = timezone.now()
+        if cls.model.objects.filter(**lookup).update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                cls.model.objects.create(**lookup, **measures)
+        except IntegrityError:
+            # Created concurrently by another transaction
+            cls.model.objects.filter(**lookup).update(**updates)
+
+    @classmethod
+    def stored_rows(cls, lock: bool = False) -> Dict[Tuple, object]:
+        """Every stored row by key, locked for update when asked"""
+        queryset = cls.model.objects.select_for_update() if lock else cls.model.objects.all()
+        return {tuple(getattr(row, field) for field in cls.key_fields): row for row in queryset}
+
+    @classmethod
+    def replace_all(cls, rows: Dict[Tuple, Dict[str, int]]) -> None:
+        """Replace the whole table with `rows`"""
+        cls.model.objects.all().delete()
+        cls.model.objects.bulk_create([
+            cls.model(**dict(zip(cls.key_fields, key)), **measures)
+            for key, measures in rows.items()
+            if measures
+        ], batch_size=1000)
@@ -1,18 +1,113 @@
 # screening/ai_service.py
-import joblib
 import numpy as np
-import os
+import threading
+import time
 from django.conf import settings
-from typing import Dict, Tuple, List
+from django.utils import timezone
+from typing import Dict, Tuple, List, Sequence, NamedTuple, Optional
 import logging
+from .model_registry import ModelRegistry
+from .prediction_cache import PredictionCache
+from .risk_table import RiskLookupTable
 
 logger = logging.getLogger(__name__)
 
+# ScreeningRecord fields passed to the predictor alongside the patient's age
+SCREENING_INPUT_FIELDS = (
+    'age_at_first_intercourse', 'number_of_sexual_partners', 'parity',
+    'hiv_status', 'hpv_vaccination_status', 'contraceptive_use',
+    'smoking_status', 'family_history_cervical_cancer',
+    'previous_abnormal_pap', 'via_result', 'bethesda_category',
+)
+
+# Contraceptive use encoded as a relative risk level
+CONTRACEPTIVE_RISK = {
+    'NONE': 0, 'BARRIER': 1, 'IUD': 2,
+    'INJECTION': 3, 'ORAL_PILLS': 4, 'OTHER': 2
+}
+
+# Minimum risk score implied by each Bethesda cytology category
+BETHESDA_RISK_FLOOR = {
+    'CANCER': 0.9, 'HSIL': 0.6, 'AGC': 0.5,
+    'LSIL': 0.3, 'ASCUS': 0.2
+}
+
+# Inputs used by the rule-based fallback and their defaults when missing
+FALLBACK_INPUT_DEFAULTS = {
+    'age': 30,
+    'age_at_first_intercourse': 18,
+    'number_of_sexual_partners': 1,
+    'parity': 0,
+    'hiv_status': None,
+    'hpv_vaccination_status': None,
+    'smoking_status': None,
+    'family_history_cervical_cancer': False,
+    'previous_abnormal_pap': False,
+    'via_result': None,
+    'bethesda_category': None,
+}
+
+URGENT_ACTION = (
+    "Urgent referral to specialist for colposcopy and biopsy. "
+    "Immediate follow-up required."
+)
+MONITOR_ACTION = (
+    "Repeat cytology in 6 months or refer for colposcopy. "
+    "Close monitoring recommended."
+)
+ROUTINE_ACTION = (
+    "Continue routine screening. Repeat screening in 3 years if low risk, "
+    "or 1 year if any risk factors present."
+)
+
+# Recommended action for each follow-up interval (months)
+RECOMMENDED_ACTIONS = {
+    1: URGENT_ACTION,
+    6: MONITOR_ACTION,
+    12: ROUTINE_ACTION,
+    36: ROUTINE_ACTION,
+}
+
+# Column of the one-hot Bethesda feature for each category
+BETHESDA_FEATURE_INDEX = {
+    'ASCUS': 13, 'LSIL': 14, 'HSIL': 15,
+    'AGC': 16, 'CANCER': 17
+}
+
+# Version recorded for scores produced by the rule-based fallback
+FALLBACK_MODEL_VERSION = 'fallback-rules'
+
+class _ModelState(NamedTuple):
+    """An immutable snapshot of the loaded model, swapped in as a whole"""
+    model: object
+    version: str
+    sha256: str
+    signature: tuple
+    lookup_table: Optional[RiskLookupTable]
+
 class CervicalCancerRiskPredictor:
-    """AI service for cervical cancer risk prediction"""
+    """AI service for cervical cancer risk prediction.
+    
+    The model is loaded on first use rather than at import, so management
+    commands and URLconf loading never import scikit-learn. Call
+    ensure_loaded() up front to load it in a preforking master instead.
+    """
     
     def __init__(self):
-        self.model = None
+        self.registry = ModelRegistry(settings.AI_MODEL_PATH, settings.RISK_PREDICTION_MODEL)
+        self._state = self._new_state(None, FALLBACK_MODEL_VERSION, '', None)
+        self._reload_lock = threading.Lock()
+        self._last_reload_check = 0.0
+        self.load_seconds = None
+        self.loaded_at = None
+        self.cache = None
+        if settings.RISK_PREDICTION_CACHE:
+            self.cache = PredictionCache(
+                ('age',) + SCREENING_INPUT_FIELDS,
+                max_entries=settings.RISK_PREDICTION_CACHE_SIZE,
+                ttl=settings.RISK_PREDICTION_CACHE_TTL,
+                alias=settings.RISK_PREDICTION_CACHE_ALIAS,
+            )
         self.feature_names = [
             'age', 'age_at_first_intercourse', 'number_of_sexual_partners',
             'parity', 'hiv_positive', 'hpv_vaccinated', 'contraceptive_use_encoded',
@@ -21,29 +116,127 @@ class CervicalCancerRiskPredictor:
             'bethesda_ascus', 'bethesda_lsil', 'bethesda_hsil', 
             'bethesda_agc', 'bethesda_cancer'
         ]
-        self.load_model()
+    
+    @property
+    def model(self):
+        return self._state.model
+    
+    @property
+    def model_version(self) -> str:
+        return self._state.version
+    
+    @property
+    def lookup_table(self) -> Optional[RiskLookupTable]:
+        return self._state.lookup_table
+    
+    def _new_state(self, model, version: str, sha256: str, signature) -> _ModelState:
+        lookup_table = None
+        if settings.RISK_PREDICTION_LOOKUP_TABLE:
+            lookup_table = RiskLookupTable(settings.RISK_PREDICTION_LOOKUP_TABLE_SIZE)
+        return _ModelState(model, version, sha256, signature, lookup_table)
     
     def load_model(self):
-        """Load the trained AI model"""
+        """Load the active model from the registry and swap it in atomically.
+        
+        Requests already running keep the snapshot they started with; if the
+        new artifact cannot be loaded the previous model stays in service.
+        """
         try:
-            model_path = os.path.join(
-                settings.AI_MODEL_PATH, 
-                settings.RISK_PREDICTION_MODEL
-            )
-            if os.path.exists(model_path):
-                self.model = joblib.load(model_path)
-                logger.info("AI model loaded successfully")
-            else:
+            signature = self.registry.signature()
+        except Exception as e:
+            logger.error(f"Error reading the AI model registry: {e}")
+            # Never matches a readable registry, so maybe_reload retries once it is fixed
+            signature = (None, None)
+        try:
+            artifact = self.registry.current()
+            if artifact is None:
                 logger.warning("AI model file not found, using fallback logic")
-                self.model = None
+                self._state = self._new_state(None, FALLBACK_MODEL_VERSION, '', signature)
+                return
+            if artifact.sha256 == self._state.sha256:
+                # Same file contents, at most relabelled
+                self._state = self._state._replace(version=artifact.version, signature=signature)
+                return
+            import joblib
+            
+            started = time.perf_counter()
+            self.registry.verify(artifact)
+            model = joblib.load(artifact.path)
+            self.load_seconds = time.perf_counter() - started
+            self.loaded_at = timezone.now()
+            self._state = self._new_state(model, artifact.version, artifact.sha256, signature)
+            if self.cache is not None:
+                self.cache.clear()
+            logger.info(f"AI model {artifact.version} loaded successfully in {self.load_seconds:.3f}s")
         except Exception as e:
             logger.error(f"Error loading AI model: {e}")
-            self.model = None
+            if self._state.signature is None:
+                self._state = self._new_state(None, FALLBACK_MODEL_VERSION, '', signature)
+            else:
+                # Keep serving the current model and stop retrying until the files change again
+                self._state = self._state._replace(signature=signature)
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._state.signature is not None
+    
+    def ensure_loaded(self) -> None:
+        """Load the model if this process has not done so yet"""
+        if self.is_loaded:
+            return
+        with self._reload_lock:
+            if not self.is_loaded:
+                self.load_model()
+                self._last_reload_check = time.monotonic()
+    
+    def stats(self) -> Dict:
+        """Model load metrics and lookup table counters"""
+        state = self._state
+        return {
+            'loaded': self.is_loaded,
+            'model_version': state.version,
+            'load_seconds': round(self.load_seconds, 4) if self.load_seconds is not None else None,
+            'loaded_at': self.loaded_at,
+            'lookup_table': state.lookup_table.stats() if state.lookup_table is not None else None,
+            'cache': self.cache.stats() if self.cache is not None else None,
+        }
+    
+    def maybe_reload(self) -> None:
+        """Reload the model if the registry changed, at most every AI_MODEL_RELOAD_INTERVAL seconds"""
+        self.ensure_loaded()
+        interval = settings.AI_MODEL_RELOAD_INTERVAL
+        now = time.monotonic()
+        if interval < 0 or now - self._last_reload_check < interval:
+            return
+        # Only one thread checks and reloads; the others carry on with the current model
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_reload_check = now
+            if self.registry.signature() != self._state.signature:
+                logger.info("AI model registry changed, reloading")
+                self.load_model()
+        except Exception as e:
+            # An unreadable registry must not take down predictions; keep the loaded model
+            logger.error(f"Error checking the AI model registry, keeping model {self._state.version}: {e}")
+        finally:
+            self._reload_lock.release()
     
     def preprocess_input(self, data: Dict) -> np.ndarray:
         """Preprocess input data for model prediction"""
         features = np.zeros(len(self.feature_names))
-        
+        self._encode_features(data, features)
+        return features.reshape(1, -1)
+    
+    def preprocess_batch(self, data_list: List[Dict]) -> np.ndarray:
+        """Preprocess a list of inputs into a single N x features matrix"""
+        features = np.zeros((len(data_list), len(self.feature_names)))
+        for row, data in zip(features, data_list):
+            self._encode_features(data, row)
+        return features
+    
+    def _encode_features(self, data: Dict, features: np.ndarray) -> None:
+        """Fill a single feature row in place from an input dict"""
         # Basic demographics and risk factors
         features[0] = data.get('age', 30)
         features[1] = data.get('age_at_first_intercourse', 18)
@@ -57,11 +250,7 @@ class CervicalCancerRiskPredictor:
         features[5] = 1 if data.get('hpv_vaccination_status') == 'VACCINATED' else 0
         
         # Contraceptive use (encoded as risk level)
-        contraceptive_risk = {
-            'NONE': 0, 'BARRIER': 1, 'IUD': 2, 
-            'INJECTION': 3, 'ORAL_PILLS': 4, 'OTHER': 2
-        }
-        features[6] = contraceptive_risk.get(data.get('contraceptive_use', 'NONE'), 0)
+        features[6] = CONTRACEPTIVE_RISK.get(data.get('contraceptive_use', 'NONE'), 0)
         
         # Smoking status
         smoking = data.get('smoking_status', 'NEVER')
@@ -79,27 +268,44 @@ class CervicalCancerRiskPredictor:
         
         # Bethesda categories
         bethesda = data.get('bethesda_category')
-        bethesda_mapping = {
-            'ASCUS': 13, 'LSIL': 14, 'HSIL': 15, 
-            'AGC': 16, 'CANCER': 17
-        }
-        if bethesda in bethesda_mapping:
-            features[bethesda_mapping[bethesda]] = 1
-        
-        return features.reshape(1, -1)
+        if bethesda in BETHESDA_FEATURE_INDEX:
+            features[BETHESDA_FEATURE_INDEX[bethesda]] = 1
     
     def calculate_risk_score(self, data: Dict) -> float:
         """Calculate risk score using rule-based or ML approach"""
-        if self.model is not None:
+        self.ensure_loaded()
+        return self._score(data, self._state)[0]
+    
+    def calculate_risk_scores(self, data_list: List[Dict]) -> List[float]:
+        """Calculate risk scores for many inputs with a single model call"""
+        self.ensure_loaded()
+        return self._score_batch(data_list, self._state)[0]
+    
+    def _score(self, data: Dict, state: _ModelState) -> Tuple[float, str]:
+        """Risk score and the version of the model (or rules) that produced it"""
+        if state.model is not None:
             try:
                 features = self.preprocess_input(data)
-                risk_score = self.model.predict_proba(features)[0][1]  # Probability of high risk
-                return float(risk_score)
+                risk_score = state.model.predict_proba(features)[0][1]  # Probability of high risk
+                return float(risk_score), state.version
             except Exception as e:
                 logger.error(f"Error in ML prediction: {e}")
-                return self._fallback_risk_calculation(data)
+                return self._fallback_risk_calculation(data), FALLBACK_MODEL_VERSION
         else:
-            return self._fallback_risk_calculation(data)
+            return self._fallback_risk_calculation(data), FALLBACK_MODEL_VERSION
+    
+    def _score_batch(self, data_list: List[Dict], state: _ModelState) -> Tuple[List[float], str]:
+        """Batch counterpart of _score"""
+        if not data_list:
+            return [], state.version
+        if state.model is not None:
+            try:
+                features = self.preprocess_batch(data_list)
+                risk_scores = state.model.predict_proba(features)[:, 1]
+                return [float(score) for score in risk_scores], state.version
+            except Exception as e:
+                logger.error(f"Error in batch ML prediction: {e}")
+        return self.fallback_risk_scores(self.to_columns(data_list)).tolist(), FALLBACK_MODEL_VERSION
     
     def _fallback_risk_calculation(self, data: Dict) -> float:
         """Fallback rule-based risk calculation when ML model is unavailable"""
@@ -161,15 +367,80 @@ class CervicalCancerRiskPredictor:
         
         # Bethesda categories
         bethesda = data.get('bethesda_category')
-        bethesda_risks = {
-            'CANCER': 0.9, 'HSIL': 0.6, 'AGC': 0.5,
-            'LSIL': 0.3, 'ASCUS': 0.2
-        }
-        if bethesda in bethesda_risks:
-            risk_score = max(risk_score, bethesda_risks[bethesda])
+        if bethesda in BETHESDA_RISK_FLOOR:
+            risk_score = max(risk_score, BETHESDA_RISK_FLOOR[bethesda])
         
         return min(risk_score, 1.0)  # Cap at 1.0
     
+    def to_columns(self, data_list: List[Dict]) -> Dict[str, np.ndarray]:
+        """Convert a list of input dicts into the columns used by the fallback rules"""
+        columns = {}
+        for name, default in FALLBACK_INPUT_DEFAULTS.items():
+            values = [data.get(name, default) for data in data_list]
+            if isinstance(default, bool):
+                columns[name] = np.array([bool(value) for value in values], dtype=bool)
+            elif isinstance(default, int):
+                columns[name] = np.array(values, dtype=np.int64)
+            else:
+                columns[name] = np.array(values, dtype=object)
+        return columns
+    
+    def fallback_risk_scores(self, columns: Dict[str, Sequence]) -> np.ndarray:
+        """Columnar version of _fallback_risk_calculation.
+        
+        Takes one array per input field (see FALLBACK_INPUT_DEFAULTS) and
+        applies the same rules in the same order, so every score is
+        bit-identical to the scalar path.
+        """
+        def column(name):
+            if name in columns:
+                return np.asarray(columns[name])
+            return np.full(size, FALLBACK_INPUT_DEFAULTS[name], dtype=object)
+        
+        size = len(next(iter(columns.values()))) if columns else 0
+        risk_score = np.full(size, 0.1)  # Base risk
+        
+        # Age factor
+        age = column('age')
+        risk_score += np.where(age > 50, 0.2, np.where(age > 35, 0.1, 0.0))
+        
+        # Sexual history
+        risk_score += np.where(column('age_at_first_intercourse') < 16, 0.15, 0.0)
+        
+        partners = column('number_of_sexual_partners')
+        risk_score += np.where(partners > 4, 0.2, np.where(partners > 2, 0.1, 0.0))
+        
+        # Parity
+        parity = column('parity')
+        risk_score += np.where(parity > 5, 0.15, np.where(parity > 3, 0.1, 0.0))
+        
+        # HIV status
+        risk_score += np.where(column('hiv_status') == 'POSITIVE', 0.25, 0.0)
+        
+        # HPV vaccination (protective)
+        risk_score -= np.where(column('hpv_vaccination_status') == 'VACCINATED', 0.1, 0.0)
+        
+        # Smoking
+        smoking = column('smoking_status')
+        risk_score += np.where(smoking == 'CURRENT', 0.15, np.where(smoking == 'FORMER', 0.05, 0.0))
+        
+        # Family history
+        risk_score += np.where(column('family_history_cervical_cancer').astype(bool), 0.1, 0.0)
+        
+        # Previous abnormal Pap
+        risk_score += np.where(column('previous_abnormal_pap').astype(bool), 0.2, 0.0)
+        
+        # VIA results
+        via_result = column('via_result')
+        risk_score += np.where(via_result == 'SUSPICIOUS', 0.4, np.where(via_result == 'POSITIVE', 0.3, 0.0))
+        
+        # Bethesda categories
+        bethesda = column('bethesda_category')
+        for category, floor in BETHESDA_RISK_FLOOR.items():
+            risk_score = np.where(bethesda == category, np.maximum(risk_score, floor), risk_score)
+        
+        return np.minimum(risk_score, 1.0)  # Cap at 1.0
+    
     def classify_risk(self, risk_score: float) -> str:
         """Classify risk level based on score"""
         if risk_score >= 0.7:
@@ -186,22 +457,19 @@ class CervicalCancerRiskPredictor:
         
         if risk_level == 'HIGH' or bethesda in ['HSIL', 'AGC', 'CANCER'] or via_result == 'SUSPICIOUS':
             return (
-                "Urgent referral to specialist for colposcopy and biopsy. "
-                "Immediate follow-up required.",
+                URGENT_ACTION,
                 1,  # 1 month follow-up
                 True  # Referral needed
             )
         elif risk_level == 'MODERATE' or bethesda in ['LSIL', 'ASCUS'] or via_result == 'POSITIVE':
             return (
-                "Repeat cytology in 6 months or refer for colposcopy. "
-                "Close monitoring recommended.",
+                MONITOR_ACTION,
                 6,  # 6 months follow-up
                 True  # Referral may be needed
             )
         else:
             return (
-                "Continue routine screening. Repeat screening in 3 years if low risk, "
-                "or 1 year if any risk factors present.",
+                ROUTINE_ACTION,
                 36 if data.get('hiv_status') != 'POSITIVE' else 12,  # 3 years or 1 year for HIV+
                 False  # No immediate referral needed
             )
@@ -245,37 +513,165 @@ class CervicalCancerRiskPredictor:
     def predict(self, data: Dict) -> Dict:
         """Main prediction method"""
         try:
-            risk_score = self.calculate_risk_score(data)
-            risk_level = self.classify_risk(risk_score)
-            recommended_action, follow_up_months, referral_needed = self.generate_recommendations(
-                risk_level, data
-            )
-            explanations = self.get_risk_explanation(data, risk_score)
-            
-            # Calculate confidence (simplified approach)
-            confidence = 0.9 if self.model is not None else 0.7
+            self.maybe_reload()
+            state = self._state
+            if self.cache is None:
+                return self._predict(data, state)
             
-            return {
-                'risk_score': round(risk_score, 3),
-                'risk_level': risk_level,
-                'confidence': confidence,
-                'recommended_action': recommended_action,
-                'follow_up_months': follow_up_months,
-                'referral_needed': referral_needed,
-                'explanation': explanations
-            }
+            key = self.cache.key(data, state.version)
+            prediction = self.cache.get(key)
+            if prediction is None:
+                prediction = self._predict(data, state)
+                self.cache.set(key, prediction)
+            return prediction
         
         except Exception as e:
             logger.error(f"Error in risk prediction: {e}")
-            return {
-                'risk_score': 0.5,
-                'risk_level': 'MODERATE',
-                'confidence': 0.5,
-                'recommended_action': 'Unable to complete risk assessment. Please consult healthcare provider.',
-                'follow_up_months': 6,
-                'referral_needed': True,
-                'explanation': ['Risk assessment incomplete due to technical error']
-            }
+            return self._error_prediction()
+    
+    def _predict(self, data: Dict, state: _ModelState) -> Dict:
+        if state.lookup_table is not None:
+            return self._predict_with_lookup_table(data, state)
+        risk_score, model_version = self._score(data, state)
+        return self._build_prediction(data, risk_score, state, model_version)
+    
+    def predict_batch(self, data_list: List[Dict]) -> List[Dict]:
+        """Predict risk for many inputs, returning results in input order"""
+        self.maybe_reload()
+        state = self._state
+        if self.cache is None:
+            predictions = self._predict_uncached_batch(data_list, state)
+        else:
+            keys = [self.cache.key(data, state.version) for data in data_list]
+            predictions = [self.cache.get(key) for key in keys]
+            misses = [position for position, prediction in enumerate(predictions) if prediction is None]
+            scored = self._predict_uncached_batch([data_list[position] for position in misses], state)
+            for position, prediction in zip(misses, scored):
+                predictions[position] = prediction
+                if prediction is not None:
+                    self.cache.set(keys[position], prediction)
+        return [
+            prediction if prediction is not None else self._error_prediction()
+            for prediction in predictions
+        ]
+    
+    def _predict_uncached_batch(self, data_list: List[Dict], state: _ModelState) -> List[Dict]:
+        if state.lookup_table is not None:
+            return self._predict_batch_with_lookup_table(data_list, state)
+        return self._predict_batch(data_list, state)
+    
+    def _predict_batch(self, data_list: List[Dict], state: _ModelState) -> List[Dict]:
+        """Score inputs with one model call; failed rows come back as None"""
+        try:
+            risk_scores, model_version = self._score_batch(data_list, state)
+        except Exception as e:
+            # One bad row must not fail the whole batch, so score each row on its own
+            logger.error(f"Error in batch risk prediction, scoring rows one at a time: {e}")
+            return [self._predict_row(data, state) for data in data_list]
+        
+        predictions = []
+        for data, risk_score in zip(data_list, risk_scores):
+            try:
+                predictions.append(self._build_prediction(data, risk_score, state, model_version))
+            except Exception as e:
+                logger.error(f"Error in risk prediction: {e}")
+                predictions.append(None)
+        return predictions
+    
+    def _predict_row(self, data: Dict, state: _ModelState) -> Optional[Dict]:
+        """Predict a single row of a failed batch, or None if it fails too"""
+        try:
+            risk_score, model_version = self._score(data, state)
+            return self._build_prediction(data, risk_score, state, model_version)
+        except Exception as e:
+            logger.error(f"Error in risk prediction: {e}")
+            return None
+    
+    def _predict_batch_with_lookup_table(self, data_list: List[Dict], state: _ModelState) -> List[Dict]:
+        """Serve memoized rows from the lookup table and score the rest together"""
+        lookup_table = state.lookup_table
+        predictions = [None] * len(data_list)
+        misses = []
+        for position, data in enumerate(data_list):
+            key = lookup_table.encode(data)
+            cached = lookup_table.get(key) if key is not None else None
+            if cached is None:
+                misses.append((position, key))
+            else:
+                predictions[position] = self._build_cached_prediction(data, cached, state)
+        
+        scored = self._predict_batch([data_list[position] for position, _ in misses], state)
+        for (position, key), prediction in zip(misses, scored):
+            predictions[position] = prediction
+            if key is not None and prediction is not None:
+                self._remember(lookup_table, key, prediction)
+        return predictions
+    
+    def _predict_with_lookup_table(self, data: Dict, state: _ModelState) -> Dict:
+        """Predict through the memoized lookup table, filling it on a miss"""
+        lookup_table = state.lookup_table
+        key = lookup_table.encode(data)
+        cached = lookup_table.get(key) if key is not None else None
+        if cached is not None:
+            return self._build_cached_prediction(data, cached, state)
+        
+        risk_score, model_version = self._score(data, state)
+        prediction = self._build_prediction(data, risk_score, state, model_version)
+        if key is not None:
+            self._remember(lookup_table, key, prediction)
+        return prediction
+    
+    def _remember(self, lookup_table: RiskLookupTable, key: int, prediction: Dict) -> None:
+        lookup_table.put(
+            key, prediction['risk_score'], prediction['risk_level'],
+            prediction['follow_up_months'], prediction['referral_needed'],
+            prediction['model_version'] == FALLBACK_MODEL_VERSION
+        )
+    
+    def _build_cached_prediction(self, data: Dict, cached: Tuple, state: _ModelState) -> Dict:
+        """Assemble the prediction payload from a lookup table entry"""
+        risk_score, risk_level, follow_up_months, referral_needed, fallback = cached
+        model_version = FALLBACK_MODEL_VERSION if fallback else state.version
+        return self._build_prediction(
+            data, risk_score, state, model_version,
+            (risk_level, RECOMMENDED_ACTIONS[follow_up_months], follow_up_months, referral_needed)
+        )
+    
+    def _build_prediction(self, data: Dict, risk_score: float, state: _ModelState,
+                          model_version: str, outcome: Tuple = None) -> Dict:
+        """Assemble the prediction payload for a computed risk score"""
+        if outcome is None:
+            risk_level = self.classify_risk(risk_score)
+            outcome = (risk_level,) + self.generate_recommendations(risk_level, data)
+        risk_level, recommended_action, follow_up_months, referral_needed = outcome
+        explanations = self.get_risk_explanation(data, risk_score)
+        
+        # Calculate confidence (simplified approach)
+        confidence = 0.9 if state.model is not None else 0.7
+        
+        return {
+            'risk_score': round(risk_score, 3),
+            'risk_level': risk_level,
+            'confidence': confidence,
+            'recommended_action': recommended_action,
+            'follow_up_months': follow_up_months,
+            'referral_needed': referral_needed,
+            'explanation': explanations,
+            'model_version': model_version
+        }
+    
+    def _error_prediction(self) -> Dict:
+        """Conservative result returned when prediction fails"""
+        return {
+            'risk_score': 0.5,
+            'risk_level': 'MODERATE',
+            'confidence': 0.5,
+            'recommended_action': 'Unable to complete risk assessment. Please consult healthcare provider.',
+            'follow_up_months': 6,
+            'referral_needed': True,
+            'explanation': ['Risk assessment incomplete due to technical error'],
+            'model_version': ''
+        }
 
-# Singleton instance
+# Singleton instance (the model itself is loaded lazily)
 risk_predictor = CervicalCancerRiskPredictor()
\ No newline at end of file
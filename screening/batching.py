@@ -0,0 +1,164 @@
+# screening/batching.py
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Optional
+import logging
+
+from django.conf import settings
+
+from .ai_service import risk_predictor
+
+logger = logging.getLogger(__name__)
+
+
+def _bucket(value: int) -> int:
+    """Smallest power of two >= value, used as a histogram bucket"""
+    return 1 << max(value - 1, 0).bit_length()
+
+
+class MicroBatcher:
+    """Coalesce concurrent single predictions into vectorized batch calls.
+
+    Request threads submit one input each and block on a Future. A single
+    background thread takes the first waiting input, keeps collecting for
+    up to max_wait_ms or until max_batch_size inputs are queued, then
+    scores the whole batch with one predict_batch call. A request still
+    waiting after timeout_ms is scored directly in its own thread.
+    """
+
+    def __init__(self, predict_batch: Callable[[List[Dict]], List[Dict]],
+                 max_batch_size: int, max_wait_ms: float, timeout_ms: float):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout_ms / 1000.0
+        self._lock = threading.Lock()
+        # Guards the stats, which request threads and the worker both update
+        self._stats_lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        with self._stats_lock:
+            self.batches = 0
+            self.items = 0
+            self.timeouts = 0
+            self.max_queue_depth = 0
+            self.batch_size_histogram = Counter()
+            self.queue_depth_histogram = Counter()
+
+    def _ensure_worker(self) -> None:
+        # Threads do not survive fork, so each worker process starts its own
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._reset_stats()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='risk-microbatcher', daemon=True)
+            self._thread.start()
+
+    def submit(self, data: Dict) -> Future:
+        """Queue one input for prediction and return a Future for its result"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((data, future))
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self.queue_depth_histogram[_bucket(depth)] += 1
+            if depth > self.max_queue_depth:
+                self.max_queue_depth = depth
+        return future
+
+    def predict(self, data: Dict, timeout: Optional[float] = None) -> Dict:
+        """Predict one input, waiting at most timeout seconds (default self.timeout) on the batch"""
+        future = self.submit(data)
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            # Cancelled so the worker skips it if it has not reached it yet
+            future.cancel()
+            with self._stats_lock:
+                self.timeouts += 1
+            logger.warning("Micro-batched risk prediction timed out, scoring it directly")
+            return self.predict_batch([data])[0]
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = [
+                (data, future) for data, future in self._collect()
+                if future.set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+            with self._stats_lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.batch_size_histogram[_bucket(len(batch))] += 1
+            try:
+                predictions = self.predict_batch([data for data, _ in batch])
+            except Exception as e:
+                logger.error(f"Error in micro-batched risk prediction: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), prediction in zip(batch, predictions):
+                future.set_result(prediction)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'timeout_ms': self.timeout * 1000.0,
+                'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+                'max_queue_depth': self.max_queue_depth,
+                'batches': self.batches,
+                'items': self.items,
+                'timeouts': self.timeouts,
+                'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+                'batch_size_histogram': {
+                    f"le_{size}": count for size, count in sorted(self.batch_size_histogram.items())
+                },
+                'queue_depth_histogram': {
+                    f"le_{depth}": count for depth, count in sorted(self.queue_depth_histogram.items())
+                },
+            }
+
+
+risk_batcher = MicroBatcher(
+    risk_predictor.predict_batch,
+    max_batch_size=settings.RISK_PREDICTION_MICROBATCH_MAX_SIZE,
+    max_wait_ms=settings.RISK_PREDICTION_MICROBATCH_MAX_WAIT_MS,
+    timeout_ms=settings.RISK_PREDICTION_MICROBATCH_TIMEOUT_MS,
+)
+
+
+def predict_risk(data: Dict) -> Dict:
+    """Predict a single input, through the micro-batcher when it is enabled"""
+    if settings.RISK_PREDICTION_MICROBATCH:
+        return risk_batcher.predict(data)
+    return risk_predictor.predict(data)
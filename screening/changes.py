@@ -0,0 +1,148 @@
+# screening/changes.py
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import Patient, ScreeningRecord, ScreeningFollowUp, SyncTombstone
+from .serializers import (
+    PatientChangeSerializer, ScreeningRecordChangeSerializer, ScreeningFollowUpChangeSerializer
+)
+
+# Stream name -> (model, field linking a row to its CHV/clinician owner, serializer)
+CHANGE_STREAMS = {
+    'patients': (Patient, 'registered_by', PatientChangeSerializer),
+    'screenings': (ScreeningRecord, 'screened_by', ScreeningRecordChangeSerializer),
+    'follow_ups': (ScreeningFollowUp, 'screening_record__screened_by', ScreeningFollowUpChangeSerializer),
+}
+
+TOMBSTONE_STREAMS = {
+    'patient': 'patients',
+    'screening': 'screenings',
+    'follow_up': 'follow_ups',
+}
+
+
+class WatermarkExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = "Watermark expired, sync again from the start."
+    default_code = 'watermark_expired'
+
+
+def tombstone_cutoff(now=None):
+    """Tombstones deleted before this are pruned"""
+    return (now or timezone.now()) - timedelta(days=settings.SYNC_TOMBSTONE_RETAIN_DAYS)
+
+
+def encode_watermark(watermark: Dict) -> str:
+    payload = json.dumps(watermark, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_watermark(token: Optional[str]) -> Dict:
+    """Parse a watermark token; an empty token starts from the beginning.
+
+    The watermark holds one (updated_at, id) cursor per stream plus the
+    last tombstone id. Ties on updated_at are broken by id, so a page
+    boundary never skips rows saved in the same instant. It also holds the
+    horizon up to which the client has seen every tombstone; once
+    tombstones from after it may have been pruned, the watermark expires.
+    """
+    watermark = {name: None for name in CHANGE_STREAMS}
+    watermark['deleted'] = 0
+    watermark['horizon'] = None
+    if not token:
+        return watermark
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        for name in CHANGE_STREAMS:
+            cursor = decoded.get(name)
+            if cursor is not None:
+                updated_at, pk = cursor
+                datetime.fromisoformat(updated_at)
+                watermark[name] = [updated_at, int(pk)]
+        watermark['deleted'] = int(decoded.get('deleted', 0))
+        # Watermarks issued before tombstones were pruned carry no horizon
+        horizon = datetime.fromisoformat(decoded.get('horizon') or '0001-01-01T00:00:00+00:00')
+    except (binascii.Error, UnicodeError, ValueError, TypeError, AttributeError):
+        raise ValidationError({'since': "Invalid watermark."})
+    if horizon < tombstone_cutoff():
+        raise WatermarkExpired()
+    watermark['horizon'] = horizon.isoformat()
+    return watermark
+
+
+def _owned(queryset, user, owner_field):
+    if user.user_type in ['CHV', 'CLINICIAN']:
+        return queryset.filter(**{owner_field: user})
+    return queryset
+
+
+def collect_changes(user, token: Optional[str], limit: int, request=None) -> Dict:
+    """Rows created, updated or deleted since the watermark, one page per stream.
+
+    Rows saved in the last SYNC_CHANGES_LAG_SECONDS are held back, so a
+    transaction that commits late is not skipped by a watermark that has
+    already moved past it. Clients repeat the call with the returned
+    watermark while has_more is true. Deletions are reported to the owner
+    only; a row that moved to another owner is reported as deleted to the
+    previous owner and to nobody else.
+    """
+    watermark = decode_watermark(token)
+    horizon = timezone.now() - timedelta(seconds=settings.SYNC_CHANGES_LAG_SECONDS)
+    changes = {}
+    has_more = False
+
+    for name, (model, owner_field, serializer_class) in CHANGE_STREAMS.items():
+        queryset = _owned(model.objects.all(), user, owner_field).filter(updated_at__lt=horizon)
+        cursor = watermark[name]
+        if cursor is not None:
+            updated_at = datetime.fromisoformat(cursor[0])
+            queryset = queryset.filter(
+                Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=cursor[1])
+            )
+        rows = list(queryset.order_by('updated_at', 'id')[:limit + 1])
+        if len(rows) > limit:
+            has_more = True
+            rows = rows[:limit]
+        if rows:
+            watermark[name] = [rows[-1].updated_at.isoformat(), rows[-1].id]
+        changes[name] = serializer_class(rows, many=True, context={'request': request}).data
+
+    tombstones = SyncTombstone.objects.filter(id__gt=watermark['deleted'], deleted_at__lt=horizon)
+    if user.user_type in ['CHV', 'CLINICIAN']:
+        tombstones = tombstones.filter(owner_id=user.id)
+    else:
+        # Everyone else sees every row, so a change of owner removes nothing
+        tombstones = tombstones.filter(left_scope=False)
+    tombstones = list(
+        tombstones.order_by('id').values('id', 'model_name', 'object_id', 'client_uuid')[:limit + 1]
+    )
+    if len(tombstones) > limit:
+        has_more = True
+        tombstones = tombstones[:limit]
+    if tombstones:
+        watermark['deleted'] = tombstones[-1]['id']
+    # Mid-way through a catch-up the client has only seen everything up to its old horizon
+    if not has_more or watermark['horizon'] is None:
+        watermark['horizon'] = horizon.isoformat()
+    deleted = {name: [] for name in CHANGE_STREAMS}
+    for tombstone in tombstones:
+        deleted[TOMBSTONE_STREAMS[tombstone['model_name']]].append({
+            'id': tombstone['object_id'],
+            'client_uuid': tombstone['client_uuid'],
+        })
+
+    return {
+        'changes': changes,
+        'deleted': deleted,
+        'has_more': has_more,
+        'watermark': encode_watermark(watermark),
+    }
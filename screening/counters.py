@@ -0,0 +1,195 @@
+# screening/counters.py
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .aggregates import AggregateDelta
+from .models import ScreeningCounter, ScreeningRecord, ScreeningFollowUp
+
+COUNTER_FIELDS = (
+    'total_screenings', 'high_risk_count', 'moderate_risk_count',
+    'low_risk_count', 'referrals_made', 'follow_ups_pending',
+)
+
+RISK_LEVEL_FIELDS = {
+    'HIGH': 'high_risk_count',
+    'MODERATE': 'moderate_risk_count',
+    'LOW': 'low_risk_count',
+}
+
+# A bucket is (screener id, patient county, local screening day)
+Bucket = Tuple[int, str, date]
+
+SCREENING_SNAPSHOT_FIELDS = ('screened_by_id', 'patient__county', 'screening_date', 'risk_level', 'referral_needed')
+FOLLOW_UP_SNAPSHOT_FIELDS = (
+    'screening_record__screened_by_id', 'screening_record__patient__county',
+    'screening_record__screening_date', 'status',
+)
+
+
+def _bucket(screened_by_id, county, screening_date) -> Bucket:
+    if isinstance(screening_date, datetime):
+        screening_date = timezone.localdate(screening_date)
+    return (screened_by_id, county or '', screening_date)
+
+
+def screening_contribution(screened_by_id, county, screening_date, risk_level, referral_needed):
+    """(bucket, counts) a screening record adds to the counters"""
+    counts = {'total_screenings': 1}
+    if risk_level in RISK_LEVEL_FIELDS:
+        counts[RISK_LEVEL_FIELDS[risk_level]] = 1
+    if referral_needed:
+        counts['referrals_made'] = 1
+    return _bucket(screened_by_id, county, screening_date), counts
+
+
+def follow_up_contribution(screened_by_id, county, screening_date, status):
+    """(bucket, counts) a follow-up adds; follow-ups count towards their screening's bucket"""
+    counts = {'follow_ups_pending': 1} if status == 'PENDING' else {}
+    return _bucket(screened_by_id, county, screening_date), counts
+
+
+def screening_snapshot(record: ScreeningRecord):
+    return screening_contribution(
+        record.screened_by_id, record.patient.county, record.screening_date,
+        record.risk_level, record.referral_needed
+    )
+
+
+def follow_up_snapshot(follow_up: ScreeningFollowUp):
+    record = follow_up.screening_record
+    return follow_up_contribution(
+        record.screened_by_id, record.patient.county, record.screening_date, follow_up.status
+    )
+
+
+def stored_screening_snapshot(pk):
+    """Contribution of the screening record as currently stored, or None"""
+    values = ScreeningRecord.objects.filter(pk=pk).values_list(*SCREENING_SNAPSHOT_FIELDS).first()
+    return screening_contribution(*values) if values else None
+
+
+def stored_follow_up_snapshot(pk):
+    """Contribution of the follow-up as currently stored, or None"""
+    values = ScreeningFollowUp.objects.filter(pk=pk).values_list(*FOLLOW_UP_SNAPSHOT_FIELDS).first()
+    return follow_up_contribution(*values) if values else None
+
+
+class CounterDelta(AggregateDelta):
+    """Accumulates counter changes per bucket and applies them in one pass"""
+    model = ScreeningCounter
+    key_fields = ('scope', 'scope_key', 'period', 'period_start')
+    measure_fields = COUNTER_FIELDS
+
+    def rows(self) -> Dict[Tuple, Dict[str, int]]:
+        """Expand buckets into the counter rows they touch: every scope and period"""
+        rows = defaultdict(lambda: defaultdict(int))
+        for (user_id, county, day), counts in self.deltas.items():
+            for key in counter_keys(user_id, county, day):
+                for field, value in counts.items():
+                    rows[key][field] += value
+        return {key: {f: v for f, v in counts.items() if v} for key, counts in rows.items()}
+
+
+def counter_keys(user_id, county, day: date):
+    """(scope, scope_key, period, period_start) of every counter a bucket feeds"""
+    periods = (
+        (ScreeningCounter.ALL_TIME, ScreeningCounter.ALL_TIME_START),
+        (ScreeningCounter.MONTH, day.replace(day=1)),
+        (ScreeningCounter.DAY, day),
+    )
+    scopes = (
+        (ScreeningCounter.GLOBAL, ''),
+        (ScreeningCounter.USER, str(user_id)),
+        (ScreeningCounter.COUNTY, county),
+    )
+    return [(scope, scope_key, period, start) for scope, scope_key in scopes for period, start in periods]
+
+
+def record_screenings_created(records: Iterable[ScreeningRecord]) -> None:
+    """Count screenings written without signals, e.g. by bulk_create"""
+    delta = CounterDelta()
+    for record in records:
+        delta.add(screening_snapshot(record))
+    delta.apply()
+
+
+def record_follow_ups_created(follow_ups: Iterable[ScreeningFollowUp]) -> None:
+    """Count follow-ups written without signals, e.g. by bulk_create"""
+    delta = CounterDelta()
+    for follow_up in follow_ups:
+        delta.add(follow_up_snapshot(follow_up))
+    delta.apply()
+
+
+def move_patient_counters(patient_id, old_county, new_county) -> None:
+    """Re-file a patient's screenings and pending follow-ups after their county changed"""
+    delta = CounterDelta()
+    screenings = ScreeningRecord.objects.filter(patient_id=patient_id).values_list(
+        'screened_by_id', 'screening_date', 'risk_level', 'referral_needed'
+    )
+    for screened_by_id, screening_date, *values in screenings:
+        delta.change(
+            screening_contribution(screened_by_id, old_county, screening_date, *values),
+            screening_contribution(screened_by_id, new_county, screening_date, *values),
+        )
+    follow_ups = ScreeningFollowUp.objects.filter(
+        screening_record__patient_id=patient_id, status='PENDING'
+    ).values_list('screening_record__screened_by_id', 'screening_record__screening_date', 'status')
+    for screened_by_id, screening_date, status in follow_ups:
+        delta.change(
+            follow_up_contribution(screened_by_id, old_county, screening_date, status),
+            follow_up_contribution(screened_by_id, new_county, screening_date, status),
+        )
+    delta.apply()
+
+
+def get_summary(scope: str, scope_key: str = '', today: Optional[date] = None) -> Dict:
+    """Summary figures from the all-time and current-month counters"""
+    today = today or timezone.localdate()
+    rows = {
+        counter.period: counter
+        for counter in ScreeningCounter.objects.filter(
+            Q(period=ScreeningCounter.ALL_TIME, period_start=ScreeningCounter.ALL_TIME_START) |
+            Q(period=ScreeningCounter.MONTH, period_start=today.replace(day=1)),
+            scope=scope, scope_key=scope_key,
+        )
+    }
+    totals = rows.get(ScreeningCounter.ALL_TIME)
+    summary = {field: getattr(totals, field, 0) for field in COUNTER_FIELDS}
+    month = rows.get(ScreeningCounter.MONTH)
+    summary['screenings_this_month'] = month.total_screenings if month else 0
+    total = summary['total_screenings']
+    summary['high_risk_percentage'] = round(summary['high_risk_count'] / total * 100, 2) if total else 0.0
+    return summary
+
+
+def compute_counters(screening_model=ScreeningRecord,
+                     follow_up_model=ScreeningFollowUp) -> Dict[Tuple, Dict[str, int]]:
+    """Counter rows recomputed from scratch from the screening tables.
+
+    Migrations pass their historical models.
+    """
+    delta = CounterDelta()
+    # Group in the database; each group adds its contribution `count` times
+    screenings = (
+        screening_model.objects.order_by()
+        .annotate(day=TruncDate('screening_date'))
+        .values_list('screened_by_id', 'patient__county', 'day', 'risk_level', 'referral_needed')
+        .annotate(count=Count('id'))
+    )
+    for *values, count in screenings:
+        delta.add(screening_contribution(*values), count)
+    follow_ups = (
+        follow_up_model.objects.filter(status='PENDING').order_by()
+        .annotate(day=TruncDate('screening_record__screening_date'))
+        .values_list('screening_record__screened_by_id', 'screening_record__patient__county', 'day', 'status')
+        .annotate(count=Count('id'))
+    )
+    for *values, count in follow_ups:
+        delta.add(follow_up_contribution(*values), count)
+    return delta.rows()
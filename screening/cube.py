@@ -0,0 +1,168 @@
+# screening/cube.py
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import QuerySet, Sum
+from django.utils import timezone
+
+from .aggregates import AggregateDelta
+from .models import Patient, ScreeningOutcomeCube, ScreeningRecord, age_on
+
+CUBE_DIMENSIONS = ('county', 'sub_county', 'month', 'risk_level', 'hiv_status', 'age_band')
+CUBE_MEASURES = ('screenings', 'referrals', 'via_positive')
+
+# (upper age bound, label); the last band is open-ended
+AGE_BANDS = (
+    (25, 'UNDER_25'),
+    (30, '25-29'),
+    (35, '30-34'),
+    (40, '35-39'),
+    (45, '40-44'),
+    (50, '45-49'),
+    (None, '50_PLUS'),
+)
+
+# A cube key is the dimension values, in CUBE_DIMENSIONS order
+CubeKey = Tuple[str, str, date, str, str, str]
+
+PATIENT_FIELDS = ('county', 'sub_county', 'date_of_birth')
+RECORD_FIELDS = ('screening_date', 'risk_level', 'hiv_status', 'referral_needed', 'via_result')
+CUBE_SNAPSHOT_FIELDS = tuple(f'patient__{field}' for field in PATIENT_FIELDS) + RECORD_FIELDS
+
+
+def age_band(date_of_birth: date, on: date) -> str:
+    age = age_on(date_of_birth, on)
+    for limit, label in AGE_BANDS:
+        if limit is None or age < limit:
+            return label
+
+
+def cube_contribution(county, sub_county, date_of_birth, screening_date, risk_level, hiv_status,
+                      referral_needed, via_result):
+    """(key, measures) a screening record adds to the cube"""
+    if isinstance(screening_date, datetime):
+        screening_date = timezone.localdate(screening_date)
+    key = (
+        county or '', sub_county or '', screening_date.replace(day=1),
+        risk_level, hiv_status, age_band(date_of_birth, screening_date),
+    )
+    measures = {'screenings': 1}
+    if referral_needed:
+        measures['referrals'] = 1
+    if via_result == 'POSITIVE':
+        measures['via_positive'] = 1
+    return key, measures
+
+
+def cube_snapshot(record: ScreeningRecord):
+    patient = record.patient
+    return cube_contribution(
+        patient.county, patient.sub_county, patient.date_of_birth,
+        *(getattr(record, field) for field in RECORD_FIELDS)
+    )
+
+
+def stored_cube_snapshots(pks: Iterable[int]) -> Dict[int, Tuple]:
+    """Cube contributions of screening records as currently stored, by id"""
+    return {
+        pk: cube_contribution(*values)
+        for pk, *values in ScreeningRecord.objects.filter(pk__in=list(pks)).values_list('pk', *CUBE_SNAPSHOT_FIELDS)
+    }
+
+
+def stored_cube_snapshot(pk):
+    return stored_cube_snapshots([pk]).get(pk)
+
+
+def stored_patient_dimensions(pk) -> Optional[Tuple]:
+    return Patient.objects.filter(pk=pk).values_list(*PATIENT_FIELDS).first()
+
+
+class CubeDelta(AggregateDelta):
+    """Accumulates cube changes per key and applies them in one pass"""
+    model = ScreeningOutcomeCube
+    key_fields = CUBE_DIMENSIONS
+    measure_fields = CUBE_MEASURES
+
+
+def record_cube_screenings(records: Iterable[ScreeningRecord]) -> None:
+    """Add screenings written without signals, e.g. by bulk_create"""
+    delta = CubeDelta()
+    for record in records:
+        delta.add(cube_snapshot(record))
+    delta.apply()
+
+
+def move_patient_screenings(patient_id, old_dimensions, new_dimensions) -> None:
+    """Re-file a patient's screenings after their county, sub-county or birth date changed"""
+    delta = CubeDelta()
+    for values in ScreeningRecord.objects.filter(patient_id=patient_id).values_list(*RECORD_FIELDS):
+        delta.change(cube_contribution(*old_dimensions, *values), cube_contribution(*new_dimensions, *values))
+    delta.apply()
+
+
+def fold_cube(screenings: QuerySet) -> Dict[CubeKey, Dict[str, int]]:
+    """Cube rows the given screening records add up to"""
+    delta = CubeDelta()
+    # Age bands depend on the exact screening day, so rows are folded in Python
+    for values in screenings.order_by().values_list(*CUBE_SNAPSHOT_FIELDS).iterator(chunk_size=5000):
+        delta.add(cube_contribution(*values))
+    return delta.rows()
+
+
+def compute_cube(screening_model=ScreeningRecord) -> Dict[CubeKey, Dict[str, int]]:
+    """Cube rows recomputed from scratch from the screening tables.
+
+    Migrations pass their historical model.
+    """
+    return fold_cube(screening_model.objects.all())
+
+
+def query_cube(group_by: List[str], filters: Optional[Dict] = None,
+               start_month: Optional[date] = None, end_month: Optional[date] = None) -> List[Dict]:
+    """Roll the cube up to the `group_by` dimensions over the slice selected by `filters`.
+
+    filters maps dimension names to a value or a list of values. With no
+    group_by the result is a single grand-total row.
+    """
+    # Rows emptied by deletes are kept for reuse but never reported
+    queryset = ScreeningOutcomeCube.objects.filter(screenings__gt=0)
+    for dimension, value in (filters or {}).items():
+        if isinstance(value, (list, tuple)):
+            queryset = queryset.filter(**{f'{dimension}__in': value})
+        else:
+            queryset = queryset.filter(**{dimension: value})
+    if start_month:
+        queryset = queryset.filter(month__gte=start_month.replace(day=1))
+    if end_month:
+        queryset = queryset.filter(month__lte=end_month.replace(day=1))
+    totals = {measure: Sum(measure) for measure in CUBE_MEASURES}
+    if not group_by:
+        row = queryset.aggregate(**totals)
+        return [{measure: row[measure] or 0 for measure in CUBE_MEASURES}]
+    return list(queryset.order_by(*group_by).values(*group_by).annotate(**totals))
+
+
+def query_screenings(screenings: QuerySet, group_by: List[str], filters: Optional[Dict] = None,
+                     start_month: Optional[date] = None, end_month: Optional[date] = None) -> List[Dict]:
+    """query_cube over just the given screening records, folded from the records themselves.
+
+    The cube has no screener dimension, so callers limited to their own
+    screenings are answered this way; the rows returned are the same shape.
+    """
+    totals = defaultdict(lambda: dict.fromkeys(CUBE_MEASURES, 0))
+    for key, measures in fold_cube(screenings).items():
+        row = dict(zip(CUBE_DIMENSIONS, key))
+        if any(row[dimension] not in (value if isinstance(value, (list, tuple)) else [value])
+               for dimension, value in (filters or {}).items()):
+            continue
+        if (start_month and row['month'] < start_month.replace(day=1)) or \
+                (end_month and row['month'] > end_month.replace(day=1)):
+            continue
+        group = totals[tuple(row[dimension] for dimension in group_by)]
+        for measure, value in measures.items():
+            group[measure] += value
+    if not group_by:
+        return [totals[()]]
+    return [dict(zip(group_by, group), **measures) for group, measures in sorted(totals.items())]
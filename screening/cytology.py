@@ -0,0 +1,142 @@
+# screening/cytology.py
+import hashlib
+from io import BytesIO
+from typing import Tuple
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+
+from jobs.queue import enqueue
+from .models import CytologyImage
+
+logger = logging.getLogger(__name__)
+
+# Pillow format -> (content type, file extension) of accepted uploads
+ALLOWED_FORMATS = {
+    'JPEG': ('image/jpeg', '.jpg'),
+    'PNG': ('image/png', '.png'),
+    'WEBP': ('image/webp', '.webp'),
+    'TIFF': ('image/tiff', '.tif'),
+}
+
+# Registered in screening/jobs.py
+THUMBNAIL_JOB = 'screening.cytology_thumbnail'
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Stream uploads to a temporary file, hashing each chunk on the way.
+
+    The finished TemporaryUploadedFile carries a .sha256 attribute, so a
+    duplicate can be recognised without reading the file a second time.
+    A file over CYTOLOGY_MAX_UPLOAD_MB is dropped as soon as it passes the
+    limit and `too_large` is set, so an oversized upload never fills the disk.
+    """
+    too_large = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.CYTOLOGY_MAX_UPLOAD_MB * 1024 * 1024:
+            self.too_large = True
+            # The parser closes, and so deletes, the partial temporary file
+            raise SkipFile()
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.digest.hexdigest()
+        return uploaded
+
+
+def detect_format(uploaded) -> Tuple[str, str]:
+    """(content type, extension) from the image header; ValueError if not an accepted image"""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(uploaded.temporary_file_path()) as image:
+            image_format = image.format
+    except (UnidentifiedImageError, OSError):
+        raise ValueError("File is not a readable image.")
+    if image_format not in ALLOWED_FORMATS:
+        raise ValueError(f"Unsupported image format {image_format}.")
+    return ALLOWED_FORMATS[image_format]
+
+
+def store_upload(uploaded, user) -> Tuple[CytologyImage, bool]:
+    """Store an uploaded image once per content hash; returns (image, created).
+
+    Raises ValueError if the upload is not an accepted image format.
+
+    The temporary file is moved into storage rather than copied, and the
+    thumbnail is queued as a job in the same transaction as the image row.
+    """
+    existing = CytologyImage.objects.filter(sha256=uploaded.sha256).first()
+    if existing is not None:
+        return existing, False
+
+    content_type, extension = detect_format(uploaded)
+    name = f"cytology_images/{uploaded.sha256[:2]}/{uploaded.sha256}{extension}"
+    stored_name = default_storage.save(name, uploaded)
+    try:
+        with transaction.atomic():
+            image = CytologyImage.objects.create(
+                sha256=uploaded.sha256,
+                image=stored_name,
+                content_type=content_type,
+                size=uploaded.size,
+                uploaded_by=user,
+            )
+            enqueue(THUMBNAIL_JOB, image_id=image.pk)
+    except IntegrityError:
+        # The same image was uploaded concurrently; keep the first copy
+        default_storage.delete(stored_name)
+        return CytologyImage.objects.get(sha256=uploaded.sha256), False
+
+    return image, True
+
+
+def make_thumbnail(path_or_file, size: int) -> Tuple[bytes, int, int]:
+    """Downscale an image to fit in size x size; returns (JPEG bytes, width, height) of the original"""
+    from PIL import Image, ImageOps
+
+    with Image.open(path_or_file) as original:
+        width, height = original.size
+        # Lets the JPEG decoder downscale while decoding, much cheaper for phone photos
+        original.draft('RGB', (size, size))
+        thumbnail = ImageOps.exif_transpose(original)
+        thumbnail = thumbnail.convert('RGB')
+        thumbnail.thumbnail((size, size))
+        buffer = BytesIO()
+        thumbnail.save(buffer, format='JPEG', quality=settings.CYTOLOGY_THUMBNAIL_QUALITY, optimize=True)
+    return buffer.getvalue(), width, height
+
+
+def generate_thumbnail(image_id: int) -> None:
+    """Store the thumbnail of an image; an image that cannot be decoded is marked FAILED.
+
+    Storage errors propagate, so the job is retried.
+    """
+    image = CytologyImage.objects.filter(pk=image_id).first()
+    if image is None or image.status == CytologyImage.READY:
+        return
+    with image.image.open('rb') as f:
+        try:
+            data, width, height = make_thumbnail(f, settings.CYTOLOGY_THUMBNAIL_SIZE)
+        except Exception as e:
+            logger.error(f"Could not create thumbnail for cytology image {image_id}: {e}")
+            image.status = CytologyImage.FAILED
+            image.save(update_fields=['status', 'updated_at'])
+            return
+
+    image.thumbnail.save(f"{image.sha256}.jpg", ContentFile(data), save=False)
+    image.width = width
+    image.height = height
+    image.status = CytologyImage.READY
+    image.save(update_fields=['thumbnail', 'width', 'height', 'status', 'updated_at'])
@@ -0,0 +1,183 @@
+# screening/export.py
+import csv
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List
+
+from django.utils import timezone
+
+from .models import ScreeningRecord, age_on
+
+# (column, ORM lookup). Patients appear only by id and age at screening.
+EXPORT_FIELDS = [
+    ('screening_id', 'id'),
+    ('screening_date', 'screening_date'),
+    ('county', 'patient__county'),
+    ('sub_county', 'patient__sub_county'),
+    ('patient_id', 'patient_id'),
+    ('age_at_screening', 'patient__date_of_birth'),
+    ('screened_by_id', 'screened_by_id'),
+    ('age_at_first_intercourse', 'age_at_first_intercourse'),
+    ('number_of_sexual_partners', 'number_of_sexual_partners'),
+    ('parity', 'parity'),
+    ('hiv_status', 'hiv_status'),
+    ('hpv_vaccination_status', 'hpv_vaccination_status'),
+    ('contraceptive_use', 'contraceptive_use'),
+    ('smoking_status', 'smoking_status'),
+    ('family_history_cervical_cancer', 'family_history_cervical_cancer'),
+    ('previous_abnormal_pap', 'previous_abnormal_pap'),
+    ('via_result', 'via_result'),
+    ('bethesda_category', 'bethesda_category'),
+    ('ai_risk_score', 'ai_risk_score'),
+    ('risk_level', 'risk_level'),
+    ('ai_confidence', 'ai_confidence'),
+    ('referral_needed', 'referral_needed'),
+    ('model_version', 'model_version'),
+]
+COLUMNS = [column for column, _ in EXPORT_FIELDS]
+AGE_COLUMN = COLUMNS.index('age_at_screening')
+DATE_COLUMN = COLUMNS.index('screening_date')
+
+RISK_LEVELS = [level for level, _ in ScreeningRecord.RISK_LEVELS]
+
+
+def parse_filters(params) -> Dict:
+    """Export filters from request or command options; ValueError on bad input"""
+    filters = {}
+    county = (params.get('county') or '').strip()
+    if county:
+        filters['patient__county__iexact'] = county
+    risk_level = (params.get('risk_level') or '').strip().upper()
+    if risk_level:
+        if risk_level not in RISK_LEVELS:
+            raise ValueError(f"risk_level must be one of {', '.join(RISK_LEVELS)}")
+        filters['risk_level'] = risk_level
+    # Whole local days, as bounds on screening_date so its index can be used
+    tz = timezone.get_current_timezone()
+    start_date, end_date = params.get('start_date'), params.get('end_date')
+    try:
+        if start_date:
+            filters['screening_date__gte'] = datetime.combine(date.fromisoformat(start_date), time.min, tz)
+        if end_date:
+            next_day = date.fromisoformat(end_date) + timedelta(days=1)
+            filters['screening_date__lt'] = datetime.combine(next_day, time.min, tz)
+    except (TypeError, ValueError):
+        raise ValueError("start_date and end_date must be YYYY-MM-DD")
+    return filters
+
+
+def export_rows(filters: Dict, chunk_size: int) -> Iterator[list]:
+    """Matching screenings as rows of COLUMNS, fetched chunk_size rows at a time.
+
+    iterator() streams from a server-side cursor where the database has one,
+    so memory use does not depend on the size of the export.
+    """
+    queryset = (
+        ScreeningRecord.objects.filter(**filters)
+        .order_by('screening_date', 'id')
+        .values_list(*[lookup for _, lookup in EXPORT_FIELDS])
+    )
+    for values in queryset.iterator(chunk_size=chunk_size):
+        row = list(values)
+        row[AGE_COLUMN] = age_on(row[AGE_COLUMN], timezone.localdate(row[DATE_COLUMN]))
+        yield row
+
+
+def chunked(rows: Iterable, size: int) -> Iterator[List]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_csv(rows: Iterable[list], chunk_size: int) -> Iterator[str]:
+    """CSV text in one piece per chunk of rows, header first"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for chunk in chunked(rows, chunk_size):
+        for row in chunk:
+            row[DATE_COLUMN] = timezone.localtime(row[DATE_COLUMN]).isoformat()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _ChunkSink:
+    """Write-only file object that hands back what was written since the last take()"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    types = {
+        'screening_id': pa.int64(),
+        'screening_date': pa.timestamp('us', tz='UTC'),
+        'patient_id': pa.int64(),
+        'age_at_screening': pa.int32(),
+        'screened_by_id': pa.int64(),
+        'age_at_first_intercourse': pa.int32(),
+        'number_of_sexual_partners': pa.int32(),
+        'parity': pa.int32(),
+        'family_history_cervical_cancer': pa.bool_(),
+        'previous_abnormal_pap': pa.bool_(),
+        'ai_risk_score': pa.float64(),
+        'ai_confidence': pa.float64(),
+        'referral_needed': pa.bool_(),
+    }
+    return pa.schema([(column, types.get(column, pa.string())) for column in COLUMNS])
+
+
+def stream_parquet(rows: Iterable[list], chunk_size: int) -> Iterator[bytes]:
+    """Parquet file bytes, one row group per chunk of rows; needs pandas and pyarrow"""
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression='snappy') as writer:
+        for chunk in chunked(rows, chunk_size):
+            frame = pd.DataFrame.from_records(chunk, columns=COLUMNS)
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            yield sink.take()
+    # The footer is written on close
+    yield sink.take()
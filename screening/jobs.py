@@ -0,0 +1,9 @@
+# screening/jobs.py
+from jobs.queue import job
+from .cytology import THUMBNAIL_JOB, generate_thumbnail
+
+
+@job(THUMBNAIL_JOB, max_attempts=3)
+def cytology_thumbnail(image_id: int):
+    """Thumbnail of an uploaded cytology image; a no-op once it is READY"""
+    generate_thumbnail(image_id)
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class RebuildAggregateCommand(BaseCommand):
+    """Recompute an aggregate table from the screening tables and fix any drift.
+
+    Subclasses set delta_class (an AggregateDelta naming the table), the
+    label and drift_label used in messages, and compute(), which returns
+    the expected rows.
+    """
+    delta_class = None
+    label = 'rows'
+    drift_label = 'rows'
+    shown = 20
+
+    def compute(self):
+        raise NotImplementedError
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help=f"Report drifted {self.drift_label} without writing")
+
+    def handle(self, *args, **options):
+        fields = self.delta_class.measure_fields
+        with transaction.atomic():
+            expected = self.compute()
+            # Lock the table so no increment lands between the diff and the write
+            existing = self.delta_class.stored_rows(lock=True)
+
+            drifted = []
+            for key in sorted(set(expected) | set(existing)):
+                row = existing.get(key)
+                actual = {field: getattr(row, field, 0) for field in fields}
+                wanted = {field: expected.get(key, {}).get(field, 0) for field in fields}
+                if actual != wanted:
+                    drifted.append((key, actual, wanted))
+
+            for key, actual, wanted in drifted[:self.shown]:
+                changes = ', '.join(
+                    f"{field} {actual[field]} -> {wanted[field]}"
+                    for field in fields if actual[field] != wanted[field]
+                )
+                self.stdout.write(f"  {' / '.join(str(value) or '-' for value in key)}: {changes}")
+            if len(drifted) > self.shown:
+                self.stdout.write(f"  ... and {len(drifted) - self.shown} more")
+
+            if options['dry_run']:
+                self.stdout.write(self.style.WARNING(f"Dry run, {len(drifted)} {self.drift_label} drifted"))
+                return
+
+            self.delta_class.replace_all(expected)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(expected)} {self.label}, {len(drifted)} had drifted"
+        ))
@@ -0,0 +1,193 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from accounts.models import User
+from screening.models import Patient, ScreeningRecord, ScreeningFollowUp
+
+# The list filter indexes from migration 0009, toggled off for the "before" run;
+# every other index stays
+BENCHMARKED_INDEXES = {
+    ScreeningRecord: ('screening_patient_date_idx', 'screening_risk_date_idx', 'screening_owner_risk_date_idx'),
+    ScreeningFollowUp: ('followup_status_date_idx',),
+}
+
+RISK_LEVELS = ['LOW', 'MODERATE', 'HIGH']
+FOLLOW_UP_STATUSES = ['PENDING', 'CONTACTED', 'COMPLETED', 'MISSED', 'LOST']
+
+
+def insert_rows(model, rows, batch_size=5000):
+    """Insert dicts of field values with executemany, bypassing auto_now fields.
+
+    Fields missing from a row take their model default, so synthetic rows
+    only need the columns the benchmark varies.
+    """
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    sql = f"INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({columns}) VALUES ({placeholders})"
+    defaults = {field.attname: field.get_default() for field in fields}
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, [
+                [
+                    field.get_db_prep_save(row.get(field.attname, defaults[field.attname]), connection)
+                    for field in fields
+                ]
+                for row in rows[start:start + batch_size]
+            ])
+
+
+class Command(BaseCommand):
+    help = "Compare query plans and timings of the screening list filters with and without their indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help="Synthetic screening records to generate")
+        parser.add_argument('--screeners', type=int, default=500, help="Synthetic CHV accounts")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per query")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        # Work in a throwaway test database so real data is never touched
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            random.seed(options['seed'])
+            started = time.perf_counter()
+            params = self.generate(options['rows'], options['screeners'])
+            self.stdout.write(
+                f"Generated {options['rows']} screening records in {time.perf_counter() - started:.1f}s"
+            )
+
+            indexes = [
+                (model, index)
+                for model, names in BENCHMARKED_INDEXES.items()
+                for index in model._meta.indexes if index.name in names
+            ]
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.remove_index(model, index)
+            self.analyze()
+            before = self.run_queries(params, options['repeat'], 'Without indexes')
+
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.add_index(model, index)
+            self.analyze()
+            after = self.run_queries(params, options['repeat'], 'With indexes')
+
+            self.stdout.write(self.style.MIGRATE_HEADING("Median time per query (ms)"))
+            for name in before:
+                speedup = before[name] / after[name] if after[name] else float('inf')
+                self.stdout.write(f"  {name:<32} {before[name]:>10.2f} {after[name]:>10.2f}  x{speedup:.1f}")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def generate(self, rows, screeners):
+        now = timezone.now()
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(email=f'bench{n}@example.com', username=f'bench{n}', user_type='CHV')
+                for n in range(screeners)
+            ])
+            user_ids = list(User.objects.values_list('id', flat=True))
+
+            patient_count = max(rows // 4, 1)
+            Patient.objects.bulk_create([
+                Patient(
+                    first_name='Bench', last_name=str(n), date_of_birth=date(1970, 1, 1) + timedelta(days=n % 12000),
+                    phone_number=f'07{n:08d}', national_id=f'B{n}', county='Kisumu', sub_county='Kisumu East',
+                    location='Bench', marital_status='MARRIED', registered_by_id=random.choice(user_ids)
+                )
+                for n in range(patient_count)
+            ], batch_size=5000)
+            patient_ids = list(Patient.objects.values_list('id', flat=True))
+
+            insert_rows(ScreeningRecord, [
+                {
+                    'patient_id': random.choice(patient_ids),
+                    'screened_by_id': random.choice(user_ids),
+                    'screening_date': now - timedelta(minutes=random.randrange(3 * 365 * 24 * 60)),
+                    'age_at_first_intercourse': 18,
+                    'hiv_status': 'NEGATIVE',
+                    'hpv_vaccination_status': 'UNKNOWN',
+                    'contraceptive_use': 'NONE',
+                    'smoking_status': 'NEVER',
+                    'ai_risk_score': 0.5,
+                    'risk_level': random.choices(RISK_LEVELS, weights=[70, 20, 10])[0],
+                    'ai_confidence': 0.8,
+                    'recommended_action': 'Routine screening',
+                    'created_at': now,
+                    'updated_at': now,
+                }
+                for _ in range(rows)
+            ])
+            record_ids = list(ScreeningRecord.objects.values_list('id', flat=True))
+
+            today = now.date()
+            insert_rows(ScreeningFollowUp, [
+                {
+                    'screening_record_id': random.choice(record_ids),
+                    'follow_up_date': today + timedelta(days=random.randrange(-365, 365)),
+                    'status': random.choices(FOLLOW_UP_STATUSES, weights=[15, 10, 65, 5, 5])[0],
+                    'created_at': now,
+                    'updated_at': now,
+                }
+                for _ in range(rows // 2)
+            ])
+        return {
+            'user_id': random.choice(user_ids),
+            'patient_id': random.choice(patient_ids),
+            'start': now - timedelta(days=90),
+            'end': now - timedelta(days=60),
+            'today': today,
+        }
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def queries(self, params):
+        """The list view query shapes, each limited to one page"""
+        records = ScreeningRecord.objects.order_by('-screening_date', '-id')
+        follow_ups = ScreeningFollowUp.objects.order_by('-follow_up_date', '-id')
+        return {
+            'screenings by screener': records.filter(screened_by_id=params['user_id'])[:20],
+            'screenings by patient': records.filter(patient_id=params['patient_id'])[:20],
+            'screenings by risk and dates': records.filter(
+                risk_level='HIGH', screening_date__gte=params['start'], screening_date__lte=params['end']
+            )[:20],
+            'screener by risk level': records.filter(
+                screened_by_id=params['user_id'], risk_level='HIGH'
+            )[:20],
+            'follow-ups by status': follow_ups.filter(status='MISSED')[:20],
+            'overdue follow-ups': follow_ups.filter(
+                follow_up_date__lt=params['today'], status='PENDING'
+            )[:20],
+            'overdue follow-up count': ScreeningFollowUp.objects.filter(
+                follow_up_date__lt=params['today'], status='PENDING'
+            ),
+        }
+
+    def run_queries(self, params, repeat, heading):
+        self.stdout.write(self.style.MIGRATE_HEADING(heading))
+        timings = {}
+        for name, queryset in self.queries(params).items():
+            count_only = name.endswith('count')
+            self.stdout.write(f"  {name}:")
+            plan = queryset.explain() if not count_only else queryset.order_by().values('id').explain()
+            for line in plan.splitlines():
+                self.stdout.write(f"      {line}")
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                if count_only:
+                    queryset.count()
+                else:
+                    list(queryset.values_list('id', flat=True))
+                samples.append((time.perf_counter() - started) * 1000)
+            timings[name] = statistics.median(samples)
+        return timings
@@ -0,0 +1,46 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from screening.export import export_rows, parse_filters, parquet_available, stream_csv, stream_parquet
+
+
+class Command(BaseCommand):
+    help = "Export screenings filtered by county, date range and risk level to CSV or Parquet"
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="File to write, or - for standard output")
+        parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+        parser.add_argument('--county')
+        parser.add_argument('--start-date', help="First screening day, YYYY-MM-DD")
+        parser.add_argument('--end-date', help="Last screening day, YYYY-MM-DD")
+        parser.add_argument('--risk-level')
+        parser.add_argument('--chunk-size', type=int, default=settings.SCREENING_EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['format'] == 'parquet' and not parquet_available():
+            raise CommandError("Parquet export needs pyarrow installed")
+        try:
+            filters = parse_filters(options)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunk_size = options['chunk_size']
+        rows = export_rows(filters, chunk_size)
+        if options['format'] == 'parquet':
+            chunks = stream_parquet(rows, chunk_size)
+        else:
+            chunks = (chunk.encode('utf-8') for chunk in stream_csv(rows, chunk_size))
+
+        to_stdout = options['output'] == '-'
+        out = sys.stdout.buffer if to_stdout else open(options['output'], 'wb')
+        written = 0
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if not to_stdout:
+                out.close()
+        if not to_stdout:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}"))
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from screening.changes import tombstone_cutoff
+from screening.models import SyncTombstone
+
+
+class Command(BaseCommand):
+    help = "Delete sync tombstones older than SYNC_TOMBSTONE_RETAIN_DAYS"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Count the tombstones without deleting them")
+
+    def handle(self, *args, **options):
+        cutoff = tombstone_cutoff()
+        expired = SyncTombstone.objects.filter(deleted_at__lt=cutoff)
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f"Dry run, {expired.count()} tombstones older than {cutoff:%Y-%m-%d %H:%M} would be deleted"
+            ))
+            return
+        deleted, _ = expired.delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} tombstones older than {settings.SYNC_TOMBSTONE_RETAIN_DAYS} days"
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from screening.search import install_search_index
+
+
+class Command(BaseCommand):
+    help = "Recreate the patient search index and reindex every patient"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            install_search_index(connection)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt patient search index ({connection.vendor})"))
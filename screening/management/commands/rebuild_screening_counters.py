@@ -0,0 +1,13 @@
+from screening.counters import CounterDelta, compute_counters
+
+from ._rebuild import RebuildAggregateCommand
+
+
+class Command(RebuildAggregateCommand):
+    help = "Recompute the screening summary counters from the screening tables and fix any drift"
+    delta_class = CounterDelta
+    label = 'screening counters'
+    drift_label = 'counters'
+
+    def compute(self):
+        return compute_counters()
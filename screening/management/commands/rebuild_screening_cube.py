@@ -0,0 +1,13 @@
+from screening.cube import CubeDelta, compute_cube
+
+from ._rebuild import RebuildAggregateCommand
+
+
+class Command(RebuildAggregateCommand):
+    help = "Recompute the screening outcome cube from the screening tables and fix any drift"
+    delta_class = CubeDelta
+    label = 'outcome cube rows'
+    drift_label = 'cube rows'
+
+    def compute(self):
+        return compute_cube()
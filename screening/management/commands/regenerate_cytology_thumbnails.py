@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from jobs.models import Job
+from jobs.queue import enqueue
+from screening.cytology import THUMBNAIL_JOB
+from screening.models import CytologyImage
+
+
+class Command(BaseCommand):
+    help = "Queue thumbnail jobs for cytology images that are still pending or whose thumbnail failed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report the images without queueing jobs")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Images whose job is still waiting or running are left to it
+            queued = set(
+                Job.objects.filter(name=THUMBNAIL_JOB, status__in=[Job.PENDING, Job.RUNNING])
+                .values_list('payload__image_id', flat=True)
+            )
+            image_ids = [
+                pk for pk in CytologyImage.objects.filter(
+                    status__in=[CytologyImage.PENDING, CytologyImage.FAILED]
+                ).order_by('pk').values_list('pk', flat=True)
+                if pk not in queued
+            ]
+            if options['dry_run']:
+                self.stdout.write(self.style.WARNING(f"Dry run, {len(image_ids)} images need a thumbnail"))
+                return
+            for image_id in image_ids:
+                enqueue(THUMBNAIL_JOB, image_id=image_id)
+        self.stdout.write(self.style.SUCCESS(f"Queued thumbnails for {len(image_ids)} images"))
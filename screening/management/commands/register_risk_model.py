@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from screening.model_registry import ModelRegistry
+
+
+class Command(BaseCommand):
+    help = "Register a trained risk model in the versioned model registry, or activate an existing version"
+
+    def add_arguments(self, parser):
+        parser.add_argument('model_file', nargs='?', help="Path to the trained model (.pkl) to register")
+        parser.add_argument('--model-version', dest='model_version', help="Version label (defaults to a UTC timestamp)")
+        parser.add_argument('--no-activate', action='store_true', help="Register without making it the active model")
+        parser.add_argument('--activate', dest='activate_version', help="Activate an already registered version")
+        parser.add_argument('--list', action='store_true', help="List registered versions")
+
+    def handle(self, *args, **options):
+        registry = ModelRegistry(settings.AI_MODEL_PATH, settings.RISK_PREDICTION_MODEL)
+
+        if options['list']:
+            manifest = registry.read_manifest()
+            for version, entry in sorted(manifest['versions'].items()):
+                marker = '*' if version == manifest.get('current') else ' '
+                self.stdout.write(f"{marker} {version}  {entry['sha256'][:12]}  {entry['file']}")
+            return
+
+        try:
+            if options['activate_version']:
+                artifact = registry.activate(options['activate_version'])
+            elif options['model_file']:
+                artifact = registry.register(
+                    options['model_file'],
+                    version=options['model_version'],
+                    activate=not options['no_activate'],
+                )
+            else:
+                raise CommandError("Provide a model file to register or --activate VERSION")
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        status = "registered" if options['model_file'] and not options['activate_version'] else "activated"
+        self.stdout.write(self.style.SUCCESS(
+            f"Model {artifact.version} ({artifact.sha256[:12]}) {status}. "
+            "Running workers pick up the active model on their next reload check."
+        ))
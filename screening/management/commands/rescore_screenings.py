@@ -0,0 +1,196 @@
+import json
+import os
+import time
+from collections import Counter, deque
+from itertools import islice
+import multiprocessing
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+from screening.ai_service import SCREENING_INPUT_FIELDS, risk_predictor
+from screening.counters import CounterDelta, screening_contribution
+from screening.cube import CubeDelta, stored_cube_snapshots
+from screening.models import ScreeningRecord, age_on
+from screening.work_queue import update_priorities
+
+RESULT_FIELDS = [
+    'ai_risk_score', 'risk_level', 'ai_confidence',
+    'referral_needed', 'recommended_action', 'model_version',
+]
+
+ROW_FIELDS = ['pk', *SCREENING_INPUT_FIELDS, 'screening_date', 'patient__date_of_birth', *RESULT_FIELDS]
+
+
+def age_at_screening(date_of_birth, screening_date):
+    """Patient age on the screening day, computed like Patient.age"""
+    return age_on(date_of_birth, timezone.localdate(screening_date))
+
+
+def score_rows(rows):
+    """Re-score a chunk of ROW_FIELDS tuples; returns (pk, old, new) result tuples"""
+    inputs = []
+    for row in rows:
+        values = dict(zip(ROW_FIELDS, row))
+        data = {field: values[field] for field in SCREENING_INPUT_FIELDS}
+        data['age'] = age_at_screening(values['patient__date_of_birth'], values['screening_date'])
+        inputs.append(data)
+
+    offset = len(ROW_FIELDS) - len(RESULT_FIELDS)
+    results = []
+    for row, prediction in zip(rows, risk_predictor.predict_batch(inputs)):
+        new = (
+            prediction['risk_score'], prediction['risk_level'], prediction['confidence'],
+            prediction['referral_needed'], prediction['recommended_action'], prediction['model_version'],
+        )
+        results.append((row[0], tuple(row[offset:]), new))
+    return results
+
+
+class Command(BaseCommand):
+    help = "Recompute AI risk results for existing screening records in vectorized batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Records scored and written per batch")
+        parser.add_argument('--workers', type=int, default=1, help="Processes used for scoring")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing")
+        parser.add_argument('--checkpoint', help="JSON file recording progress after every written batch")
+        parser.add_argument('--resume', action='store_true', help="Continue after the id stored in --checkpoint")
+        parser.add_argument('--model-version', dest='model_version', help="Only re-score records scored by this version")
+        parser.add_argument('--outdated-only', action='store_true', help="Skip records already scored by the active model")
+        parser.add_argument('--limit', type=int, help="Stop after this many records")
+        parser.add_argument('--show', type=int, default=10, help="Changed records to list in a dry run")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        checkpoint_path = options['checkpoint']
+        if options['resume'] and not checkpoint_path:
+            raise CommandError("--resume requires --checkpoint")
+
+        risk_predictor.ensure_loaded()
+        queryset = ScreeningRecord.objects.order_by('pk')
+        if options['model_version'] is not None:
+            queryset = queryset.filter(model_version=options['model_version'])
+        if options['outdated_only']:
+            queryset = queryset.exclude(model_version=risk_predictor.model_version)
+
+        progress = {'last_id': 0, 'scanned': 0, 'changed': 0}
+        if options['resume'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                progress = json.load(f)
+            queryset = queryset.filter(pk__gt=progress['last_id'])
+            self.stdout.write(f"Resuming after screening record {progress['last_id']}")
+        if options['limit']:
+            queryset = queryset[:options['limit']]
+
+        rows = queryset.values_list(*ROW_FIELDS).iterator(chunk_size=chunk_size)
+        chunks = iter(lambda: list(islice(rows, chunk_size)), [])
+
+        self.transitions = Counter()
+        self.shown = 0
+        started = time.monotonic()
+        for results in self._score_chunks(chunks, options['workers']):
+            changed = [(pk, old, new) for pk, old, new in results if old != new]
+            if options['dry_run']:
+                self._report(changed, options['show'])
+            else:
+                self._write(changed)
+            progress['last_id'] = results[-1][0]
+            progress['scanned'] += len(results)
+            progress['changed'] += len(changed)
+            if checkpoint_path and not options['dry_run']:
+                self._save_checkpoint(checkpoint_path, progress)
+            self.stdout.write(
+                f"Scanned {progress['scanned']} records, {progress['changed']} changed "
+                f"(up to id {progress['last_id']}, {time.monotonic() - started:.1f}s)"
+            )
+
+        if options['dry_run']:
+            for (old_level, new_level), count in sorted(self.transitions.items()):
+                self.stdout.write(f"  {old_level} -> {new_level}: {count}")
+            self.stdout.write(self.style.WARNING("Dry run, no records were updated"))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Re-scored {progress['scanned']} records, {progress['changed']} updated"
+            ))
+
+    def _score_chunks(self, chunks, workers):
+        """Yield scored chunks in order, scoring up to `workers` chunks in parallel"""
+        if workers <= 1:
+            for rows in chunks:
+                yield score_rows(rows)
+            return
+
+        # Children are forked after the model is loaded so they share it; only
+        # this process talks to the database.
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            pending = deque()
+            for rows in chunks:
+                pending.append(pool.apply_async(score_rows, (rows,)))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+
+    def _write(self, changed):
+        if not changed:
+            return
+        now = timezone.now()
+        records = []
+        for pk, _, new in changed:
+            record = ScreeningRecord(pk=pk, updated_at=now)
+            for field, value in zip(RESULT_FIELDS, new):
+                setattr(record, field, value)
+            records.append(record)
+        with transaction.atomic():
+            pks = [pk for pk, _, _ in changed]
+            cube_before = stored_cube_snapshots(pks)
+            ScreeningRecord.objects.bulk_update(records, RESULT_FIELDS + ['updated_at'])
+            self._update_counters(changed)
+            cube = CubeDelta()
+            cube.change_all(cube_before, stored_cube_snapshots(pks))
+            cube.apply()
+            level_index = RESULT_FIELDS.index('risk_level')
+            referral_index = RESULT_FIELDS.index('referral_needed')
+            update_priorities({
+                pk: (new[level_index], new[referral_index]) for pk, _, new in changed
+            })
+
+    def _update_counters(self, changed):
+        """Move re-scored records between risk and referral counters"""
+        level_index = RESULT_FIELDS.index('risk_level')
+        referral_index = RESULT_FIELDS.index('referral_needed')
+        buckets = {
+            pk: (screened_by_id, county, screening_date)
+            for pk, screened_by_id, county, screening_date in ScreeningRecord.objects.filter(
+                pk__in=[pk for pk, _, _ in changed]
+            ).values_list('pk', 'screened_by_id', 'patient__county', 'screening_date')
+        }
+        delta = CounterDelta()
+        for pk, old, new in changed:
+            delta.change(
+                screening_contribution(*buckets[pk], old[level_index], old[referral_index]),
+                screening_contribution(*buckets[pk], new[level_index], new[referral_index]),
+            )
+        delta.apply()
+
+    def _report(self, changed, show):
+        level_index = RESULT_FIELDS.index('risk_level')
+        score_index = RESULT_FIELDS.index('ai_risk_score')
+        referral_index = RESULT_FIELDS.index('referral_needed')
+        for pk, old, new in changed:
+            self.transitions[(old[level_index], new[level_index])] += 1
+            if self.shown < show:
+                self.shown += 1
+                self.stdout.write(
+                    f"  #{pk}: score {old[score_index]} -> {new[score_index]}, "
+                    f"{old[level_index]} -> {new[level_index]}, "
+                    f"referral {old[referral_index]} -> {new[referral_index]}"
+                )
+
+    def _save_checkpoint(self, path, progress):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(progress, f)
+        os.replace(tmp_path, path)
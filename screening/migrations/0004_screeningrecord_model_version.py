@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("screening", "0003_alter_patient_registered_by"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="screeningrecord",
+            name="model_version",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                help_text="Version of the AI model (or fallback rules) that produced the score",
+                max_length=64,
+            ),
+        ),
+    ]
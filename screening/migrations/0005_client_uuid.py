@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("screening", "0004_screeningrecord_model_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="patient",
+            name="client_uuid",
+            field=models.UUIDField(blank=True, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name="screeningfollowup",
+            name="client_uuid",
+            field=models.UUIDField(blank=True, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name="screeningrecord",
+            name="client_uuid",
+            field=models.UUIDField(blank=True, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("screening", "0005_client_uuid"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SyncTombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "model_name",
+                    models.CharField(
+                        choices=[
+                            ("patient", "Patient"),
+                            ("screening", "Screening Record"),
+                            ("follow_up", "Screening Follow-up"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                ("client_uuid", models.UUIDField(blank=True, null=True)),
+                (
+                    "owner_id",
+                    models.BigIntegerField(blank=True, db_index=True, null=True),
+                ),
+                ("deleted_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "db_table": "screening_synctombstone",
+                "ordering": ["id"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(fields=["updated_at", "id"], name="patient_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="screeningfollowup",
+            index=models.Index(
+                fields=["updated_at", "id"], name="followup_updated_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="screeningrecord",
+            index=models.Index(
+                fields=["updated_at", "id"], name="screening_updated_idx"
+            ),
+        ),
+    ]
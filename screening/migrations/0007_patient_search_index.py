@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:05
+
+from django.db import migrations
+
+# The SQL is frozen here rather than imported from screening.search, so
+# later changes to the live index cannot change what this migration does.
+# screening.search.ensure_search_index reinstalls the current definition
+# after every migrate.
+
+SQLITE_COLUMNS = "first_name, last_name, national_id, phone_number"
+SQLITE_NEW_VALUES = "new.first_name, new.last_name, new.national_id, new.phone_number"
+SQLITE_OLD_VALUES = "old.first_name, old.last_name, old.national_id, old.phone_number"
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS screening_patient_fts USING fts5("
+    f"{SQLITE_COLUMNS}, content='screening_patient', content_rowid='id', prefix='2 3 4')",
+    "DROP TRIGGER IF EXISTS screening_patient_fts_ai",
+    "DROP TRIGGER IF EXISTS screening_patient_fts_ad",
+    "DROP TRIGGER IF EXISTS screening_patient_fts_au",
+    "CREATE TRIGGER screening_patient_fts_ai AFTER INSERT ON screening_patient BEGIN "
+    f"INSERT INTO screening_patient_fts(rowid, {SQLITE_COLUMNS}) VALUES (new.id, {SQLITE_NEW_VALUES}); END",
+    "CREATE TRIGGER screening_patient_fts_ad AFTER DELETE ON screening_patient BEGIN "
+    f"INSERT INTO screening_patient_fts(screening_patient_fts, rowid, {SQLITE_COLUMNS}) "
+    f"VALUES ('delete', old.id, {SQLITE_OLD_VALUES}); END",
+    f"CREATE TRIGGER screening_patient_fts_au AFTER UPDATE OF {SQLITE_COLUMNS} ON screening_patient BEGIN "
+    f"INSERT INTO screening_patient_fts(screening_patient_fts, rowid, {SQLITE_COLUMNS}) "
+    f"VALUES ('delete', old.id, {SQLITE_OLD_VALUES}); "
+    f"INSERT INTO screening_patient_fts(rowid, {SQLITE_COLUMNS}) VALUES (new.id, {SQLITE_NEW_VALUES}); END",
+    "INSERT INTO screening_patient_fts(screening_patient_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS screening_patient_fts_ai",
+    "DROP TRIGGER IF EXISTS screening_patient_fts_ad",
+    "DROP TRIGGER IF EXISTS screening_patient_fts_au",
+    "DROP TABLE IF EXISTS screening_patient_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS screening_patient_name_trgm ON screening_patient "
+    "USING gin ((lower(first_name || ' ' || last_name)) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS screening_patient_national_id_prefix ON screening_patient "
+    "(national_id varchar_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS screening_patient_phone_prefix ON screening_patient "
+    "(phone_number varchar_pattern_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS screening_patient_name_trgm",
+    "DROP INDEX IF EXISTS screening_patient_national_id_prefix",
+    "DROP INDEX IF EXISTS screening_patient_phone_prefix",
+]
+
+
+def run_statements(schema_editor, sqlite, postgres):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': sqlite, 'postgresql': postgres}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement, params=None)
+
+
+def create_search_index(apps, schema_editor):
+    run_statements(schema_editor, SQLITE_FORWARD, POSTGRES_FORWARD)
+
+
+def remove_search_index(apps, schema_editor):
+    run_statements(schema_editor, SQLITE_BACKWARD, POSTGRES_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("screening", "0006_sync_tombstone_updated_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("screening", "0007_patient_search_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(fields=["created_at", "id"], name="patient_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(
+                fields=["registered_by", "created_at", "id"],
+                name="patient_owner_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="screeningfollowup",
+            index=models.Index(
+                fields=["follow_up_date", "id"], name="followup_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="screeningrecord",
+            index=models.Index(
+                fields=["screening_date", "id"], name="screening_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="screeningrecord",
+            index=models.Index(
+                fields=["screened_by", "screening_date", "id"],
+                name="screening_owner_date_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("screening", "0008_keyset_pagination_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="screeningfollowup",
+            index=models.Index(
+                fields=["status", "follow_up_date"], name="followup_status_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="screeningfollowup",
+            index=models.Index(
+                condition=models.Q(("status", "PENDING")),
+                fields=["follow_up_date"],
+                name="followup_pending_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="screeningrecord",
+            index=models.Index(
+                fields=["patient", "screening_date"], name="screening_patient_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="screeningrecord",
+            index=models.Index(
+                fields=["risk_level", "screening_date"], name="screening_risk_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="screeningrecord",
+            index=models.Index(
+                fields=["screened_by", "risk_level", "screening_date"],
+                name="screening_owner_risk_date_idx",
+            ),
+        ),
+    ]
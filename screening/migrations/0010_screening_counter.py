@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:46
+
+from django.db import migrations, models
+
+
+def backfill_screening_counters(apps, schema_editor):
+    """Count the screenings and follow-ups that exist before the signals take over"""
+    from screening.counters import compute_counters
+
+    ScreeningCounter = apps.get_model("screening", "ScreeningCounter")
+    rows = compute_counters(
+        apps.get_model("screening", "ScreeningRecord"),
+        apps.get_model("screening", "ScreeningFollowUp"),
+    )
+    ScreeningCounter.objects.all().delete()
+    ScreeningCounter.objects.bulk_create(
+        [
+            ScreeningCounter(
+                scope=scope, scope_key=scope_key, period=period, period_start=period_start, **counts
+            )
+            for (scope, scope_key, period, period_start), counts in rows.items()
+            if counts
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("screening", "0009_screening_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScreeningCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "scope",
+                    models.CharField(
+                        choices=[
+                            ("GLOBAL", "Global"),
+                            ("USER", "Screener"),
+                            ("COUNTY", "County"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "scope_key",
+                    models.CharField(
+                        blank=True,
+                        help_text="Screener id or county name",
+                        max_length=100,
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[
+                            ("ALL", "All Time"),
+                            ("MONTH", "Month"),
+                            ("DAY", "Day"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("period_start", models.DateField()),
+                ("total_screenings", models.IntegerField(default=0)),
+                ("high_risk_count", models.IntegerField(default=0)),
+                ("moderate_risk_count", models.IntegerField(default=0)),
+                ("low_risk_count", models.IntegerField(default=0)),
+                ("referrals_made", models.IntegerField(default=0)),
+                ("follow_ups_pending", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "screening_screeningcounter",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("scope", "scope_key", "period", "period_start"),
+                        name="screening_counter_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_screening_counters, migrations.RunPython.noop),
+    ]
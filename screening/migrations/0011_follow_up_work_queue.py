@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+RISK_PRIORITY = {"HIGH": 3, "MODERATE": 2, "LOW": 1}
+
+
+def backfill_priority(apps, schema_editor):
+    ScreeningFollowUp = apps.get_model("screening", "ScreeningFollowUp")
+    for risk_level, rank in RISK_PRIORITY.items():
+        for referral_needed in (False, True):
+            ScreeningFollowUp.objects.filter(
+                screening_record__risk_level=risk_level,
+                screening_record__referral_needed=referral_needed,
+            ).update(priority=rank * 2 + referral_needed)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("screening", "0010_screening_counter"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="screeningfollowup",
+            name="lease_expires_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="screeningfollowup",
+            name="leased_by",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="leased_follow_ups",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="screeningfollowup",
+            name="priority",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="screeningfollowup",
+            index=models.Index(
+                condition=models.Q(("status", "PENDING")),
+                fields=["-priority", "follow_up_date", "id"],
+                name="followup_queue_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_priority, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:00
+
+from django.db import migrations, models
+
+
+def backfill_outcome_cube(apps, schema_editor):
+    """Fold in the screenings that exist before the signals take over"""
+    from screening.cube import CUBE_DIMENSIONS, compute_cube
+
+    ScreeningOutcomeCube = apps.get_model("screening", "ScreeningOutcomeCube")
+    rows = compute_cube(apps.get_model("screening", "ScreeningRecord"))
+    ScreeningOutcomeCube.objects.all().delete()
+    ScreeningOutcomeCube.objects.bulk_create(
+        [
+            ScreeningOutcomeCube(**dict(zip(CUBE_DIMENSIONS, key)), **measures)
+            for key, measures in rows.items()
+            if measures
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("screening", "0012_cytology_image"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScreeningOutcomeCube",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("county", models.CharField(blank=True, max_length=100)),
+                ("sub_county", models.CharField(blank=True, max_length=100)),
+                (
+                    "month",
+                    models.DateField(help_text="First day of the screening month"),
+                ),
+                ("risk_level", models.CharField(max_length=20)),
+                ("hiv_status", models.CharField(max_length=20)),
+                ("age_band", models.CharField(max_length=10)),
+                ("screenings", models.IntegerField(default=0)),
+                ("referrals", models.IntegerField(default=0)),
+                ("via_positive", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "screening_screeningoutcomecube",
+                "indexes": [
+                    models.Index(
+                        fields=["month", "county"], name="outcome_cube_month_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=(
+                            "county",
+                            "sub_county",
+                            "month",
+                            "risk_level",
+                            "hiv_status",
+                            "age_band",
+                        ),
+                        name="screening_outcome_cube_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_outcome_cube, migrations.RunPython.noop),
+    ]
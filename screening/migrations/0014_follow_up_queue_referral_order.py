@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:58
+
+from django.db import migrations, models
+
+RISK_PRIORITY = {"HIGH": 3, "MODERATE": 2, "LOW": 1}
+
+
+def backfill_queue_fields(apps, schema_editor):
+    """Priority is now the risk level alone; referral breaks ties after the date"""
+    ScreeningFollowUp = apps.get_model("screening", "ScreeningFollowUp")
+    ScreeningFollowUp.objects.update(priority=0)
+    for risk_level, rank in RISK_PRIORITY.items():
+        ScreeningFollowUp.objects.filter(screening_record__risk_level=risk_level).update(priority=rank)
+    ScreeningFollowUp.objects.filter(screening_record__referral_needed=True).update(referral_needed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("screening", "0013_screening_outcome_cube"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="screeningfollowup",
+            name="followup_queue_idx",
+        ),
+        migrations.AddField(
+            model_name="screeningfollowup",
+            name="referral_needed",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(backfill_queue_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="screeningfollowup",
+            index=models.Index(
+                condition=models.Q(("status", "PENDING")),
+                fields=["-priority", "follow_up_date", "-referral_needed", "id"],
+                name="followup_queue_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("screening", "0014_follow_up_queue_referral_order"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="synctombstone",
+            name="left_scope",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name="synctombstone",
+            name="deleted_at",
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
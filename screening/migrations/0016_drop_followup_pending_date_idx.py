@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("screening", "0015_sync_tombstone_left_scope"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="screeningfollowup",
+            name="followup_pending_date_idx",
+        ),
+    ]
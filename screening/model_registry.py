@@ -0,0 +1,153 @@
+# screening/model_registry.py
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+
+
+class ModelArtifact(NamedTuple):
+    version: str
+    path: str
+    sha256: str
+
+
+class ModelChecksumError(Exception):
+    """Raised when a model file does not match its manifest checksum"""
+
+
+class ModelManifestError(Exception):
+    """Raised when the manifest names a current version it does not list"""
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_signature(path: str):
+    """(mtime, size) of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class ModelRegistry:
+    """Versioned model artifacts under AI_MODEL_PATH with a checksum manifest.
+
+    The manifest lists every registered version with its file and SHA-256
+    and names the active one:
+
+        {"current": "v2", "versions": {"v2": {"file": "model-v2.pkl", "sha256": "..."}}}
+
+    Without a manifest the legacy RISK_PREDICTION_MODEL file is served and
+    versioned by its checksum.
+    """
+
+    def __init__(self, root: str, default_model: str):
+        self.root = root
+        self.default_model = default_model
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST_NAME)
+
+    def read_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'current': None, 'versions': {}}
+
+    def _write_manifest(self, manifest: Dict) -> None:
+        # Write to a temporary file and rename so readers never see a partial manifest
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.manifest-', suffix='.json')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _current_path(self, manifest: Dict) -> Optional[str]:
+        """Path of the active model file, or None if the manifest does not list its current version"""
+        current = manifest.get('current')
+        if current:
+            entry = manifest.get('versions', {}).get(current)
+            return os.path.join(self.root, entry['file']) if entry else None
+        return os.path.join(self.root, self.default_model)
+
+    def signature(self):
+        """Cheap stat-based fingerprint of the manifest and active model file"""
+        path = self._current_path(self.read_manifest())
+        return (_file_signature(self.manifest_path), _file_signature(path) if path else None)
+
+    def current(self) -> Optional[ModelArtifact]:
+        """The active model artifact, or None if there is no model file"""
+        manifest = self.read_manifest()
+        current = manifest.get('current')
+        if current:
+            entry = manifest.get('versions', {}).get(current)
+            if entry is None:
+                raise ModelManifestError(f"Manifest names current model {current} but does not list it")
+            return ModelArtifact(current, os.path.join(self.root, entry['file']), entry['sha256'])
+
+        path = os.path.join(self.root, self.default_model)
+        if not os.path.exists(path):
+            return None
+        sha256 = sha256_file(path)
+        return ModelArtifact(f"legacy-{sha256[:12]}", path, sha256)
+
+    def verify(self, artifact: ModelArtifact) -> None:
+        actual = sha256_file(artifact.path)
+        if actual != artifact.sha256:
+            raise ModelChecksumError(
+                f"Checksum mismatch for model {artifact.version}: "
+                f"expected {artifact.sha256}, got {actual}"
+            )
+
+    def register(self, source_path: str, version: Optional[str] = None,
+                 activate: bool = True) -> ModelArtifact:
+        """Copy a model file into the registry and record it in the manifest"""
+        sha256 = sha256_file(source_path)
+        version = version or datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+        manifest = self.read_manifest()
+        if version in manifest['versions']:
+            raise ValueError(f"Model version {version} is already registered")
+
+        stem, ext = os.path.splitext(self.default_model)
+        file_name = f"{stem}-{version}{ext}"
+        tmp_path = os.path.join(self.root, f".{file_name}.tmp")
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, os.path.join(self.root, file_name))
+
+        manifest['versions'][version] = {
+            'file': file_name,
+            'sha256': sha256,
+            'registered_at': datetime.now(timezone.utc).isoformat(),
+        }
+        if activate:
+            manifest['current'] = version
+        self._write_manifest(manifest)
+        logger.info(f"Registered AI model version {version}")
+        return ModelArtifact(version, os.path.join(self.root, file_name), sha256)
+
+    def activate(self, version: str) -> ModelArtifact:
+        """Make a registered version the active model"""
+        manifest = self.read_manifest()
+        if version not in manifest['versions']:
+            raise ValueError(f"Unknown model version {version}")
+        manifest['current'] = version
+        self._write_manifest(manifest)
+        entry = manifest['versions'][version]
+        return ModelArtifact(version, os.path.join(self.root, entry['file']), entry['sha256'])
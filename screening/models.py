@@ -1,10 +1,17 @@
 # screening/models.py
-from django.db import models
+from datetime import date
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 # User = get_user_model()
 from accounts.models import User  # Ensure this import matches your User model location
 
+
+def age_on(date_of_birth, on):
+    """Age in whole years on the given day"""
+    return on.year - date_of_birth.year - ((on.month, on.day) < (date_of_birth.month, date_of_birth.day))
+
+
 class Patient(models.Model):
     # Personal Information
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='patient_profile', null=True, blank=True)
@@ -36,6 +43,9 @@ class Patient(models.Model):
         default=1
     )
     
+    # Identifier generated on the device for records captured offline
+    client_uuid = models.UUIDField(unique=True, null=True, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -44,11 +54,51 @@ class Patient(models.Model):
     
     @property
     def age(self):
-        from datetime import date
-        return (date.today() - self.date_of_birth).days // 365
+        return age_on(self.date_of_birth, date.today())
     
     class Meta:
         db_table = 'screening_patient'
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='patient_updated_idx'),
+            models.Index(fields=['created_at', 'id'], name='patient_created_idx'),
+            models.Index(fields=['registered_by', 'created_at', 'id'], name='patient_owner_created_idx'),
+        ]
+
+class CytologyImage(models.Model):
+    """An uploaded cytology slide photo, stored once per distinct content"""
+    PENDING = 'PENDING'
+    READY = 'READY'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (PENDING, 'Thumbnail Pending'),
+        (READY, 'Ready'),
+        (FAILED, 'Thumbnail Failed'),
+    ]
+    
+    sha256 = models.CharField(max_length=64, unique=True)
+    image = models.FileField(upload_to='cytology_images/', max_length=255)
+    thumbnail = models.ImageField(upload_to='cytology_thumbnails/', max_length=255, blank=True, null=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.PositiveBigIntegerField(default=0, help_text="Size of the original in bytes")
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    uploaded_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='cytology_uploads'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Cytology image {self.sha256[:12]}"
+    
+    class Meta:
+        db_table = 'screening_cytologyimage'
 
 class ScreeningRecord(models.Model):
     RISK_LEVELS = [
@@ -126,6 +176,13 @@ class ScreeningRecord(models.Model):
         null=True
     )
     cytology_image = models.ImageField(upload_to='cytology_images/', blank=True, null=True)
+    cytology = models.ForeignKey(
+        CytologyImage,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='screenings'
+    )
     
     # AI Prediction Results
     ai_risk_score = models.FloatField(
@@ -137,6 +194,12 @@ class ScreeningRecord(models.Model):
         validators=[MinValueValidator(0.0), MaxValueValidator(1.0)],
         help_text="AI model confidence in prediction"
     )
+    model_version = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text="Version of the AI model (or fallback rules) that produced the score"
+    )
     
     # Recommendations
     recommended_action = models.TextField()
@@ -147,6 +210,7 @@ class ScreeningRecord(models.Model):
     # Additional Notes
     clinical_notes = models.TextField(blank=True)
     offline_sync_status = models.BooleanField(default=False, help_text="True if synced from offline")
+    client_uuid = models.UUIDField(unique=True, null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -154,9 +218,29 @@ class ScreeningRecord(models.Model):
     def __str__(self):
         return f"Screening for {self.patient} on {self.screening_date.date()}"
     
+    # Saved and deleted atomically so the summary counters updated by
+    # signals commit or roll back together with the row
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+    
     class Meta:
         db_table = 'screening_screeningrecord'
         ordering = ['-screening_date']
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='screening_updated_idx'),
+            models.Index(fields=['screening_date', 'id'], name='screening_date_idx'),
+            models.Index(fields=['screened_by', 'screening_date', 'id'], name='screening_owner_date_idx'),
+            models.Index(fields=['patient', 'screening_date'], name='screening_patient_date_idx'),
+            models.Index(fields=['risk_level', 'screening_date'], name='screening_risk_date_idx'),
+            models.Index(
+                fields=['screened_by', 'risk_level', 'screening_date'], name='screening_owner_risk_date_idx'
+            ),
+        ]
 
 class RiskFactorWeight(models.Model):
     """Model to store AI model feature weights for transparency"""
@@ -205,13 +289,181 @@ class ScreeningFollowUp(models.Model):
         ('HOME_VISIT', 'Home Visit'),
         ('CLINIC_VISIT', 'Clinic Visit'),
     ], blank=True)
+    client_uuid = models.UUIDField(unique=True, null=True, blank=True)
+    
+    # Work queue: priority and referral_needed are copied from the screening
+    # so the queue can be read in index order, and a lease reserves the
+    # follow-up for one CHV
+    priority = models.PositiveSmallIntegerField(default=0)
+    referral_needed = models.BooleanField(default=False)
+    leased_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='leased_follow_ups'
+    )
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    RISK_PRIORITY = {'HIGH': 3, 'MODERATE': 2, 'LOW': 1}
+    
     def __str__(self):
         return f"Follow-up for {self.screening_record.patient} on {self.follow_up_date}"
     
+    @classmethod
+    def priority_for(cls, risk_level):
+        """Queue priority of a risk level; the queue breaks ties on date, then referral"""
+        return cls.RISK_PRIORITY.get(risk_level, 0)
+    
+    def save(self, *args, **kwargs):
+        record = self.screening_record
+        self.priority = self.priority_for(record.risk_level)
+        self.referral_needed = record.referral_needed
+        if self.status != 'PENDING':
+            self.leased_by = None
+            self.lease_expires_at = None
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {
+                *kwargs['update_fields'], 'priority', 'referral_needed', 'leased_by', 'lease_expires_at'
+            }
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+    
     class Meta:
         db_table = 'screening_screeningfollowup'
-        ordering = ['-follow_up_date']
\ No newline at end of file
+        ordering = ['-follow_up_date']
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='followup_updated_idx'),
+            models.Index(fields=['follow_up_date', 'id'], name='followup_date_idx'),
+            # Also serves the overdue filter, status='PENDING' with a follow_up_date range
+            models.Index(fields=['status', 'follow_up_date'], name='followup_status_date_idx'),
+            # The work queue's order, for pending follow-ups only
+            models.Index(
+                fields=['-priority', 'follow_up_date', '-referral_needed', 'id'], name='followup_queue_idx',
+                condition=models.Q(status='PENDING')
+            ),
+        ]
+
+class SyncTombstone(models.Model):
+    """Record of a deleted row, so mobile clients can drop it from their cache.
+
+    A row reassigned to another CHV or clinician also gets one, for the
+    previous owner only (left_scope). prune_sync_tombstones removes them
+    after SYNC_TOMBSTONE_RETAIN_DAYS.
+    """
+    MODEL_CHOICES = [
+        ('patient', 'Patient'),
+        ('screening', 'Screening Record'),
+        ('follow_up', 'Screening Follow-up'),
+    ]
+    
+    model_name = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    client_uuid = models.UUIDField(null=True, blank=True)
+    # Plain id rather than a foreign key: the owner may be deleted along with the row
+    owner_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    # The row still exists but no longer belongs to owner_id
+    left_scope = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    def __str__(self):
+        return f"Deleted {self.model_name} {self.object_id}"
+    
+    class Meta:
+        db_table = 'screening_synctombstone'
+        ordering = ['id']
+
+class ScreeningCounter(models.Model):
+    """Incrementally maintained screening totals for one scope and period.
+
+    Rows are keyed by scope (everyone, one screener or one county) and by
+    period (all time, a month or a day). Signals keep them in step with
+    ScreeningRecord and ScreeningFollowUp; rebuild_screening_counters
+    recomputes them from scratch.
+    """
+    GLOBAL = 'GLOBAL'
+    USER = 'USER'
+    COUNTY = 'COUNTY'
+    SCOPE_CHOICES = [
+        (GLOBAL, 'Global'),
+        (USER, 'Screener'),
+        (COUNTY, 'County'),
+    ]
+    
+    ALL_TIME = 'ALL'
+    MONTH = 'MONTH'
+    DAY = 'DAY'
+    PERIOD_CHOICES = [
+        (ALL_TIME, 'All Time'),
+        (MONTH, 'Month'),
+        (DAY, 'Day'),
+    ]
+    # period_start of the all-time rows
+    ALL_TIME_START = date(1970, 1, 1)
+    
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    scope_key = models.CharField(max_length=100, blank=True, help_text="Screener id or county name")
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    
+    total_screenings = models.IntegerField(default=0)
+    high_risk_count = models.IntegerField(default=0)
+    moderate_risk_count = models.IntegerField(default=0)
+    low_risk_count = models.IntegerField(default=0)
+    referrals_made = models.IntegerField(default=0)
+    follow_ups_pending = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.scope} {self.scope_key} {self.period} {self.period_start}"
+    
+    class Meta:
+        db_table = 'screening_screeningcounter'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['scope', 'scope_key', 'period', 'period_start'], name='screening_counter_unique'
+            ),
+        ]
+
+class ScreeningOutcomeCube(models.Model):
+    """Screening outcomes pre-aggregated by geography, month and patient profile.
+
+    One row per county, sub-county, month, risk level, HIV status and age
+    band at screening. Signals keep it in step with ScreeningRecord and
+    Patient; rebuild_screening_cube recomputes it from scratch.
+    """
+    county = models.CharField(max_length=100, blank=True)
+    sub_county = models.CharField(max_length=100, blank=True)
+    month = models.DateField(help_text="First day of the screening month")
+    risk_level = models.CharField(max_length=20)
+    hiv_status = models.CharField(max_length=20)
+    age_band = models.CharField(max_length=10)
+    
+    screenings = models.IntegerField(default=0)
+    referrals = models.IntegerField(default=0)
+    via_positive = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.county}/{self.sub_county} {self.month:%Y-%m} {self.risk_level} {self.hiv_status} {self.age_band}"
+    
+    class Meta:
+        db_table = 'screening_screeningoutcomecube'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['county', 'sub_county', 'month', 'risk_level', 'hiv_status', 'age_band'],
+                name='screening_outcome_cube_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['month', 'county'], name='outcome_cube_month_idx'),
+        ]
@@ -0,0 +1,158 @@
+# screening/pagination.py
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on a unique composite key such as (screening_date, id).
+
+    Each page is fetched with a WHERE on the key of the last row seen and
+    a LIMIT, so it costs the same at any depth and needs no COUNT(*).
+    Rows inserted while a client pages are never duplicated or skipped.
+    The ordering must end with a unique field.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+    ordering = ()
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+        self.page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _fields(self, queryset):
+        return [
+            (name.lstrip('-'), name.startswith('-'), queryset.model._meta.get_field(name.lstrip('-')))
+            for name in self.ordering
+        ]
+
+    def encode_cursor(self, obj, reverse):
+        values = []
+        for _, _, field in self.fields:
+            value = getattr(obj, field.attname)
+            values.append(field.value_to_string(obj) if value is not None else None)
+        payload = json.dumps({'k': values, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, token):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            values = payload['k']
+            if len(values) != len(self.fields):
+                raise ValueError
+            key = [field.to_python(value) for (_, _, field), value in zip(self.fields, values)]
+            return key, bool(payload.get('r'))
+        except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _after(self, key, reverse):
+        """Rows strictly after the key in the (possibly reversed) ordering"""
+        condition = Q()
+        for position in reversed(range(len(self.fields))):
+            name, descending, _ = self.fields[position]
+            lookup = 'lt' if descending != reverse else 'gt'
+            step = Q(**{f'{name}__{lookup}': key[position]})
+            if position < len(self.fields) - 1:
+                step |= Q(**{name: key[position]}) & condition
+            condition = step
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.fields = self._fields(queryset)
+        page_size = self.get_page_size(request)
+
+        token = request.query_params.get(self.cursor_query_param)
+        key, reverse = self.decode_cursor(token) if token else (None, False)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+        queryset = queryset.order_by(*ordering)
+        if key is not None:
+            queryset = queryset.filter(self._after(key, reverse))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = key is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, key is not None
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        cursor = self.encode_cursor(self.page[-1], reverse=False)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        cursor = self.encode_cursor(self.page[0], reverse=True)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class FollowUpQueuePagination(KeysetPagination):
+    """Work queue order, read straight from the followup_queue_idx index"""
+    ordering = ('-priority', 'follow_up_date', '-referral_needed', 'id')
+
+
+def wants_keyset(request):
+    """Keyset pages are opt-in so existing page-number clients keep working"""
+    params = request.query_params
+    return params.get('pagination') == 'cursor' or KeysetPagination.cursor_query_param in params
+
+
+class KeysetPaginationMixin:
+    """Serve keyset pages ordered by keyset_ordering when the client asks for them"""
+    keyset_ordering = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.request is not None and wants_keyset(self.request):
+            self._paginator = KeysetPagination(self.keyset_ordering)
+        return super().paginator
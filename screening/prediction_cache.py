@@ -0,0 +1,110 @@
+# screening/prediction_cache.py
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from django.core.cache import caches
+
+CACHE_KEY_PREFIX = 'risk-prediction'
+
+# Inputs compared by truthiness in the predictor
+BOOLEAN_INPUTS = ('family_history_cervical_cancer', 'previous_abnormal_pap')
+
+
+def canonical_input(data: Dict, fields) -> Dict:
+    """The prediction inputs in a stable form: known fields only, normalized types"""
+    canonical = {}
+    for field in fields:
+        value = data.get(field)
+        if field in BOOLEAN_INPUTS:
+            value = bool(value)
+        canonical[field] = value
+    return canonical
+
+
+class PredictionCache:
+    """Two-level cache of full prediction payloads.
+
+    An in-process LRU with a TTL answers repeat requests without leaving the
+    worker. When a Django cache alias is configured it is consulted on a
+    local miss, so results are shared across workers. Keys include the
+    model version, so a model reload never serves results from the
+    previous model.
+    """
+
+    def __init__(self, fields, max_entries: int, ttl: float, alias: Optional[str] = None):
+        self.fields = tuple(fields)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.alias = alias
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def key(self, data: Dict, model_version: str) -> str:
+        payload = json.dumps(canonical_input(data, self.fields), sort_keys=True, separators=(',', ':'), default=str)
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        return f"{CACHE_KEY_PREFIX}:{model_version}:{digest}"
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, prediction = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(prediction)
+                del self._entries[key]
+
+        prediction = self.shared.get(key) if self.shared is not None else None
+        with self._lock:
+            if prediction is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        self._store_local(key, prediction)
+        return copy.deepcopy(prediction)
+
+    def set(self, key: str, prediction: Dict) -> None:
+        prediction = copy.deepcopy(prediction)
+        self._store_local(key, prediction)
+        if self.shared is not None:
+            self.shared.set(key, prediction, timeout=self.ttl)
+
+    def _store_local(self, key: str, prediction: Dict) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, prediction)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop the local entries; shared entries are keyed by model version"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'shared_alias': self.alias,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+            }
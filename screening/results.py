@@ -0,0 +1,43 @@
+# screening/results.py
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+from .ai_service import SCREENING_INPUT_FIELDS
+from .models import ScreeningRecord, ScreeningFollowUp
+
+# Follow-ups are created automatically for screenings due back within a year
+AUTO_FOLLOW_UP_MAX_MONTHS = 12
+
+
+def prediction_input(record: ScreeningRecord) -> Dict:
+    """Predictor input for a (possibly unsaved) screening record"""
+    return dict(
+        {field: getattr(record, field) for field in SCREENING_INPUT_FIELDS},
+        age=record.patient.age,
+    )
+
+
+def prediction_fields(prediction: Dict) -> Dict:
+    """ScreeningRecord fields that hold the AI results of a prediction"""
+    return {
+        'ai_risk_score': prediction['risk_score'],
+        'risk_level': prediction['risk_level'],
+        'ai_confidence': prediction['confidence'],
+        'recommended_action': prediction['recommended_action'],
+        'referral_needed': prediction['referral_needed'],
+        'model_version': prediction['model_version'],
+    }
+
+
+def auto_follow_up(record: ScreeningRecord, prediction: Dict, today: date) -> Optional[ScreeningFollowUp]:
+    """The unsaved follow-up a new screening gets, or None if it is not due back within a year"""
+    if prediction['follow_up_months'] > AUTO_FOLLOW_UP_MAX_MONTHS:
+        return None
+    return ScreeningFollowUp(
+        screening_record=record,
+        follow_up_date=today + timedelta(days=prediction['follow_up_months'] * 30),
+        status='PENDING',
+        # Set by save(); bulk_create skips it
+        priority=ScreeningFollowUp.priority_for(record.risk_level),
+        referral_needed=record.referral_needed
+    )
@@ -0,0 +1,124 @@
+# screening/risk_table.py
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Input fields in key order with the values each may take. Integer fields
+# are (low, high) inclusive ranges matching RiskPredictionInputSerializer;
+# enum fields list every accepted value, with None for a missing value.
+KEY_FIELDS = (
+    ('age', (15, 80)),
+    ('age_at_first_intercourse', (10, 50)),
+    ('number_of_sexual_partners', (1, 20)),
+    ('parity', (0, 15)),
+    ('hiv_status', (None, 'POSITIVE', 'NEGATIVE', 'UNKNOWN')),
+    ('hpv_vaccination_status', (None, 'VACCINATED', 'NOT_VACCINATED', 'UNKNOWN')),
+    ('contraceptive_use', (None, 'NONE', 'ORAL_PILLS', 'INJECTION', 'IUD', 'BARRIER', 'OTHER')),
+    ('smoking_status', (None, 'NEVER', 'FORMER', 'CURRENT')),
+    ('family_history_cervical_cancer', (False, True)),
+    ('previous_abnormal_pap', (False, True)),
+    ('via_result', (None, 'NEGATIVE', 'POSITIVE', 'SUSPICIOUS')),
+    ('bethesda_category', (None, 'NILM', 'ASCUS', 'LSIL', 'HSIL', 'AGC', 'CANCER')),
+)
+
+# Defaults the predictor applies to missing integer inputs
+KEY_DEFAULTS = {
+    'age': 30,
+    'age_at_first_intercourse': 18,
+    'number_of_sexual_partners': 1,
+    'parity': 0,
+}
+
+RISK_LEVEL_CODES = ('LOW', 'MODERATE', 'HIGH')
+
+
+class RiskLookupTable:
+    """Memoized prediction outputs for the finite screening input space.
+
+    Each input is encoded as a single mixed-radix integer. Results are
+    stored in preallocated NumPy columns and a dict maps each key to its
+    row. When the table fills up it is cleared and refilled from hot keys.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.scores = np.zeros(capacity, dtype=np.float64)
+        self.levels = np.zeros(capacity, dtype=np.uint8)
+        self.follow_up_months = np.zeros(capacity, dtype=np.uint8)
+        self.referrals = np.zeros(capacity, dtype=bool)
+        self.fallbacks = np.zeros(capacity, dtype=bool)
+        self._slots: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, data: Dict) -> Optional[int]:
+        """Encode an input dict as an integer key, or None if it is out of range"""
+        key = 0
+        for name, domain in KEY_FIELDS:
+            value = data.get(name, KEY_DEFAULTS.get(name))
+            if name in KEY_DEFAULTS:
+                if isinstance(value, bool) or not isinstance(value, int):
+                    return None
+                low, high = domain
+                if not low <= value <= high:
+                    return None
+                key = key * (high - low + 1) + (value - low)
+            else:
+                if isinstance(domain[0], bool):
+                    value = bool(value)
+                try:
+                    position = domain.index(value)
+                except ValueError:
+                    return None
+                key = key * len(domain) + position
+        return key
+
+    def get(self, key: int) -> Optional[Tuple[float, str, int, bool, bool]]:
+        """Return (score, level, follow-up months, referral, fallback) for a key"""
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return (
+                float(self.scores[slot]),
+                RISK_LEVEL_CODES[self.levels[slot]],
+                int(self.follow_up_months[slot]),
+                bool(self.referrals[slot]),
+                bool(self.fallbacks[slot]),
+            )
+
+    def put(self, key: int, score: float, level: str, follow_up_months: int,
+            referral_needed: bool, fallback: bool = False) -> None:
+        """Store the prediction outputs for a key"""
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                if len(self._slots) >= self.capacity:
+                    self._slots.clear()
+                slot = len(self._slots)
+                self._slots[key] = slot
+            self.scores[slot] = score
+            self.levels[slot] = RISK_LEVEL_CODES.index(level)
+            self.follow_up_months[slot] = follow_up_months
+            self.referrals[slot] = referral_needed
+            self.fallbacks[slot] = fallback
+
+    def clear(self) -> None:
+        """Drop every memoized entry"""
+        with self._lock:
+            self._slots.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._slots),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,216 @@
+# screening/search.py
+import re
+from typing import List, Tuple
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Q
+
+from .models import Patient
+
+FTS_TABLE = 'screening_patient_fts'
+
+# Columns mirrored into the full-text index, with their bm25 weights;
+# a hit on an identifier counts for more than a hit on a name
+FTS_COLUMNS = (
+    ('first_name', 1.0),
+    ('last_name', 1.0),
+    ('national_id', 3.0),
+    ('phone_number', 3.0),
+)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Triggers keeping the SQLite index in step with screening_patient
+TRIGGER_SUFFIXES = ('ai', 'ad', 'au')
+
+# The migration that first creates the index
+SEARCH_INDEX_MIGRATION = ('screening', '0007_patient_search_index')
+
+
+def _sqlite_statements() -> List[str]:
+    columns = ', '.join(name for name, _ in FTS_COLUMNS)
+    new_values = ', '.join(f'new.{name}' for name, _ in FTS_COLUMNS)
+    old_values = ', '.join(f'old.{name}' for name, _ in FTS_COLUMNS)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{columns}, content='screening_patient', content_rowid='id', prefix='2 3 4')",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON screening_patient BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON screening_patient BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {columns} ON screening_patient BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+    ]
+
+
+POSTGRES_STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS screening_patient_name_trgm ON screening_patient "
+    "USING gin ((lower(first_name || ' ' || last_name)) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS screening_patient_national_id_prefix ON screening_patient "
+    "(national_id varchar_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS screening_patient_phone_prefix ON screening_patient "
+    "(phone_number varchar_pattern_ops)",
+]
+
+
+def install_search_index(conn=connection) -> None:
+    """Create (or recreate) the patient search index for the database vendor.
+
+    In SQLite this is an FTS5 table kept in sync with screening_patient by
+    triggers, so rows written by bulk_create are indexed too. SQLite drops
+    those triggers when a migration rebuilds the patient table;
+    ensure_search_index puts them back after every migrate, and
+    rebuild_patient_search_index does so on demand. In Postgres the index is a
+    pg_trgm GIN index on the full name plus prefix indexes on the IDs,
+    which Postgres maintains itself.
+    """
+    if conn.vendor == 'sqlite':
+        statements = _sqlite_statements()
+    elif conn.vendor == 'postgresql':
+        statements = POSTGRES_STATEMENTS
+    else:
+        return
+    with conn.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def drop_search_index(conn=connection) -> None:
+    if conn.vendor == 'sqlite':
+        statements = [f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}" for suffix in TRIGGER_SUFFIXES]
+        statements.append(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif conn.vendor == 'postgresql':
+        statements = [
+            "DROP INDEX IF EXISTS screening_patient_name_trgm",
+            "DROP INDEX IF EXISTS screening_patient_national_id_prefix",
+            "DROP INDEX IF EXISTS screening_patient_phone_prefix",
+        ]
+    else:
+        return
+    with conn.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def search_index_missing(conn=connection) -> bool:
+    """Whether the SQLite search table or any of its triggers is gone"""
+    if conn.vendor != 'sqlite':
+        return False
+    names = [FTS_TABLE] + [f"{FTS_TABLE}_{suffix}" for suffix in TRIGGER_SUFFIXES]
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT COUNT(*) FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(names))})", names
+        )
+        return cursor.fetchone()[0] < len(names)
+
+
+def ensure_search_index(using=DEFAULT_DB_ALIAS, **kwargs) -> None:
+    """post_migrate handler that reinstalls a search index a migration dropped"""
+    conn = connections[using]
+    if conn.vendor != 'sqlite':
+        return
+    # Not before the index's own migration has run, nor after it was unapplied
+    if SEARCH_INDEX_MIGRATION not in MigrationRecorder(conn).applied_migrations():
+        return
+    if search_index_missing(conn):
+        install_search_index(conn)
+
+
+def _like_prefix(term: str) -> str:
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _search_sqlite(query: str, owner_id, limit: int) -> List[Tuple[int, float]]:
+    tokens = _TOKEN_RE.findall(query)
+    if not tokens:
+        return []
+    # Every token must match as a prefix of some indexed word
+    match = ' '.join(f'"{token}"*' for token in tokens)
+    weights = ', '.join(str(weight) for _, weight in FTS_COLUMNS)
+    sql = (
+        f"SELECT p.id, -bm25({FTS_TABLE}, {weights}) AS relevance "
+        f"FROM {FTS_TABLE} JOIN screening_patient p ON p.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s"
+    )
+    params = [match]
+    if owner_id is not None:
+        sql += " AND p.registered_by_id = %s"
+        params.append(owner_id)
+    sql += " ORDER BY relevance DESC, p.id LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+
+def _search_postgres(query: str, owner_id, limit: int) -> List[Tuple[int, float]]:
+    term = query.strip().lower()
+    if not term:
+        return []
+    prefix = _like_prefix(query.strip())
+    full_name = "lower(first_name || ' ' || last_name)"
+    # The % operator matches names above pg_trgm.similarity_threshold (0.3 by default)
+    sql = (
+        f"SELECT id, GREATEST(similarity({full_name}, %s), "
+        f"CASE WHEN national_id LIKE %s OR phone_number LIKE %s THEN 1.0 ELSE 0.0 END) AS relevance "
+        f"FROM screening_patient "
+        f"WHERE ({full_name} %% %s OR national_id LIKE %s OR phone_number LIKE %s)"
+    )
+    params = [term, prefix, prefix, term, prefix, prefix]
+    if owner_id is not None:
+        sql += " AND registered_by_id = %s"
+        params.append(owner_id)
+    sql += " ORDER BY relevance DESC, id LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+
+def _search_orm(query: str, owner_id, limit: int) -> List[Tuple[int, float]]:
+    # No search index on this database: substring matching, as the patient list always did
+    term = query.strip()
+    if not term:
+        return []
+    queryset = Patient.objects.filter(
+        Q(first_name__icontains=term) |
+        Q(last_name__icontains=term) |
+        Q(national_id__icontains=term) |
+        Q(phone_number__icontains=term)
+    )
+    if owner_id is not None:
+        queryset = queryset.filter(registered_by_id=owner_id)
+    return [(pk, 1.0) for pk in queryset.order_by('id').values_list('id', flat=True)[:limit]]
+
+
+def search_patient_ids(query: str, user, limit: int) -> List[Tuple[int, float]]:
+    """Top (patient id, relevance) matches for a search box query, best first.
+
+    CHVs and clinicians only see patients they registered.
+    """
+    owner_id = user.id if user.user_type in ['CHV', 'CLINICIAN'] else None
+    if connection.vendor == 'sqlite':
+        return _search_sqlite(query, owner_id, limit)
+    if connection.vendor == 'postgresql':
+        return _search_postgres(query, owner_id, limit)
+    return _search_orm(query, owner_id, limit)
+
+
+def search_patients(query: str, user, limit: int) -> List[Patient]:
+    """Top matching patients, best first, each annotated with .relevance"""
+    matches = search_patient_ids(query, user, limit)
+    patients = Patient.objects.in_bulk([pk for pk, _ in matches])
+    results = []
+    for pk, relevance in matches:
+        patient = patients.get(pk)
+        if patient is not None:
+            patient.relevance = relevance
+            results.append(patient)
+    return results
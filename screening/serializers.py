@@ -1,6 +1,9 @@
 # screening/serializers.py
 from rest_framework import serializers
-from .models import Patient, ScreeningRecord, ScreeningFollowUp, RiskFactorWeight
+from django.conf import settings
+from django.utils import timezone
+from .models import Patient, ScreeningRecord, ScreeningFollowUp, RiskFactorWeight, CytologyImage
+from .cube import CUBE_DIMENSIONS
 from accounts.serializers import UserSerializer
 
 class PatientSerializer(serializers.ModelSerializer):
@@ -11,29 +14,101 @@ class PatientSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['registered_by']
 
+class PatientSearchResultSerializer(serializers.ModelSerializer):
+    """Compact patient match with its search relevance"""
+    relevance = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = Patient
+        fields = [
+            'id', 'first_name', 'last_name', 'national_id', 'phone_number',
+            'date_of_birth', 'county', 'sub_county', 'relevance'
+        ]
+
 class PatientCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Patient
         exclude = ['registered_by']
 
+def file_url(file, request=None):
+    """Absolute URL of a stored file when the request is known, else its storage URL"""
+    if not file:
+        return None
+    return request.build_absolute_uri(file.url) if request is not None else file.url
+
+class CytologyImageSerializer(serializers.ModelSerializer):
+    """Uploaded slide photo; list views should link the thumbnail, not the original"""
+    image_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = CytologyImage
+        fields = [
+            'id', 'status', 'thumbnail_url', 'image_url', 'content_type',
+            'size', 'width', 'height', 'created_at'
+        ]
+    
+    def get_image_url(self, obj):
+        return file_url(obj.image, self.context.get('request'))
+    
+    def get_thumbnail_url(self, obj):
+        return file_url(obj.thumbnail, self.context.get('request'))
+
 class ScreeningRecordSerializer(serializers.ModelSerializer):
     patient_details = PatientSerializer(source='patient', read_only=True)
     screened_by_details = UserSerializer(source='screened_by', read_only=True)
+    cytology_details = CytologyImageSerializer(source='cytology', read_only=True)
     
     class Meta:
         model = ScreeningRecord
         fields = '__all__'
         read_only_fields = [
             'screened_by', 'ai_risk_score', 'risk_level', 
-            'ai_confidence', 'recommended_action'
+            'ai_confidence', 'recommended_action', 'model_version', 'cytology'
+        ]
+
+class ScreeningRecordListSerializer(ScreeningRecordSerializer):
+    """Full list representation; links the cytology thumbnail instead of the original"""
+    cytology_details = None
+    cytology_thumbnail_url = serializers.SerializerMethodField()
+    
+    class Meta(ScreeningRecordSerializer.Meta):
+        fields = None
+        exclude = ['cytology_image']
+    
+    def get_cytology_thumbnail_url(self, obj):
+        return file_url(obj.cytology.thumbnail, self.context.get('request')) if obj.cytology else None
+
+class ScreeningRecordSummarySerializer(serializers.ModelSerializer):
+    """Compact list representation with related records reduced to ids and names"""
+    patient_name = serializers.SerializerMethodField()
+    screened_by_name = serializers.SerializerMethodField()
+    cytology_thumbnail_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ScreeningRecord
+        fields = [
+            'id', 'patient', 'patient_name', 'screened_by', 'screened_by_name',
+            'screening_date', 'risk_level', 'ai_risk_score', 'referral_needed',
+            'follow_up_date', 'model_version', 'cytology_thumbnail_url'
         ]
+    
+    def get_patient_name(self, obj):
+        return f"{obj.patient.first_name} {obj.patient.last_name}"
+    
+    def get_screened_by_name(self, obj):
+        return obj.screened_by.get_full_name() or obj.screened_by.username
+    
+    def get_cytology_thumbnail_url(self, obj):
+        return file_url(obj.cytology.thumbnail, self.context.get('request')) if obj.cytology else None
 
 class ScreeningRecordCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = ScreeningRecord
         exclude = [
             'screened_by', 'ai_risk_score', 'risk_level', 
-            'ai_confidence', 'recommended_action', 'screening_date'
+            'ai_confidence', 'recommended_action', 'screening_date',
+            'model_version', 'cytology'
         ]
     
     def validate(self, attrs):
@@ -50,6 +125,85 @@ class ScreeningRecordCreateSerializer(serializers.ModelSerializer):
         
         return attrs
 
+class PatientChangeSerializer(serializers.ModelSerializer):
+    """Flat patient row for the changes feed"""
+    class Meta:
+        model = Patient
+        fields = '__all__'
+
+class ScreeningRecordChangeSerializer(serializers.ModelSerializer):
+    """Flat screening row for the changes feed; related records are sent by id"""
+    class Meta:
+        model = ScreeningRecord
+        fields = '__all__'
+
+class ScreeningFollowUpChangeSerializer(serializers.ModelSerializer):
+    """Flat follow-up row for the changes feed"""
+    class Meta:
+        model = ScreeningFollowUp
+        fields = '__all__'
+
+class SyncPatientSerializer(serializers.ModelSerializer):
+    """Patient captured offline; uniqueness is checked for the whole batch at once"""
+    client_uuid = serializers.UUIDField()
+    
+    class Meta:
+        model = Patient
+        exclude = ['registered_by', 'user']
+        extra_kwargs = {'national_id': {'validators': []}}
+
+class SyncScreeningRecordSerializer(ScreeningRecordCreateSerializer):
+    """Screening captured offline, linked to a patient by server id or client UUID"""
+    client_uuid = serializers.UUIDField()
+    patient_id = serializers.IntegerField(required=False)
+    patient_uuid = serializers.UUIDField(required=False)
+    
+    class Meta(ScreeningRecordCreateSerializer.Meta):
+        exclude = ScreeningRecordCreateSerializer.Meta.exclude + [
+            'patient', 'cytology_image', 'referral_needed', 'offline_sync_status'
+        ]
+    
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if ('patient_id' in attrs) == ('patient_uuid' in attrs):
+            raise serializers.ValidationError("Provide exactly one of patient_id or patient_uuid.")
+        return attrs
+
+class SyncScreeningFollowUpSerializer(serializers.ModelSerializer):
+    """Follow-up captured offline, linked to a screening by server id or client UUID"""
+    client_uuid = serializers.UUIDField()
+    screening_record_id = serializers.IntegerField(required=False)
+    screening_uuid = serializers.UUIDField(required=False)
+    
+    class Meta:
+        model = ScreeningFollowUp
+        exclude = [
+            'screening_record', 'contacted_by', 'priority', 'referral_needed', 'leased_by', 'lease_expires_at'
+        ]
+    
+    def validate(self, attrs):
+        if ('screening_record_id' in attrs) == ('screening_uuid' in attrs):
+            raise serializers.ValidationError("Provide exactly one of screening_record_id or screening_uuid.")
+        return attrs
+
+class OfflineSyncSerializer(serializers.Serializer):
+    """A batch of records captured offline on one device"""
+    patients = SyncPatientSerializer(many=True, required=False)
+    screenings = SyncScreeningRecordSerializer(many=True, required=False)
+    follow_ups = SyncScreeningFollowUpSerializer(many=True, required=False)
+    
+    def validate(self, attrs):
+        total = sum(len(attrs.get(name, [])) for name in ('patients', 'screenings', 'follow_ups'))
+        if total > settings.SYNC_MAX_BATCH_SIZE:
+            raise serializers.ValidationError(
+                f"A sync batch may contain at most {settings.SYNC_MAX_BATCH_SIZE} records."
+            )
+        for name in ('patients', 'screenings', 'follow_ups'):
+            uuids = [item['client_uuid'] for item in attrs.get(name, [])]
+            if len(uuids) != len(set(uuids)):
+                raise serializers.ValidationError({name: "Duplicate client_uuid in batch."})
+        return attrs
+
 class ScreeningFollowUpSerializer(serializers.ModelSerializer):
     contacted_by_details = UserSerializer(source='contacted_by', read_only=True)
     patient_name = serializers.CharField(
@@ -60,7 +214,30 @@ class ScreeningFollowUpSerializer(serializers.ModelSerializer):
     class Meta:
         model = ScreeningFollowUp
         fields = '__all__'
-        read_only_fields = ['contacted_by']
+        read_only_fields = ['contacted_by', 'priority', 'referral_needed', 'leased_by', 'lease_expires_at']
+
+class FollowUpQueueItemSerializer(serializers.ModelSerializer):
+    """A follow-up in the CHV work queue with what is needed to make the call"""
+    patient_id = serializers.IntegerField(source='screening_record.patient_id', read_only=True)
+    patient_name = serializers.SerializerMethodField()
+    phone_number = serializers.CharField(source='screening_record.patient.phone_number', read_only=True)
+    risk_level = serializers.CharField(source='screening_record.risk_level', read_only=True)
+    days_overdue = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ScreeningFollowUp
+        fields = [
+            'id', 'screening_record', 'patient_id', 'patient_name', 'phone_number',
+            'follow_up_date', 'days_overdue', 'risk_level', 'referral_needed',
+            'priority', 'leased_by', 'lease_expires_at'
+        ]
+    
+    def get_patient_name(self, obj):
+        patient = obj.screening_record.patient
+        return f"{patient.first_name} {patient.last_name}"
+    
+    def get_days_overdue(self, obj):
+        return max((timezone.localdate() - obj.follow_up_date).days, 0)
 
 class RiskFactorWeightSerializer(serializers.ModelSerializer):
     class Meta:
@@ -96,6 +273,18 @@ class RiskPredictionInputSerializer(serializers.Serializer):
         allow_null=True
     )
 
+class RiskPredictionBatchInputSerializer(serializers.Serializer):
+    """Serializer for batched AI risk prediction input"""
+    screenings = RiskPredictionInputSerializer(many=True, allow_empty=False)
+    
+    def validate_screenings(self, value):
+        max_batch_size = settings.RISK_PREDICTION_MAX_BATCH_SIZE
+        if len(value) > max_batch_size:
+            raise serializers.ValidationError(
+                f"A batch may contain at most {max_batch_size} screenings."
+            )
+        return value
+
 class RiskPredictionOutputSerializer(serializers.Serializer):
     """Serializer for AI risk prediction output"""
     risk_score = serializers.FloatField()
@@ -105,6 +294,7 @@ class RiskPredictionOutputSerializer(serializers.Serializer):
     follow_up_months = serializers.IntegerField()
     referral_needed = serializers.BooleanField()
     explanation = serializers.ListField(child=serializers.CharField())
+    model_version = serializers.CharField()
 
 class ScreeningSummarySerializer(serializers.Serializer):
     """Serializer for screening statistics summary"""
@@ -115,4 +305,31 @@ class ScreeningSummarySerializer(serializers.Serializer):
     referrals_made = serializers.IntegerField()
     follow_ups_pending = serializers.IntegerField()
     screenings_this_month = serializers.IntegerField()
-    high_risk_percentage = serializers.FloatField()
\ No newline at end of file
+    high_risk_percentage = serializers.FloatField()
+
+class OutcomeCubeQuerySerializer(serializers.Serializer):
+    """Slice and roll-up of the outcome cube; list filters are comma-separated"""
+    group_by = serializers.CharField(required=False, allow_blank=True)
+    county = serializers.CharField(required=False)
+    sub_county = serializers.CharField(required=False)
+    risk_level = serializers.CharField(required=False)
+    hiv_status = serializers.CharField(required=False)
+    age_band = serializers.CharField(required=False)
+    start_month = serializers.DateField(required=False, input_formats=['%Y-%m'])
+    end_month = serializers.DateField(required=False, input_formats=['%Y-%m'])
+    
+    def validate_group_by(self, value):
+        dimensions = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in dimensions if name not in CUBE_DIMENSIONS]
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown dimensions {', '.join(unknown)}; choose from {', '.join(CUBE_DIMENSIONS)}"
+            )
+        return dimensions
+    
+    def filters(self):
+        return {
+            name: [value.strip() for value in self.validated_data[name].split(',')]
+            for name in ('county', 'sub_county', 'risk_level', 'hiv_status', 'age_band')
+            if name in self.validated_data
+        }
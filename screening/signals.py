@@ -0,0 +1,207 @@
+# screening/signals.py
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Patient, ScreeningRecord, ScreeningFollowUp, SyncTombstone
+from .counters import CounterDelta, move_patient_counters, stored_follow_up_snapshot, stored_screening_snapshot
+from .cube import CubeDelta, move_patient_screenings, stored_cube_snapshot, stored_patient_dimensions
+from .work_queue import update_priorities
+
+
+@receiver(post_delete, sender=Patient)
+def patient_deleted(sender, instance, **kwargs):
+    SyncTombstone.objects.create(
+        model_name='patient',
+        object_id=instance.pk,
+        client_uuid=instance.client_uuid,
+        owner_id=instance.registered_by_id
+    )
+
+
+@receiver(post_delete, sender=ScreeningRecord)
+def screening_record_deleted(sender, instance, **kwargs):
+    SyncTombstone.objects.create(
+        model_name='screening',
+        object_id=instance.pk,
+        client_uuid=instance.client_uuid,
+        owner_id=instance.screened_by_id
+    )
+
+
+@receiver(post_delete, sender=ScreeningFollowUp)
+def follow_up_deleted(sender, instance, **kwargs):
+    # Follow-ups are owned through their screening record
+    owner_id = (
+        ScreeningRecord.objects.filter(pk=instance.screening_record_id)
+        .values_list('screened_by_id', flat=True).first()
+    )
+    SyncTombstone.objects.create(
+        model_name='follow_up',
+        object_id=instance.pk,
+        client_uuid=instance.client_uuid,
+        owner_id=owner_id
+    )
+
+
+# Sync scope: a row given to another CHV or clinician leaves the previous
+# owner's changes feed, so it is reported to them as deleted.
+
+def _left_scope(model_name, rows, owner_id):
+    SyncTombstone.objects.bulk_create([
+        SyncTombstone(
+            model_name=model_name, object_id=pk, client_uuid=client_uuid, owner_id=owner_id, left_scope=True
+        )
+        for pk, client_uuid in rows
+    ])
+
+
+@receiver(pre_save, sender=Patient)
+def patient_owner_before_save(sender, instance, **kwargs):
+    instance._stored_owner_id = None if instance._state.adding else (
+        Patient.objects.filter(pk=instance.pk).values_list('registered_by_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Patient)
+def patient_owner_saved(sender, instance, **kwargs):
+    old = getattr(instance, '_stored_owner_id', None)
+    if old is not None and old != instance.registered_by_id:
+        _left_scope('patient', [(instance.pk, instance.client_uuid)], old)
+
+
+@receiver(pre_save, sender=ScreeningRecord)
+def screening_record_owner_before_save(sender, instance, **kwargs):
+    instance._stored_owner_id = None if instance._state.adding else (
+        ScreeningRecord.objects.filter(pk=instance.pk).values_list('screened_by_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=ScreeningRecord)
+def screening_record_owner_saved(sender, instance, **kwargs):
+    old = getattr(instance, '_stored_owner_id', None)
+    if old is not None and old != instance.screened_by_id:
+        _left_scope('screening', [(instance.pk, instance.client_uuid)], old)
+        # Its follow-ups are owned through it and move with it
+        _left_scope('follow_up', instance.follow_ups.values_list('pk', 'client_uuid'), old)
+
+
+@receiver(pre_save, sender=ScreeningFollowUp)
+def follow_up_owner_before_save(sender, instance, **kwargs):
+    instance._stored_owner = None if instance._state.adding else (
+        ScreeningFollowUp.objects.filter(pk=instance.pk)
+        .values_list('screening_record_id', 'screening_record__screened_by_id').first()
+    )
+
+
+@receiver(post_save, sender=ScreeningFollowUp)
+def follow_up_owner_saved(sender, instance, **kwargs):
+    old = getattr(instance, '_stored_owner', None)
+    if old is None or old[0] == instance.screening_record_id:
+        return
+    owner_id = old[1]
+    if owner_id is not None and owner_id != instance.screening_record.screened_by_id:
+        _left_scope('follow_up', [(instance.pk, instance.client_uuid)], owner_id)
+
+
+# Summary counters: remember what a row contributed before it changes, then
+# apply the difference once the change is written.
+
+@receiver(pre_save, sender=ScreeningRecord)
+def screening_record_before_save(sender, instance, **kwargs):
+    instance._counter_snapshot = None if instance._state.adding else stored_screening_snapshot(instance.pk)
+
+
+@receiver(post_save, sender=ScreeningRecord)
+def screening_record_saved(sender, instance, **kwargs):
+    delta = CounterDelta()
+    delta.change(getattr(instance, '_counter_snapshot', None), stored_screening_snapshot(instance.pk))
+    delta.apply()
+
+
+@receiver(post_save, sender=ScreeningRecord)
+def screening_record_reprioritise_follow_ups(sender, instance, created, **kwargs):
+    if not created:
+        update_priorities({instance.pk: (instance.risk_level, instance.referral_needed)})
+
+
+@receiver(pre_delete, sender=ScreeningRecord)
+def screening_record_before_delete(sender, instance, **kwargs):
+    instance._counter_snapshot = stored_screening_snapshot(instance.pk)
+
+
+@receiver(post_delete, sender=ScreeningRecord)
+def screening_record_counters_deleted(sender, instance, **kwargs):
+    delta = CounterDelta()
+    delta.add(getattr(instance, '_counter_snapshot', None), -1)
+    delta.apply()
+
+
+@receiver(pre_save, sender=ScreeningFollowUp)
+def follow_up_before_save(sender, instance, **kwargs):
+    instance._counter_snapshot = None if instance._state.adding else stored_follow_up_snapshot(instance.pk)
+
+
+@receiver(post_save, sender=ScreeningFollowUp)
+def follow_up_saved(sender, instance, **kwargs):
+    delta = CounterDelta()
+    delta.change(getattr(instance, '_counter_snapshot', None), stored_follow_up_snapshot(instance.pk))
+    delta.apply()
+
+
+@receiver(pre_delete, sender=ScreeningFollowUp)
+def follow_up_before_delete(sender, instance, **kwargs):
+    instance._counter_snapshot = stored_follow_up_snapshot(instance.pk)
+
+
+@receiver(post_delete, sender=ScreeningFollowUp)
+def follow_up_counters_deleted(sender, instance, **kwargs):
+    delta = CounterDelta()
+    delta.add(getattr(instance, '_counter_snapshot', None), -1)
+    delta.apply()
+
+
+# Outcome cube: same snapshot-and-diff approach, keyed by the cube dimensions.
+
+@receiver(pre_save, sender=ScreeningRecord)
+def screening_record_cube_before_save(sender, instance, **kwargs):
+    instance._cube_snapshot = None if instance._state.adding else stored_cube_snapshot(instance.pk)
+
+
+@receiver(post_save, sender=ScreeningRecord)
+def screening_record_cube_saved(sender, instance, **kwargs):
+    delta = CubeDelta()
+    delta.change(getattr(instance, '_cube_snapshot', None), stored_cube_snapshot(instance.pk))
+    delta.apply()
+
+
+@receiver(pre_delete, sender=ScreeningRecord)
+def screening_record_cube_before_delete(sender, instance, **kwargs):
+    instance._cube_snapshot = stored_cube_snapshot(instance.pk)
+
+
+@receiver(post_delete, sender=ScreeningRecord)
+def screening_record_cube_deleted(sender, instance, **kwargs):
+    delta = CubeDelta()
+    delta.add(getattr(instance, '_cube_snapshot', None), -1)
+    delta.apply()
+
+
+# A patient's county feeds the counters; county, sub-county and birth date feed the cube.
+
+@receiver(pre_save, sender=Patient)
+def patient_before_save(sender, instance, **kwargs):
+    instance._stored_dimensions = None if instance._state.adding else stored_patient_dimensions(instance.pk)
+
+
+@receiver(post_save, sender=Patient)
+def patient_saved(sender, instance, created, **kwargs):
+    old = getattr(instance, '_stored_dimensions', None)
+    if created or old is None:
+        return
+    new = stored_patient_dimensions(instance.pk)
+    if new == old:
+        return
+    # Dimensions are (county, sub_county, date_of_birth)
+    if new[0] != old[0]:
+        move_patient_counters(instance.pk, old[0], new[0])
+    move_patient_screenings(instance.pk, old, new)
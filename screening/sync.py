@@ -0,0 +1,242 @@
+# screening/sync.py
+from typing import Dict, List
+import logging
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .ai_service import risk_predictor
+from .models import Patient, ScreeningRecord, ScreeningFollowUp
+from .counters import record_follow_ups_created, record_screenings_created
+from .cube import record_cube_screenings
+from .results import auto_follow_up, prediction_fields, prediction_input
+
+logger = logging.getLogger(__name__)
+
+
+def _scoped(queryset, user, owner_field):
+    """Restrict a queryset to the user's own records for CHVs and clinicians"""
+    if user.user_type in ['CHV', 'CLINICIAN']:
+        return queryset.filter(**{owner_field: user})
+    return queryset
+
+
+def _reject_foreign(model, uuids, existing, section: str) -> None:
+    """Refuse UUIDs already used by records outside the user's scope; they are never matched"""
+    unmatched = [uuid for uuid in uuids if uuid not in existing]
+    if not unmatched:
+        return
+    foreign = model.objects.filter(client_uuid__in=unmatched).values_list('client_uuid', flat=True)
+    errors = {str(uuid): "This client_uuid is used by another user's record." for uuid in foreign}
+    if errors:
+        raise ValidationError({section: errors})
+
+
+def _public(result: Dict, instance_key: str) -> Dict:
+    """A result entry without the model instance kept for linking"""
+    return {key: value for key, value in result.items() if key != instance_key}
+
+
+class OfflineSync:
+    """Persist a batch of offline records in one transaction.
+
+    Every record carries a client-generated UUID. Records whose UUID is
+    already on the server are reported as existing and left untouched, so
+    a device can resend a batch after a dropped connection. Only records
+    the user may see count as existing; a UUID taken by someone else's
+    record is rejected. New patients,
+    screenings and follow-ups are written with bulk_create, and all new
+    screenings are scored with a single predict_batch call.
+    """
+
+    def __init__(self, user, patients: List[Dict], screenings: List[Dict], follow_ups: List[Dict]):
+        self.user = user
+        self.patients = patients
+        self.screenings = screenings
+        self.follow_ups = follow_ups
+
+    def run(self) -> Dict:
+        try:
+            return self._run()
+        except IntegrityError:
+            # Another request synced some of these records concurrently;
+            # on retry they are found and skipped as existing
+            logger.warning("Integrity error during offline sync, retrying once")
+            return self._run()
+
+    @transaction.atomic
+    def _run(self) -> Dict:
+        patients_by_uuid = self._sync_patients()
+        screenings_by_uuid = self._sync_screenings(patients_by_uuid)
+        follow_ups = self._sync_follow_ups(screenings_by_uuid)
+        return {
+            'patients': [
+                _public(patients_by_uuid[item['client_uuid']], 'patient') for item in self.patients
+            ],
+            'screenings': [
+                _public(screenings_by_uuid[item['client_uuid']], 'record') for item in self.screenings
+            ],
+            'follow_ups': follow_ups,
+        }
+
+    def _sync_patients(self) -> Dict:
+        uuids = [item['client_uuid'] for item in self.patients]
+        existing = {
+            patient.client_uuid: patient
+            for patient in _scoped(Patient.objects.filter(client_uuid__in=uuids), self.user, 'registered_by')
+        }
+        _reject_foreign(Patient, uuids, existing, 'patients')
+        new_items = [item for item in self.patients if item['client_uuid'] not in existing]
+
+        taken_ids = set(
+            Patient.objects.filter(national_id__in=[item['national_id'] for item in new_items])
+            .values_list('national_id', flat=True)
+        )
+        batch_ids = [item['national_id'] for item in new_items]
+        errors = {
+            str(item['client_uuid']): "A patient with this national ID already exists."
+            for item in new_items
+            if item['national_id'] in taken_ids or batch_ids.count(item['national_id']) > 1
+        }
+        if errors:
+            raise ValidationError({'patients': errors})
+
+        created = Patient.objects.bulk_create([
+            Patient(registered_by=self.user, **item) for item in new_items
+        ])
+
+        results = {
+            uuid: {'client_uuid': uuid, 'id': patient.id, 'created': False, 'patient': patient}
+            for uuid, patient in existing.items()
+        }
+        for patient in created:
+            results[patient.client_uuid] = {
+                'client_uuid': patient.client_uuid, 'id': patient.id, 'created': True, 'patient': patient
+            }
+        return results
+
+    def _sync_screenings(self, patients_by_uuid: Dict) -> Dict:
+        uuids = [item['client_uuid'] for item in self.screenings]
+        existing = {
+            record.client_uuid: record
+            for record in _scoped(ScreeningRecord.objects.filter(client_uuid__in=uuids), self.user, 'screened_by')
+        }
+        _reject_foreign(ScreeningRecord, uuids, existing, 'screenings')
+        new_items = [item for item in self.screenings if item['client_uuid'] not in existing]
+
+        server_ids = {item['patient_id'] for item in new_items if 'patient_id' in item}
+        server_patients = _scoped(
+            Patient.objects.filter(id__in=server_ids), self.user, 'registered_by'
+        ).in_bulk()
+
+        records, errors = [], {}
+        for item in new_items:
+            item = dict(item)
+            patient_id = item.pop('patient_id', None)
+            patient_uuid = item.pop('patient_uuid', None)
+            if patient_uuid is not None:
+                entry = patients_by_uuid.get(patient_uuid)
+                patient = entry['patient'] if entry else None
+            else:
+                patient = server_patients.get(patient_id)
+            if patient is None:
+                errors[str(item['client_uuid'])] = "Patient not found."
+                continue
+            records.append(ScreeningRecord(
+                patient=patient,
+                screened_by=self.user,
+                offline_sync_status=True,
+                **item
+            ))
+        if errors:
+            raise ValidationError({'screenings': errors})
+
+        predictions = risk_predictor.predict_batch([prediction_input(record) for record in records])
+        for record, prediction in zip(records, predictions):
+            for field, value in prediction_fields(prediction).items():
+                setattr(record, field, value)
+
+        created = ScreeningRecord.objects.bulk_create(records)
+        record_screenings_created(created)
+        record_cube_screenings(created)
+
+        today = timezone.now().date()
+        auto_follow_ups = ScreeningFollowUp.objects.bulk_create([
+            follow_up for follow_up in (
+                auto_follow_up(record, prediction, today) for record, prediction in zip(created, predictions)
+            )
+            if follow_up is not None
+        ])
+        record_follow_ups_created(auto_follow_ups)
+
+        results = {
+            uuid: self._screening_result(record, created=False)
+            for uuid, record in existing.items()
+        }
+        for record in created:
+            results[record.client_uuid] = self._screening_result(record, created=True)
+        return results
+
+    def _screening_result(self, record: ScreeningRecord, created: bool) -> Dict:
+        return {
+            'client_uuid': record.client_uuid,
+            'id': record.id,
+            'created': created,
+            'risk_level': record.risk_level,
+            'ai_risk_score': record.ai_risk_score,
+            'ai_confidence': record.ai_confidence,
+            'recommended_action': record.recommended_action,
+            'referral_needed': record.referral_needed,
+            'model_version': record.model_version,
+            'record': record,
+        }
+
+    def _sync_follow_ups(self, screenings_by_uuid: Dict) -> List[Dict]:
+        uuids = [item['client_uuid'] for item in self.follow_ups]
+        existing = dict(
+            _scoped(
+                ScreeningFollowUp.objects.filter(client_uuid__in=uuids), self.user, 'screening_record__screened_by'
+            ).values_list('client_uuid', 'id')
+        )
+        _reject_foreign(ScreeningFollowUp, uuids, existing, 'follow_ups')
+        new_items = [item for item in self.follow_ups if item['client_uuid'] not in existing]
+
+        server_ids = {item['screening_record_id'] for item in new_items if 'screening_record_id' in item}
+        server_records = _scoped(
+            ScreeningRecord.objects.filter(id__in=server_ids), self.user, 'screened_by'
+        ).in_bulk()
+
+        follow_ups, errors = [], {}
+        for item in new_items:
+            item = dict(item)
+            record_id = item.pop('screening_record_id', None)
+            screening_uuid = item.pop('screening_uuid', None)
+            if screening_uuid is not None:
+                entry = screenings_by_uuid.get(screening_uuid)
+                record = entry['record'] if entry else None
+            else:
+                record = server_records.get(record_id)
+            if record is None:
+                errors[str(item['client_uuid'])] = "Screening record not found."
+                continue
+            follow_ups.append(ScreeningFollowUp(
+                screening_record=record,
+                priority=ScreeningFollowUp.priority_for(record.risk_level),
+                referral_needed=record.referral_needed,
+                **item
+            ))
+        if errors:
+            raise ValidationError({'follow_ups': errors})
+
+        follow_ups = ScreeningFollowUp.objects.bulk_create(follow_ups)
+        record_follow_ups_created(follow_ups)
+        created = {follow_up.client_uuid: follow_up.id for follow_up in follow_ups}
+        return [
+            {
+                'client_uuid': uuid,
+                'id': existing.get(uuid, created.get(uuid)),
+                'created': uuid in created,
+            }
+            for uuid in uuids
+        ]
@@ -1,3 +1,1532 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import joblib
+import numpy as np
+from django.apps import apps
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import SkipFile
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import User, UserProfile
+from jobs.models import Job
+from jobs.queue import run_inline
+from .ai_service import SCREENING_INPUT_FIELDS, CervicalCancerRiskPredictor
+from .batching import MicroBatcher
+from .changes import encode_watermark
+from .counters import compute_counters, get_summary
+from .cytology import THUMBNAIL_JOB, HashingTemporaryFileUploadHandler, generate_thumbnail
+from .cube import CUBE_DIMENSIONS, CUBE_MEASURES, compute_cube, query_cube, query_screenings
+from .export import COLUMNS, parquet_available
+from .management.commands.rescore_screenings import age_at_screening
+from .model_registry import ModelRegistry
+from .prediction_cache import PredictionCache
+from .risk_table import KEY_DEFAULTS, KEY_FIELDS
+from .search import FTS_TABLE, search_index_missing, search_patient_ids
+from .models import (
+    CytologyImage, Patient, ScreeningCounter, ScreeningFollowUp, ScreeningOutcomeCube, ScreeningRecord,
+    SyncTombstone, age_on,
+)
+from .views import (
+    FollowUpQueueView, PatientListCreateView, ScreeningRecordListCreateView, changes_feed_view, cytology_upload_view,
+    follow_up_lease_view, follow_up_release_view, offline_sync_view, outcome_cube_view, patient_search_view,
+    predict_risk_batch_view, screening_export_view,
+)
+
+
+class ScreeningRecordListQueryCountTests(TestCase):
+    """The screening list must not issue a query per row"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pass', user_type='ADMIN'
+        )
+
+    def create_screenings(self, start, stop):
+        for n in range(start, stop):
+            screener = User.objects.create_user(
+                email=f'chv{n}@example.com', username=f'chv{n}', password='pass',
+                first_name='Chv', last_name=str(n), user_type='CHV'
+            )
+            UserProfile.objects.create(user=screener)
+            patient = Patient.objects.create(
+                first_name='Jane', last_name=str(n), date_of_birth=date(1985, 1, 1),
+                phone_number=f'07{n:08d}', national_id=f'ID{n}', county='Kisumu',
+                sub_county='Kisumu East', location='Kondele', marital_status='MARRIED',
+                registered_by=screener
+            )
+            ScreeningRecord.objects.create(
+                patient=patient, screened_by=screener, age_at_first_intercourse=18,
+                hiv_status='NEGATIVE', hpv_vaccination_status='UNKNOWN',
+                contraceptive_use='NONE', smoking_status='NEVER', ai_risk_score=0.2,
+                risk_level='LOW', ai_confidence=0.8, recommended_action='Routine screening'
+            )
+
+    def count_list_queries(self, params=None):
+        request = self.factory.get('/api/screening/screenings/', params or {})
+        force_authenticate(request, user=self.admin)
+        with CaptureQueriesContext(connection) as context:
+            response = ScreeningRecordListCreateView.as_view()(request)
+            response.render()
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_full_list_query_count_is_constant(self):
+        self.create_screenings(0, 2)
+        small, _ = self.count_list_queries()
+        self.create_screenings(2, 15)
+        large, response = self.count_list_queries()
+        self.assertEqual(len(response.data['results']), 15)
+        self.assertIn('profile', response.data['results'][0]['screened_by_details'])
+        self.assertEqual(small, large)
+
+    def test_summary_list_query_count_is_constant(self):
+        self.create_screenings(0, 2)
+        small, _ = self.count_list_queries({'view': 'summary'})
+        self.create_screenings(2, 15)
+        large, response = self.count_list_queries({'view': 'summary'})
+        self.assertEqual(len(response.data['results']), 15)
+        self.assertEqual(response.data['results'][0]['screened_by_name'], 'Chv 14')
+        self.assertEqual(small, large)
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pages walk the list in both directions without duplicates, even while rows are added"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.admin = User.objects.create_user(
+            email='pages@example.com', username='pages', password='pass', user_type='ADMIN'
+        )
+        self.patient = Patient.objects.create(
+            first_name='Jane', last_name='Doe', date_of_birth=date(1985, 1, 1), phone_number='0700000001',
+            national_id='P1', county='Kisumu', sub_county='Kisumu East', location='Kondele',
+            marital_status='MARRIED', registered_by=self.admin
+        )
+        # Pairs of screenings share a screening_date, so pages split ties on id
+        start = timezone.now() - timedelta(days=30)
+        for n in range(7):
+            self.screen(start + timedelta(days=n // 2))
+        self.expected = list(
+            ScreeningRecord.objects.order_by('-screening_date', '-id').values_list('pk', flat=True)
+        )
+
+    def screen(self, screening_date):
+        record = ScreeningRecord.objects.create(
+            patient=self.patient, screened_by=self.admin, age_at_first_intercourse=18,
+            hiv_status='NEGATIVE', hpv_vaccination_status='UNKNOWN', contraceptive_use='NONE',
+            smoking_status='NEVER', ai_risk_score=0.2, risk_level='LOW', ai_confidence=0.8,
+            recommended_action='Routine screening'
+        )
+        ScreeningRecord.objects.filter(pk=record.pk).update(screening_date=screening_date)
+        return record.pk
+
+    def get(self, params=None, url=None):
+        if url:
+            params = {key: values[0] for key, values in parse_qs(urlparse(url).query).items()}
+        request = self.factory.get('/api/screening/screenings/', params or {})
+        force_authenticate(request, user=self.admin)
+        return ScreeningRecordListCreateView.as_view()(request)
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_pages_round_trip_in_both_directions(self):
+        pages = [self.get({'pagination': 'cursor', 'page_size': 3, 'view': 'summary'})]
+        self.assertIsNone(pages[0].data['previous'])
+        while pages[-1].data['next']:
+            pages.append(self.get(url=pages[-1].data['next']))
+        self.assertEqual([len(self.ids(page)) for page in pages], [3, 3, 1])
+        self.assertEqual([pk for page in pages for pk in self.ids(page)], self.expected)
+
+        previous = self.get(url=pages[-1].data['previous'])
+        self.assertEqual(self.ids(previous), self.ids(pages[1]))
+        first = self.get(url=previous.data['previous'])
+        self.assertEqual(self.ids(first), self.expected[:3])
+        self.assertIsNone(first.data['previous'])
+        self.assertEqual(self.ids(self.get(url=first.data['next'])), self.expected[3:6])
+
+    def test_invalid_cursor_is_404(self):
+        wrong_length = base64.urlsafe_b64encode(b'{"k":["1"],"r":false}').decode('ascii')
+        for cursor in ('not-a-cursor', 'e30=', wrong_length):
+            with self.subTest(cursor=cursor):
+                response = self.get({'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(str(response.data['detail']), 'Invalid cursor')
+
+    def test_rows_added_while_paging_are_not_repeated(self):
+        first = self.get({'pagination': 'cursor', 'page_size': 3})
+        # One row lands before the cursor and one after; the one tying the last row's
+        # date has a higher id, so it also sorts before the cursor
+        self.screen(timezone.now())
+        older = self.screen(timezone.now() - timedelta(days=60))
+        last = ScreeningRecord.objects.get(pk=self.ids(first)[-1])
+        tied = self.screen(last.screening_date)
+        seen = self.ids(first)
+        response = first
+        while response.data['next']:
+            response = self.get(url=response.data['next'])
+            seen += self.ids(response)
+        self.assertNotIn(tied, seen)
+        self.assertEqual(seen, self.expected + [older])
+
+    def test_page_numbers_break_date_ties_on_id(self):
+        self.assertEqual(self.ids(self.get()), self.expected)
+        for view, ordering in (
+            (ScreeningRecordListCreateView, '"screening_date" DESC, "screening_screeningrecord"."id" DESC'),
+            (PatientListCreateView, '"created_at" DESC, "screening_patient"."id" DESC'),
+        ):
+            request = self.factory.get('/api/screening/')
+            force_authenticate(request, user=self.admin)
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(view.as_view()(request).status_code, 200)
+            self.assertTrue(any(f'{ordering} LIMIT' in query['sql'] for query in context.captured_queries))
+
+
+class OfflineSyncOwnershipTests(TestCase):
+    """A client_uuid owned by another CHV is refused, never matched"""
+
+    screening = {
+        'age_at_first_intercourse': 18, 'number_of_sexual_partners': 1, 'parity': 1,
+        'hiv_status': 'NEGATIVE', 'hpv_vaccination_status': 'UNKNOWN', 'contraceptive_use': 'NONE',
+        'smoking_status': 'NEVER', 'family_history_cervical_cancer': False, 'previous_abnormal_pap': False,
+    }
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.first = User.objects.create_user(
+            email='chv1@example.com', username='chv1', password='pass', user_type='CHV'
+        )
+        self.second = User.objects.create_user(
+            email='chv2@example.com', username='chv2', password='pass', user_type='CHV'
+        )
+        self.patient_uuid, self.screening_uuid, self.follow_up_uuid = (str(uuid.uuid4()) for _ in range(3))
+        response = self.sync(self.first, {
+            'patients': [self.patient(self.patient_uuid, 'ID1')],
+            'screenings': [dict(self.screening, client_uuid=self.screening_uuid, patient_uuid=self.patient_uuid)],
+            'follow_ups': [{
+                'client_uuid': self.follow_up_uuid, 'screening_uuid': self.screening_uuid,
+                'follow_up_date': '2030-01-01', 'status': 'PENDING',
+            }],
+        })
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def patient(self, client_uuid, national_id):
+        return {
+            'client_uuid': client_uuid, 'first_name': 'Jane', 'last_name': 'Doe', 'date_of_birth': '1985-01-01',
+            'phone_number': '0700000000', 'national_id': national_id, 'county': 'Kisumu',
+            'sub_county': 'Kisumu East', 'location': 'Kondele', 'marital_status': 'MARRIED',
+        }
+
+    def sync(self, user, payload):
+        request = self.factory.post('/api/screening/sync/', payload, format='json')
+        force_authenticate(request, user=user)
+        return offline_sync_view(request)
+
+    def test_resend_by_owner_is_matched(self):
+        response = self.sync(self.first, {
+            'patients': [self.patient(self.patient_uuid, 'ID1')],
+            'screenings': [dict(self.screening, client_uuid=self.screening_uuid, patient_uuid=self.patient_uuid)],
+        })
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertFalse(response.data['patients'][0]['created'])
+        self.assertFalse(response.data['screenings'][0]['created'])
+
+    def test_other_users_patient_uuid_is_rejected(self):
+        new_screening = str(uuid.uuid4())
+        response = self.sync(self.second, {
+            'patients': [self.patient(self.patient_uuid, 'ID2')],
+            'screenings': [dict(self.screening, client_uuid=new_screening, patient_uuid=self.patient_uuid)],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(self.patient_uuid, response.data['patients'])
+        self.assertFalse(ScreeningRecord.objects.filter(client_uuid=new_screening).exists())
+        self.assertEqual(Patient.objects.get(client_uuid=self.patient_uuid).screening_records.count(), 1)
+
+    def test_other_users_screening_uuid_does_not_echo_results(self):
+        own_patient = str(uuid.uuid4())
+        response = self.sync(self.second, {
+            'patients': [self.patient(own_patient, 'ID3')],
+            'screenings': [dict(self.screening, client_uuid=self.screening_uuid, patient_uuid=own_patient)],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(self.screening_uuid, response.data['screenings'])
+        self.assertNotIn('risk_level', str(response.data))
+        self.assertFalse(Patient.objects.filter(client_uuid=own_patient).exists())
+
+    def test_other_users_follow_up_uuid_is_rejected(self):
+        response = self.sync(self.second, {
+            'follow_ups': [{
+                'client_uuid': self.follow_up_uuid,
+                'screening_record_id': ScreeningRecord.objects.get().id,
+                'follow_up_date': '2030-01-01', 'status': 'PENDING',
+            }],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(self.follow_up_uuid, response.data['follow_ups'])
+        self.assertEqual(ScreeningFollowUp.objects.filter(client_uuid=self.follow_up_uuid).count(), 1)
+
+
+class CytologyLinkTests(TestCase):
+    """Only the upload view links a cytology image to a screening"""
+
+    def test_create_ignores_cytology(self):
+        owner = User.objects.create_user(
+            email='chv1@example.com', username='chv1', password='pass', user_type='CHV'
+        )
+        other = User.objects.create_user(
+            email='chv2@example.com', username='chv2', password='pass', user_type='CHV'
+        )
+        image = CytologyImage.objects.create(sha256='0' * 64, image='cytology_images/a.png', uploaded_by=owner)
+        patient = Patient.objects.create(
+            first_name='Jane', last_name='Doe', date_of_birth=date(1985, 1, 1), phone_number='0700000000',
+            national_id='ID1', county='Kisumu', sub_county='Kisumu East', location='Kondele',
+            marital_status='MARRIED', registered_by=other
+        )
+        request = APIRequestFactory().post('/api/screening/screenings/', dict(
+            OfflineSyncOwnershipTests.screening, patient=patient.pk, cytology=image.pk
+        ), format='json')
+        force_authenticate(request, user=other)
+        response = ScreeningRecordListCreateView.as_view()(request)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertIsNone(ScreeningRecord.objects.get().cytology_id)
+
+
+class CytologyUploadTests(TestCase):
+    """Uploads are stored once per content and thumbnailed by a job"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        overrides = override_settings(MEDIA_ROOT=media.name, JOBS_RUN_INLINE=False, CYTOLOGY_THUMBNAIL_SIZE=64)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.chv = User.objects.create_user(
+            email='chv1@example.com', username='chv1', password='pass', user_type='CHV'
+        )
+
+    def png(self, size=(300, 200), color='purple'):
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new('RGB', size, color).save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def upload(self, content, name='slide.png'):
+        request = APIRequestFactory().post(
+            '/api/screening/cytology/', {'image': SimpleUploadedFile(name, content)}, format='multipart'
+        )
+        force_authenticate(request, user=self.chv)
+        response = cytology_upload_view(request)
+        # As the request handler does; the temporary file has been moved into storage
+        request.close()
+        return response
+
+    def stored_files(self):
+        return [name for _, _, names in os.walk(self.media_root) for name in names]
+
+    def test_duplicate_upload_is_stored_once(self):
+        content = self.png()
+        first = self.upload(content)
+        self.assertEqual(first.status_code, 202, first.data)
+        self.assertEqual((first.data['created'], first.data['status']), (True, CytologyImage.PENDING))
+        second = self.upload(content, name='again.png')
+        self.assertEqual(second.status_code, 200, second.data)
+        self.assertEqual((second.data['id'], second.data['created']), (first.data['id'], False))
+        self.assertEqual(CytologyImage.objects.count(), 1)
+        self.assertEqual(len(self.stored_files()), 1)
+
+        thumbnail_job = Job.objects.get()
+        self.assertEqual((thumbnail_job.name, thumbnail_job.payload), (THUMBNAIL_JOB, {'image_id': first.data['id']}))
+        self.assertTrue(run_inline(thumbnail_job.pk))
+        image = CytologyImage.objects.get()
+        self.assertEqual((image.status, image.width, image.height), (CytologyImage.READY, 300, 200))
+        from PIL import Image
+
+        with image.thumbnail.open('rb') as f, Image.open(f) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.size), ('JPEG', (64, 43)))
+
+    @override_settings(CYTOLOGY_MAX_UPLOAD_MB=1)
+    def test_oversized_upload_is_dropped_while_streaming(self):
+        response = self.upload(b'\0' * (1024 * 1024 + 1))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'image must be at most 1 MB'})
+        self.assertFalse(CytologyImage.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+    @override_settings(CYTOLOGY_MAX_UPLOAD_MB=1)
+    def test_handler_stops_writing_at_the_limit(self):
+        handler = HashingTemporaryFileUploadHandler()
+        handler.new_file('image', 'slide.png', 'image/png', None)
+        self.addCleanup(handler.file.close)
+        chunk = b'\0' * (512 * 1024)
+        handler.receive_data_chunk(chunk, 0)
+        handler.receive_data_chunk(chunk, len(chunk))
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(b'\0', 2 * len(chunk))
+        self.assertTrue(handler.too_large)
+        self.assertEqual(handler.file.tell(), 1024 * 1024)
+
+    def test_not_an_image_is_rejected(self):
+        response = self.upload(b'not an image', name='slide.png')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CytologyImage.objects.exists())
+
+    def test_failed_and_stuck_thumbnails_are_queued_again(self):
+        broken = CytologyImage.objects.create(sha256='1' * 64, uploaded_by=self.chv)
+        broken.image.save('broken.png', ContentFile(b'truncated'), save=True)
+        generate_thumbnail(broken.pk)
+        broken.refresh_from_db()
+        self.assertEqual(broken.status, CytologyImage.FAILED)
+
+        stuck = CytologyImage.objects.create(sha256='2' * 64, uploaded_by=self.chv)
+        stuck.image.save('stuck.png', ContentFile(self.png()), save=True)
+        CytologyImage.objects.create(sha256='3' * 64, image='ready.png', status=CytologyImage.READY)
+        waiting = CytologyImage.objects.create(sha256='4' * 64, image='waiting.png')
+        Job.objects.create(name=THUMBNAIL_JOB, payload={'image_id': waiting.pk})
+
+        call_command('regenerate_cytology_thumbnails', stdout=StringIO())
+        queued = Job.objects.filter(name=THUMBNAIL_JOB).order_by('pk')
+        self.assertEqual(
+            sorted(job.payload['image_id'] for job in queued), sorted([broken.pk, stuck.pk, waiting.pk])
+        )
+        self.assertTrue(run_inline(queued.get(payload__image_id=stuck.pk).pk))
+        stuck.refresh_from_db()
+        self.assertEqual(stuck.status, CytologyImage.READY)
+
+
+class ScreeningFollowUpTests(TestCase):
+    """The follow-up is saved with the screening, whether or not a job worker runs"""
+
+    @override_settings(JOBS_RUN_INLINE=False)
+    def test_follow_up_created_without_worker(self):
+        chv = User.objects.create_user(
+            email='chv1@example.com', username='chv1', password='pass', user_type='CHV'
+        )
+        patient = Patient.objects.create(
+            first_name='Jane', last_name='Doe', date_of_birth=date(1975, 1, 1), phone_number='0700000000',
+            national_id='ID1', county='Kisumu', sub_county='Kisumu East', location='Kondele',
+            marital_status='MARRIED', registered_by=chv
+        )
+        request = APIRequestFactory().post('/api/screening/screenings/', dict(
+            OfflineSyncOwnershipTests.screening, patient=patient.pk, hiv_status='POSITIVE',
+            number_of_sexual_partners=6, smoking_status='CURRENT', previous_abnormal_pap=True,
+            family_history_cervical_cancer=True, via_result='POSITIVE'
+        ), format='json')
+        force_authenticate(request, user=chv)
+        response = ScreeningRecordListCreateView.as_view()(request)
+        self.assertEqual(response.status_code, 201, response.data)
+        record = ScreeningRecord.objects.get()
+        self.assertEqual(record.risk_level, 'HIGH')
+        self.assertEqual(record.follow_ups.count(), 1)
+
+    def test_sync_and_create_give_the_same_results(self):
+        chv = User.objects.create_user(
+            email='chv1@example.com', username='chv1', password='pass', user_type='CHV'
+        )
+        patient = Patient.objects.create(
+            first_name='Jane', last_name='Doe', date_of_birth=date(1975, 1, 1), phone_number='0700000000',
+            national_id='ID1', county='Kisumu', sub_county='Kisumu East', location='Kondele',
+            marital_status='MARRIED', registered_by=chv
+        )
+        # parity is left out, so both paths must fall back to the model default
+        screening = dict(OfflineSyncOwnershipTests.screening, via_result='POSITIVE', bethesda_category='LSIL')
+        del screening['parity']
+        request = APIRequestFactory().post(
+            '/api/screening/screenings/', dict(screening, patient=patient.pk), format='json'
+        )
+        force_authenticate(request, user=chv)
+        self.assertEqual(ScreeningRecordListCreateView.as_view()(request).status_code, 201)
+        request = APIRequestFactory().post('/api/screening/sync/', {
+            'screenings': [dict(screening, client_uuid=str(uuid.uuid4()), patient_id=patient.pk)],
+        }, format='json')
+        force_authenticate(request, user=chv)
+        self.assertEqual(offline_sync_view(request).status_code, 200)
+
+        fields = (
+            'ai_risk_score', 'risk_level', 'ai_confidence', 'recommended_action', 'referral_needed',
+            'model_version', 'follow_ups__follow_up_date', 'follow_ups__status', 'follow_ups__priority',
+            'follow_ups__referral_needed',
+        )
+        created, synced = ScreeningRecord.objects.order_by('offline_sync_status').values_list(*fields)
+        self.assertEqual(created, synced)
+        self.assertNotEqual(created[5], '')
+        self.assertEqual(created[1], 'MODERATE')
+
+
+def stored_counters():
+    """Non-zero counter rows, keyed like compute_counters"""
+    fields = ('total_screenings', 'high_risk_count', 'moderate_risk_count', 'low_risk_count',
+              'referrals_made', 'follow_ups_pending')
+    stored = {
+        (c.scope, c.scope_key, c.period, c.period_start): {f: getattr(c, f) for f in fields if getattr(c, f)}
+        for c in ScreeningCounter.objects.all()
+    }
+    return {key: counts for key, counts in stored.items() if counts}
+
+
+def stored_cube():
+    """Non-zero cube rows, keyed like compute_cube"""
+    stored = {
+        tuple(getattr(row, dimension) for dimension in CUBE_DIMENSIONS):
+            {measure: getattr(row, measure) for measure in CUBE_MEASURES if getattr(row, measure)}
+        for row in ScreeningOutcomeCube.objects.all()
+    }
+    return {key: measures for key, measures in stored.items() if measures}
+
+
+class ScreeningCounterTests(TestCase):
+    """Signals keep the summary counters and the outcome cube equal to a recount"""
+
+    def setUp(self):
+        self.chv = User.objects.create_user(
+            email='counter@example.com', username='counter', password='pass', user_type='CHV'
+        )
+        self.patient = Patient.objects.create(
+            first_name='Jane', last_name='Doe', date_of_birth=date(1985, 1, 1), phone_number='0700000001',
+            national_id='C1', county='Kisumu', sub_county='Kisumu East', location='Kondele',
+            marital_status='MARRIED', registered_by=self.chv
+        )
+
+    def screen(self, risk_level='HIGH', referral_needed=True):
+        return ScreeningRecord.objects.create(
+            patient=self.patient, screened_by=self.chv, age_at_first_intercourse=18,
+            hiv_status='NEGATIVE', hpv_vaccination_status='UNKNOWN', contraceptive_use='NONE',
+            smoking_status='NEVER', ai_risk_score=0.8, risk_level=risk_level, ai_confidence=0.8,
+            recommended_action='Refer', referral_needed=referral_needed
+        )
+
+    def assertMatchesRecount(self):
+        self.assertEqual(stored_counters(), compute_counters())
+
+    def test_create_update_delete(self):
+        record = self.screen()
+        ScreeningFollowUp.objects.create(
+            screening_record=record, follow_up_date=date(2030, 1, 1), status='PENDING'
+        )
+        summary = get_summary(ScreeningCounter.COUNTY, 'Kisumu')
+        self.assertEqual(
+            (summary['total_screenings'], summary['high_risk_count'], summary['referrals_made'],
+             summary['follow_ups_pending']),
+            (1, 1, 1, 1)
+        )
+        self.assertMatchesRecount()
+
+        record.risk_level = 'LOW'
+        record.referral_needed = False
+        record.save()
+        summary = get_summary(ScreeningCounter.USER, str(self.chv.id))
+        self.assertEqual((summary['high_risk_count'], summary['low_risk_count'], summary['referrals_made']), (0, 1, 0))
+        self.assertMatchesRecount()
+
+        record.delete()
+        summary = get_summary(ScreeningCounter.GLOBAL)
+        self.assertEqual((summary['total_screenings'], summary['follow_ups_pending']), (0, 0))
+        self.assertMatchesRecount()
+
+    def test_patient_county_change_moves_counts(self):
+        record = self.screen()
+        ScreeningFollowUp.objects.create(
+            screening_record=record, follow_up_date=date(2030, 1, 1), status='PENDING'
+        )
+        self.patient.county = 'Nakuru'
+        self.patient.save()
+        self.assertEqual(get_summary(ScreeningCounter.COUNTY, 'Kisumu')['total_screenings'], 0)
+        nakuru = get_summary(ScreeningCounter.COUNTY, 'Nakuru')
+        self.assertEqual((nakuru['total_screenings'], nakuru['follow_ups_pending']), (1, 1))
+        self.assertEqual(get_summary(ScreeningCounter.GLOBAL)['total_screenings'], 1)
+        self.assertMatchesRecount()
+
+    def test_migration_backfills_existing_rows(self):
+        self.screen()
+        self.screen(risk_level='MODERATE', referral_needed=False)
+        ScreeningCounter.objects.all().delete()
+        migration = import_module('screening.migrations.0010_screening_counter')
+        migration.backfill_screening_counters(apps, None)
+        self.assertEqual(get_summary(ScreeningCounter.GLOBAL)['total_screenings'], 2)
+        self.assertMatchesRecount()
+
+    def test_cube_migration_backfills_existing_rows(self):
+        self.screen()
+        self.screen(risk_level='MODERATE', referral_needed=False)
+        ScreeningOutcomeCube.objects.all().delete()
+        migration = import_module('screening.migrations.0013_screening_outcome_cube')
+        migration.backfill_outcome_cube(apps, None)
+        stored = stored_cube()
+        self.assertEqual(sum(measures['screenings'] for measures in stored.values()), 2)
+        self.assertEqual(stored, compute_cube())
+
+
+class OutcomeCubeTests(TestCase):
+    """CHVs and clinicians roll up only their own screenings; drift is rebuilt away"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.admin = User.objects.create_user(
+            email='cube@example.com', username='cube', password='pass', user_type='ADMIN'
+        )
+        self.chvs = [
+            User.objects.create_user(
+                email=f'cube{n}@example.com', username=f'cube{n}', password='pass', user_type='CHV'
+            )
+            for n in range(2)
+        ]
+        for n, (county, born, risk_level) in enumerate((
+            ('Kisumu', date(1985, 1, 1), 'HIGH'),
+            ('Kisumu', date(2001, 1, 1), 'LOW'),
+            ('Nakuru', date(1970, 1, 1), 'HIGH'),
+        )):
+            patient = Patient.objects.create(
+                first_name='Jane', last_name='Doe', date_of_birth=born, phone_number='0700000001',
+                national_id=f'O{n}', county=county, sub_county='Central', location='Town',
+                marital_status='MARRIED', registered_by=self.admin
+            )
+            for chv in self.chvs[:n + 1]:
+                ScreeningRecord.objects.create(
+                    patient=patient, screened_by=chv, age_at_first_intercourse=18,
+                    hiv_status='NEGATIVE', hpv_vaccination_status='UNKNOWN', contraceptive_use='NONE',
+                    smoking_status='NEVER', ai_risk_score=0.5, risk_level=risk_level, ai_confidence=0.8,
+                    recommended_action='Follow up', referral_needed=risk_level == 'HIGH'
+                )
+
+    def outcomes(self, user, params=None):
+        request = self.factory.get('/api/screening/outcomes/', params or {})
+        force_authenticate(request, user=user)
+        response = outcome_cube_view(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_screeners_only_see_their_own_screenings(self):
+        self.assertEqual(self.outcomes(self.admin), [{'screenings': 5, 'referrals': 3, 'via_positive': 0}])
+        self.assertEqual(self.outcomes(self.chvs[0]), [{'screenings': 3, 'referrals': 2, 'via_positive': 0}])
+        self.assertEqual(
+            self.outcomes(self.chvs[1], {'group_by': 'county', 'risk_level': 'HIGH'}),
+            [{'county': 'Nakuru', 'screenings': 1, 'referrals': 1, 'via_positive': 0}]
+        )
+
+    def test_own_screenings_roll_up_like_the_cube(self):
+        month = timezone.localdate()
+        for group_by, filters in (
+            ([], None),
+            (['county', 'age_band'], None),
+            (['month', 'risk_level'], {'county': ['Kisumu']}),
+            (['hiv_status'], {'age_band': ['UNDER_25', '50_PLUS'], 'risk_level': 'HIGH'}),
+        ):
+            with self.subTest(group_by=group_by, filters=filters):
+                self.assertEqual(
+                    query_screenings(ScreeningRecord.objects.all(), group_by, filters, month, month),
+                    query_cube(group_by, filters, month, month)
+                )
+        self.assertEqual(
+            query_screenings(ScreeningRecord.objects.all(), ['county'], None, month + timedelta(days=31)), []
+        )
+
+    def test_rebuild_commands_fix_drift(self):
+        ScreeningCounter.objects.filter(scope=ScreeningCounter.GLOBAL).update(total_screenings=99)
+        ScreeningOutcomeCube.objects.filter(risk_level='LOW').delete()
+        for command, drifted in (('rebuild_screening_counters', 'counters'), ('rebuild_screening_cube', 'cube rows')):
+            with self.subTest(command=command):
+                out = StringIO()
+                call_command(command, '--dry-run', stdout=out)
+                self.assertRegex(out.getvalue(), rf'Dry run, [1-9]\d* {drifted} drifted')
+                call_command(command, stdout=StringIO())
+                out = StringIO()
+                call_command(command, '--dry-run', stdout=out)
+                self.assertIn(f'Dry run, 0 {drifted} drifted', out.getvalue())
+        self.assertEqual(stored_counters(), compute_counters())
+        self.assertEqual(stored_cube(), compute_cube())
+
+
+class RescoreScreeningsTests(TestCase):
+    """Re-scoring moves records between counters, cube cells and queue positions, and resumes"""
+
+    def setUp(self):
+        self.chv = User.objects.create_user(
+            email='rescore@example.com', username='rescore', password='pass', user_type='CHV'
+        )
+        patient = Patient.objects.create(
+            first_name='Jane', last_name='Doe', date_of_birth=date(1985, 1, 1), phone_number='0700000001',
+            national_id='R1', county='Kisumu', sub_county='Kisumu East', location='Kondele',
+            marital_status='MARRIED', registered_by=self.chv
+        )
+        self.records = [
+            ScreeningRecord.objects.create(
+                patient=patient, screened_by=self.chv, age_at_first_intercourse=18,
+                hiv_status='NEGATIVE', hpv_vaccination_status='UNKNOWN', contraceptive_use='NONE',
+                smoking_status='NEVER', ai_risk_score=0.8, risk_level='HIGH', ai_confidence=0.8,
+                recommended_action='Refer', referral_needed=True, model_version='v1'
+            )
+            for _ in range(3)
+        ]
+        self.follow_up = ScreeningFollowUp.objects.create(
+            screening_record=self.records[0], follow_up_date=date(2030, 1, 1), status='PENDING'
+        )
+        self.scored = []
+        self.fail_after = None
+        patcher = mock.patch(
+            'screening.management.commands.rescore_screenings.risk_predictor',
+            model_version='v2', predict_batch=self.predict_batch
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def predict_batch(self, inputs):
+        if self.fail_after is not None and len(self.scored) >= self.fail_after:
+            raise RuntimeError('predictor crashed')
+        self.scored.extend(inputs)
+        return [{
+            'risk_score': 0.1, 'risk_level': 'LOW', 'confidence': 0.9, 'referral_needed': False,
+            'recommended_action': 'Routine screening', 'model_version': 'v2',
+        } for _ in inputs]
+
+    def rescore(self, *args):
+        out = StringIO()
+        call_command('rescore_screenings', *args, stdout=out)
+        return out.getvalue()
+
+    def levels(self):
+        return list(ScreeningRecord.objects.order_by('pk').values_list('risk_level', flat=True))
+
+    def test_dry_run_reports_without_writing(self):
+        output = self.rescore('--dry-run')
+        self.assertIn('HIGH -> LOW: 3', output)
+        self.assertIn('Dry run, no records were updated', output)
+        self.assertEqual(self.levels(), ['HIGH'] * 3)
+        summary = get_summary(ScreeningCounter.GLOBAL)
+        self.assertEqual((summary['high_risk_count'], summary['referrals_made']), (3, 3))
+        self.assertEqual(ScreeningOutcomeCube.objects.get().referrals, 3)
+
+    def test_counters_cube_and_queue_follow_the_new_results(self):
+        self.rescore()
+        self.assertEqual(self.levels(), ['LOW'] * 3)
+        summary = get_summary(ScreeningCounter.COUNTY, 'Kisumu')
+        self.assertEqual(
+            (summary['total_screenings'], summary['high_risk_count'], summary['low_risk_count'],
+             summary['referrals_made']),
+            (3, 0, 3, 0)
+        )
+        self.assertEqual(stored_counters(), compute_counters())
+        cube = stored_cube()
+        self.assertEqual(cube, compute_cube())
+        self.assertEqual([key[3] for key in cube], ['LOW'])
+        self.follow_up.refresh_from_db()
+        self.assertEqual(
+            (self.follow_up.priority, self.follow_up.referral_needed),
+            (ScreeningFollowUp.priority_for('LOW'), False)
+        )
+
+    def test_resume_continues_after_the_checkpoint(self):
+        with tempfile.TemporaryDirectory() as root:
+            checkpoint = os.path.join(root, 'rescore.json')
+            self.fail_after = 1
+            with self.assertRaisesMessage(RuntimeError, 'predictor crashed'):
+                self.rescore('--chunk-size', '1', '--checkpoint', checkpoint)
+            self.assertEqual(self.levels(), ['LOW', 'HIGH', 'HIGH'])
+
+            self.fail_after = None
+            self.scored.clear()
+            output = self.rescore('--chunk-size', '1', '--checkpoint', checkpoint, '--resume')
+            self.assertIn(f"Resuming after screening record {self.records[0].pk}", output)
+            self.assertEqual(len(self.scored), 2)
+            self.assertEqual(self.levels(), ['LOW'] * 3)
+            with open(checkpoint, encoding='utf-8') as f:
+                self.assertEqual(
+                    json.load(f), {'last_id': self.records[-1].pk, 'scanned': 3, 'changed': 3}
+                )
+        self.assertEqual(get_summary(ScreeningCounter.GLOBAL)['low_risk_count'], 3)
+
+
+class PatientAgeTests(SimpleTestCase):
+    """The model is fed whole calendar years, the same when screening and when re-scoring"""
+
+    def test_age_the_day_before_a_birthday(self):
+        born, day_before = date(2000, 6, 15), date(2026, 6, 14)
+        # Leap days push days // 365 a year ahead
+        self.assertEqual((day_before - born).days // 365, 26)
+        with mock.patch('screening.models.date') as today:
+            today.today.return_value = day_before
+            self.assertEqual(Patient(date_of_birth=born).age, 25)
+        screened = timezone.make_aware(datetime(2026, 6, 14, 12))
+        self.assertEqual(age_at_screening(born, screened), 25)
+        self.assertEqual(age_at_screening(born, screened + timedelta(days=1)), 26)
+
+
+@override_settings(RISK_PREDICTION_CACHE=False, RISK_PREDICTION_LOOKUP_TABLE=False)
+class RiskPredictionBatchTests(SimpleTestCase):
+    """Batch results follow input order and a bad row only fails itself"""
+
+    screening = {
+        'age': 30, 'age_at_first_intercourse': 18, 'number_of_sexual_partners': 1, 'parity': 1,
+        'hiv_status': 'NEGATIVE', 'hpv_vaccination_status': 'UNKNOWN', 'contraceptive_use': 'NONE',
+        'smoking_status': 'NEVER', 'family_history_cervical_cancer': False, 'previous_abnormal_pap': False,
+    }
+
+    def setUp(self):
+        # Scored by the fallback rules so the expected values do not depend on the bundled model
+        self.predictor = CervicalCancerRiskPredictor()
+        patcher = mock.patch.object(self.predictor, 'maybe_reload')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def rows(self):
+        return [
+            dict(self.screening, age=60, hiv_status='POSITIVE', via_result='SUSPICIOUS'),
+            dict(self.screening),
+            dict(self.screening, bethesda_category='LSIL'),
+            dict(self.screening, age=40, number_of_sexual_partners=5),
+        ]
+
+    def post(self, data):
+        request = APIRequestFactory().post('/api/screening/predict-risk/batch/', data, format='json')
+        force_authenticate(request, user=User(email='chv@example.com', username='chv'))
+        with mock.patch('screening.views.risk_predictor', self.predictor):
+            return predict_risk_batch_view(request)
+
+    def test_results_follow_input_order(self):
+        rows = self.rows()
+        expected = [self.predictor.predict(data) for data in rows]
+        self.assertEqual(len({prediction['risk_score'] for prediction in expected}), len(rows))
+        self.assertEqual(self.predictor.predict_batch(rows), expected)
+        self.assertEqual(self.predictor.predict_batch(rows[::-1]), expected[::-1])
+
+    def test_bad_row_only_fails_itself(self):
+        rows = self.rows()
+        rows.insert(2, dict(self.screening, age='unknown'))
+        predictions = self.predictor.predict_batch(rows)
+        self.assertEqual(predictions[2], self.predictor._error_prediction())
+        self.assertEqual(
+            predictions[:2] + predictions[3:], [self.predictor.predict(data) for data in self.rows()]
+        )
+
+    def test_endpoint_returns_results_in_order(self):
+        rows = self.rows()
+        response = self.post({'screenings': rows})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [result['risk_score'] for result in response.data['results']],
+            [self.predictor.predict(data)['risk_score'] for data in rows],
+        )
+
+    @override_settings(RISK_PREDICTION_MAX_BATCH_SIZE=3)
+    def test_endpoint_rejects_empty_oversized_and_invalid_batches(self):
+        invalid = self.rows()[:2]
+        invalid[1] = dict(invalid[1], age=5)
+        for screenings in ([], self.rows(), invalid):
+            with self.subTest(size=len(screenings)):
+                response = self.post({'screenings': screenings})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('screenings', response.data)
+        self.assertEqual(self.post({'screenings': self.rows()[:3]}).status_code, 200)
+
+
+class MicroBatcherTests(SimpleTestCase):
+    """Concurrent predictions share batch calls, never wait forever, and are all counted"""
+
+    def setUp(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+        self.addCleanup(self.release.set)
+
+    def predict_batch(self, inputs):
+        if threading.current_thread().name == 'risk-microbatcher':
+            self.release.wait()
+        self.calls.append(len(inputs))
+        return [{'risk_score': data['n'] * 2} for data in inputs]
+
+    def batcher(self, max_wait_ms=200, timeout_ms=2000):
+        return MicroBatcher(self.predict_batch, max_batch_size=4, max_wait_ms=max_wait_ms, timeout_ms=timeout_ms)
+
+    def test_queued_inputs_are_scored_in_one_call(self):
+        batcher = self.batcher()
+        futures = [batcher.submit({'n': n}) for n in range(4)]
+        self.assertEqual([future.result(5) for future in futures], [{'risk_score': n * 2} for n in range(4)])
+        self.assertEqual(self.calls, [4])
+        stats = batcher.stats()
+        self.assertEqual((stats['batches'], stats['items'], stats['batch_size_histogram']), (1, 4, {'le_4': 1}))
+
+    def test_stuck_batch_falls_back_to_a_direct_prediction(self):
+        batcher = self.batcher(max_wait_ms=0, timeout_ms=50)
+        self.release.clear()
+        self.assertEqual(batcher.predict({'n': 3}), {'risk_score': 6})
+        self.assertEqual(batcher.predict({'n': 4}, timeout=0.01), {'risk_score': 8})
+        self.assertEqual(batcher.stats()['timeouts'], 2)
+        self.release.set()
+
+    def test_batch_errors_reach_every_waiter(self):
+        batcher = MicroBatcher(mock.Mock(side_effect=RuntimeError('model down')), 4, 200, 2000)
+        futures = [batcher.submit({'n': n}) for n in range(3)]
+        for future in futures:
+            with self.assertRaisesMessage(RuntimeError, 'model down'):
+                future.result(5)
+
+    def test_stats_count_every_prediction_under_concurrency(self):
+        batcher = self.batcher(max_wait_ms=1)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda n: batcher.predict({'n': n}), range(400)))
+        self.assertEqual(results, [{'risk_score': n * 2} for n in range(400)])
+        stats = batcher.stats()
+        self.assertEqual((stats['items'], stats['timeouts']), (400, 0))
+        self.assertEqual(sum(stats['queue_depth_histogram'].values()), 400)
+        self.assertEqual(stats['batches'], len(self.calls))
+
+
+class FallbackRiskScoresTests(SimpleTestCase):
+    """The columnar fallback rules give the scalar path's scores bit for bit"""
+
+    choices = {
+        'hiv_status': ['POSITIVE', 'NEGATIVE', 'UNKNOWN', None],
+        'hpv_vaccination_status': ['VACCINATED', 'NOT_VACCINATED', 'UNKNOWN', None],
+        'smoking_status': ['NEVER', 'FORMER', 'CURRENT', None],
+        'family_history_cervical_cancer': [True, False],
+        'previous_abnormal_pap': [True, False],
+        'via_result': ['NEGATIVE', 'POSITIVE', 'SUSPICIOUS', None],
+        'bethesda_category': ['NILM', 'ASCUS', 'LSIL', 'HSIL', 'AGC', 'CANCER', None],
+    }
+    ranges = {
+        'age': (15, 80), 'age_at_first_intercourse': (10, 50),
+        'number_of_sexual_partners': (1, 20), 'parity': (0, 15),
+    }
+
+    def random_rows(self, rng, count):
+        rows = []
+        for _ in range(count):
+            row = {name: int(rng.integers(low, high + 1)) for name, (low, high) in self.ranges.items()}
+            for name, values in self.choices.items():
+                row[name] = values[rng.integers(len(values))]
+            # Leave some fields out so the defaults are exercised too
+            for name in list(row):
+                if rng.random() < 0.1:
+                    del row[name]
+            rows.append(row)
+        return rows
+
+    def test_random_rows_match_scalar_scores(self):
+        predictor = CervicalCancerRiskPredictor()
+        rows = self.random_rows(np.random.default_rng(20240601), 20000)
+        scores = predictor.fallback_risk_scores(predictor.to_columns(rows))
+        expected = [predictor._fallback_risk_calculation(row) for row in rows]
+        mismatches = [
+            (row, score, want) for row, score, want in zip(rows, scores.tolist(), expected) if score != want
+        ]
+        self.assertEqual(mismatches[:5], [])
+
+
+class LinearModel:
+    """Picklable stand-in for the trained classifier: a logistic score of the features"""
+
+    def __init__(self, seed, bias=-1.0):
+        self.weights = np.random.default_rng(seed).normal(scale=0.3, size=18)
+        self.bias = bias
+
+    def predict_proba(self, features):
+        risk = 1 / (1 + np.exp(-(np.asarray(features) @ self.weights + self.bias)))
+        return np.column_stack([1 - risk, risk])
+
+
+def register_model(root, model, version):
+    """Pickle a model and register it as the active version of the registry at root"""
+    upload = os.path.join(root, f'{version}.upload')
+    joblib.dump(model, upload)
+    return ModelRegistry(root, 'model.pkl').register(upload, version)
+
+
+@override_settings(RISK_PREDICTION_CACHE=False, AI_MODEL_RELOAD_INTERVAL=-1)
+class RiskLookupTableTests(SimpleTestCase):
+    """Predictions served from the lookup table equal live scoring, with or without a model"""
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        settings_override = override_settings(AI_MODEL_PATH=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def random_value(self, rng, name, domain):
+        if name in KEY_DEFAULTS:
+            low, high = domain
+            # Now and then out of range, which the table must not memoize
+            return int(rng.integers(low, high + 1)) if rng.random() > 0.02 else high + 1
+        return domain[rng.integers(len(domain))]
+
+    def random_inputs(self, rng, count):
+        """Random rows, each followed by variants differing in one field so key collisions show"""
+        rows = []
+        while len(rows) < count:
+            row = {
+                name: self.random_value(rng, name, domain)
+                for name, domain in KEY_FIELDS if rng.random() >= 0.1
+            }
+            rows.append(row)
+            for name, domain in KEY_FIELDS:
+                rows.append(dict(row, **{name: self.random_value(rng, name, domain)}))
+        return rows[:count]
+
+    def predictions(self, lookup_table, rows):
+        with override_settings(RISK_PREDICTION_LOOKUP_TABLE=lookup_table):
+            predictor = CervicalCancerRiskPredictor()
+            half = len(rows) // 2
+            predictions = predictor.predict_batch(rows[:half]) + [predictor.predict(row) for row in rows[half:]]
+        return predictions, predictor.lookup_table
+
+    def test_lookup_table_matches_live_scoring(self):
+        rng = np.random.default_rng(20240602)
+        distinct = self.random_inputs(rng, 390)
+        # Repeats so later rows are answered from the table
+        rows = [distinct[position] for position in rng.integers(len(distinct), size=2000)]
+        for version in ('fallback-rules', 'v1'):
+            if version == 'v1':
+                register_model(self.root, LinearModel(seed=1), version)
+            with self.subTest(version=version):
+                live, _ = self.predictions(False, rows)
+                memoized, table = self.predictions(True, rows)
+                self.assertEqual(memoized, live)
+                self.assertGreater(table.stats()['hits'], 500)
+                self.assertEqual({prediction['model_version'] for prediction in live}, {version})
+
+
+@override_settings(RISK_PREDICTION_CACHE=False, RISK_PREDICTION_LOOKUP_TABLE=False, AI_MODEL_RELOAD_INTERVAL=0)
+class ModelRegistryReloadTests(SimpleTestCase):
+    """Registry changes are picked up without a restart; a broken registry keeps the loaded model"""
+
+    row = {'age': 40, 'parity': 2, 'hiv_status': 'NEGATIVE', 'smoking_status': 'NEVER'}
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        settings_override = override_settings(AI_MODEL_PATH=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.registry = ModelRegistry(self.root, 'model.pkl')
+
+    def served(self, predictor):
+        prediction = predictor.predict(self.row)
+        return prediction['model_version'], prediction['risk_score']
+
+    def test_activated_versions_are_reloaded(self):
+        predictor = CervicalCancerRiskPredictor()
+        self.assertEqual(self.served(predictor)[0], 'fallback-rules')
+        register_model(self.root, LinearModel(seed=1, bias=-2.0), 'v1')
+        v1 = self.served(predictor)
+        register_model(self.root, LinearModel(seed=1, bias=2.0), 'v2')
+        v2 = self.served(predictor)
+        self.assertEqual((v1[0], v2[0]), ('v1', 'v2'))
+        self.assertGreater(v2[1], v1[1])
+        # Rolling back swaps the earlier model in again
+        self.registry.activate('v1')
+        self.assertEqual(self.served(predictor), v1)
+
+    def test_broken_registry_keeps_the_loaded_model(self):
+        register_model(self.root, LinearModel(seed=1), 'v1')
+        predictor = CervicalCancerRiskPredictor()
+        v1 = self.served(predictor)
+        manifest = self.registry.read_manifest()
+
+        with open(self.registry.manifest_path, 'w', encoding='utf-8') as f:
+            f.write('{"current": ')
+        self.assertEqual(self.served(predictor), v1)
+        self.registry._write_manifest(dict(manifest, current='v9'))
+        self.assertEqual(self.served(predictor), v1)
+
+        # A file that does not match its checksum is not loaded either
+        self.registry._write_manifest(manifest)
+        v2 = register_model(self.root, LinearModel(seed=2), 'v2')
+        with open(v2.path, 'ab') as f:
+            f.write(b'tampered')
+        self.assertEqual(self.served(predictor), v1)
+
+        joblib.dump(LinearModel(seed=2), v2.path)
+        self.assertEqual(self.served(predictor)[0], 'v2')
+
+
+@override_settings(RISK_PREDICTION_CACHE=False, RISK_PREDICTION_LOOKUP_TABLE=False, AI_MODEL_RELOAD_INTERVAL=-1)
+class LazyModelLoadingTests(SimpleTestCase):
+    """The model is loaded on first use, once, however many requests arrive together"""
+
+    def test_model_loads_once_on_first_use(self):
+        real_load = joblib.load
+
+        def slow_load(path):
+            # Long enough for every request thread to arrive while the model loads
+            time.sleep(0.05)
+            return real_load(path)
+
+        with tempfile.TemporaryDirectory() as root, override_settings(AI_MODEL_PATH=root), \
+                mock.patch('joblib.load', side_effect=slow_load) as load:
+            register_model(root, LinearModel(seed=1), 'v1')
+            predictor = CervicalCancerRiskPredictor()
+            self.assertFalse(predictor.is_loaded)
+            self.assertEqual((predictor.stats()['loaded'], load.call_count), (False, 0))
+
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                predictions = list(pool.map(predictor.predict, [{'age': 30 + n} for n in range(32)]))
+            self.assertEqual({prediction['model_version'] for prediction in predictions}, {'v1'})
+            self.assertEqual(load.call_count, 1)
+            stats = predictor.stats()
+            self.assertEqual((stats['loaded'], stats['model_version']), (True, 'v1'))
+            self.assertIsNotNone(stats['load_seconds'])
+            predictor.ensure_loaded()
+            self.assertEqual(load.call_count, 1)
+
+
+@override_settings(
+    RISK_PREDICTION_CACHE=True, RISK_PREDICTION_CACHE_ALIAS='default', RISK_PREDICTION_LOOKUP_TABLE=False,
+    AI_MODEL_RELOAD_INTERVAL=0,
+)
+class PredictionCacheTests(SimpleTestCase):
+    """Cache keys ignore how an input is written but never outlive the model version"""
+
+    row = {'age': 40, 'parity': 2, 'hiv_status': 'NEGATIVE', 'family_history_cervical_cancer': True}
+
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+
+    def test_keys_are_canonical_and_versioned(self):
+        cache = PredictionCache(('age',) + SCREENING_INPUT_FIELDS, max_entries=10, ttl=60)
+        key = cache.key(self.row, 'v1')
+        rewritten = {'family_history_cervical_cancer': 1, 'hiv_status': 'NEGATIVE', 'parity': 2, 'age': 40,
+                     'patient_name': 'ignored'}
+        self.assertEqual(cache.key(rewritten, 'v1'), key)
+        self.assertNotEqual(cache.key(self.row, 'v2'), key)
+        self.assertNotEqual(cache.key(dict(self.row, parity=3), 'v1'), key)
+        self.assertNotEqual(cache.key(dict(self.row, family_history_cervical_cancer=False), 'v1'), key)
+
+    def test_new_model_version_is_never_served_old_results(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(AI_MODEL_PATH=root):
+            register_model(root, LinearModel(seed=1, bias=-2.0), 'v1')
+            predictor = CervicalCancerRiskPredictor()
+            v1 = predictor.predict(self.row)
+            self.assertEqual(predictor.predict(self.row), v1)
+            self.assertEqual(predictor.cache.stats()['hits'], 1)
+
+            register_model(root, LinearModel(seed=1, bias=2.0), 'v2')
+            v2 = predictor.predict(self.row)
+            self.assertEqual(v2['model_version'], 'v2')
+            self.assertNotEqual(v2['risk_score'], v1['risk_score'])
+            self.assertEqual(predictor.cache.stats()['entries'], 1)
+
+            # Another worker on the new model gets the new result from the shared cache
+            other = CervicalCancerRiskPredictor()
+            self.assertEqual(other.predict_batch([self.row]), [v2])
+            self.assertEqual(other.cache.stats()['shared_hits'], 1)
+
+
+@override_settings(SCREENING_EXPORT_CHUNK_SIZE=2)
+class ScreeningExportTests(TestCase):
+    """Exports read back to the stored screenings, in screening date order, in either format"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.admin = User.objects.create_user(
+            email='export@example.com', username='export', password='pass', user_type='ADMIN'
+        )
+        self.chv = User.objects.create_user(
+            email='exportchv@example.com', username='exportchv', password='pass', user_type='CHV'
+        )
+        patients = [
+            Patient.objects.create(
+                first_name='Jane', last_name='Doe', date_of_birth=born, phone_number='0700000001',
+                national_id=f'E{n}', county=county, sub_county='Central', location='Town',
+                marital_status='MARRIED', registered_by=self.chv
+            )
+            for n, (county, born) in enumerate((('Kisumu', date(1990, 6, 15)), ('Nakuru', date(1975, 1, 1))))
+        ]
+        base = timezone.make_aware(datetime(2026, 3, 1, 9, 30))
+        for n, (via_result, bethesda, risk_level) in enumerate((
+            (None, None, 'LOW'), ('POSITIVE', 'LSIL', 'MODERATE'), ('SUSPICIOUS', 'HSIL', 'HIGH'),
+            ('NEGATIVE', None, 'LOW'), (None, 'CANCER', 'HIGH'),
+        )):
+            record = ScreeningRecord.objects.create(
+                patient=patients[n % 2], screened_by=self.chv, age_at_first_intercourse=16 + n,
+                number_of_sexual_partners=n + 1, parity=n, hiv_status='NEGATIVE',
+                hpv_vaccination_status='UNKNOWN', contraceptive_use='NONE', smoking_status='NEVER',
+                family_history_cervical_cancer=n == 2, via_result=via_result, bethesda_category=bethesda,
+                ai_risk_score=0.1 + n / 5, risk_level=risk_level, ai_confidence=0.7,
+                recommended_action='Follow up', referral_needed=risk_level != 'LOW', model_version='v1'
+            )
+            # Created out of date order, so the export has to sort
+            ScreeningRecord.objects.filter(pk=record.pk).update(screening_date=base - timedelta(days=40 * n))
+
+    def expected(self, **filters):
+        rows = []
+        for record in ScreeningRecord.objects.filter(**filters).select_related('patient').order_by('screening_date'):
+            patient = record.patient
+            row = {column: getattr(record, column, None) for column in COLUMNS}
+            row.update(
+                screening_id=record.pk, county=patient.county, sub_county=patient.sub_county,
+                age_at_screening=age_on(patient.date_of_birth, timezone.localdate(record.screening_date)),
+            )
+            rows.append(row)
+        return rows
+
+    def export(self, params, user=None):
+        request = self.factory.get('/api/screening/export/', params)
+        force_authenticate(request, user=user or self.admin)
+        return screening_export_view(request)
+
+    def content(self, params):
+        response = self.export(params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_round_trip(self):
+        rows = list(csv.DictReader(StringIO(self.content({'output': 'csv'}).decode('utf-8'))))
+        expected = [
+            {
+                column: timezone.localtime(value).isoformat() if column == 'screening_date'
+                else '' if value is None else str(value)
+                for column, value in row.items()
+            }
+            for row in self.expected()
+        ]
+        self.assertEqual(len(expected), 5)
+        self.assertEqual(rows, expected)
+
+    @skipUnless(parquet_available(), "Parquet export needs pyarrow")
+    def test_parquet_round_trip(self):
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(BytesIO(self.content({'output': 'parquet'})))
+        self.assertEqual(parquet.num_row_groups, 3)
+        self.assertEqual(parquet.read().to_pylist(), self.expected())
+
+    def test_filters_and_access(self):
+        params = {'output': 'csv', 'county': 'kisumu', 'risk_level': 'high', 'start_date': '2025-12-01'}
+        rows = list(csv.DictReader(StringIO(self.content(params).decode('utf-8'))))
+        expected = self.expected(
+            patient__county='Kisumu', risk_level='HIGH',
+            screening_date__gte=timezone.make_aware(datetime(2025, 12, 1)),
+        )
+        self.assertEqual([int(row['screening_id']) for row in rows], [row['screening_id'] for row in expected])
+        self.assertEqual(len(rows), 1)
+
+        self.assertEqual(self.export({'output': 'csv'}, user=self.chv).status_code, 403)
+        for params in ({'output': 'xlsx'}, {'risk_level': 'SEVERE'}, {'start_date': '01/03/2026'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.export(params).status_code, 400)
+
+
+class PatientSearchTests(TestCase):
+    """Search matches word prefixes, ranks identifier hits first and is capped"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pass', user_type='ADMIN'
+        )
+
+    def patient(self, first_name, last_name, national_id, phone_number='0700000000'):
+        return Patient(
+            first_name=first_name, last_name=last_name, date_of_birth=date(1985, 1, 1),
+            phone_number=phone_number, national_id=national_id, county='Kisumu',
+            sub_county='Kisumu East', location='Kondele', marital_status='MARRIED',
+            registered_by=self.admin
+        )
+
+    def search(self, query, limit=500):
+        return [pk for pk, _ in search_patient_ids(query, self.admin, limit)]
+
+    def get(self, view, params):
+        request = self.factory.get('/api/screening/patients/', params)
+        force_authenticate(request, user=self.admin)
+        return view(request)
+
+    def test_word_prefixes_match(self):
+        jane = self.patient('Jane', 'Wanjiru', 'ID1', '0712345678')
+        mary = self.patient('Mary', 'Achieng', 'ID2')
+        jane.save()
+        mary.save()
+        self.assertEqual(self.search('wanj'), [jane.pk])
+        self.assertEqual(self.search('0712'), [jane.pk])
+        self.assertEqual(self.search('jane wanjiru'), [jane.pk])
+        # Every word must match, and only at the start of a word
+        self.assertEqual(self.search('jane achieng'), [])
+        self.assertEqual(self.search('anjiru'), [])
+        mary.last_name = 'Wanjiku'
+        mary.save()
+        self.assertEqual(self.search('wanji'), [jane.pk, mary.pk])
+        mary.delete()
+        self.assertEqual(self.search('wanji'), [jane.pk])
+
+    def test_identifier_and_repeated_hits_rank_first(self):
+        by_name = self.patient('Otieno', 'Akinyi', 'ID1')
+        by_both = self.patient('Akinyi', 'Akinyi', 'ID2')
+        by_id = self.patient('Mary', 'Achieng', 'AKINYI3')
+        Patient.objects.bulk_create([by_name, by_both, by_id])
+        ids = {patient.national_id: patient.pk for patient in Patient.objects.all()}
+        self.assertEqual(self.search('akinyi'), [ids['AKINYI3'], ids['ID2'], ids['ID1']])
+
+    def test_results_are_capped_at_max_results(self):
+        Patient.objects.bulk_create([self.patient('Jane', 'Doe', f'ID{n}') for n in range(501)])
+        response = self.get(patient_search_view, {'q': 'jane', 'limit': 1000})
+        self.assertEqual(len(response.data['results']), 500)
+        response = self.get(PatientListCreateView.as_view(), {'search': 'jane', 'page_size': 1})
+        self.assertEqual(response.data['count'], 500)
+
+    def test_triggers_dropped_by_a_migration_are_reinstalled(self):
+        # What SQLite does to them when a migration rebuilds screening_patient
+        with connection.cursor() as cursor:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER {FTS_TABLE}_{suffix}")
+        self.assertTrue(search_index_missing())
+        emit_post_migrate_signal(0, False, 'default')
+        self.assertFalse(search_index_missing())
+        jane = self.patient('Jane', 'Wanjiru', 'ID1')
+        jane.save()
+        self.assertEqual(self.search('wanjiru'), [jane.pk])
+
+
+class FollowUpQueueTests(TestCase):
+    """The queue is ordered by risk, days overdue, then referral, and leases are exclusive"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.chv = User.objects.create_user(
+            email='queue@example.com', username='queue', password='pass', user_type='CHV'
+        )
+        self.first, self.second = (
+            User.objects.create_user(
+                email=f'admin{n}@example.com', username=f'admin{n}', password='pass', user_type='ADMIN'
+            )
+            for n in range(2)
+        )
+        self.patient = Patient.objects.create(
+            first_name='Jane', last_name='Doe', date_of_birth=date(1985, 1, 1), phone_number='0700000001',
+            national_id='Q1', county='Kisumu', sub_county='Kisumu East', location='Kondele',
+            marital_status='MARRIED', registered_by=self.chv
+        )
+        today = timezone.localdate()
+        self.follow_ups = {
+            name: self.follow_up(risk_level, referral_needed, today - timedelta(days=overdue))
+            for name, risk_level, referral_needed, overdue in (
+                ('high_today', 'HIGH', False, 0),
+                ('low_overdue', 'LOW', False, 60),
+                ('high_today_referred', 'HIGH', True, 0),
+                ('moderate_referred', 'MODERATE', True, 30),
+                ('high_overdue', 'HIGH', False, 5),
+            )
+        }
+        # Neither due yet nor still pending, so never queued
+        self.follow_up('HIGH', True, today + timedelta(days=1))
+        self.follow_up('HIGH', True, today - timedelta(days=9), status='COMPLETED')
+        self.order = ['high_overdue', 'high_today_referred', 'high_today', 'moderate_referred', 'low_overdue']
+
+    def follow_up(self, risk_level, referral_needed, follow_up_date, status='PENDING'):
+        record = ScreeningRecord.objects.create(
+            patient=self.patient, screened_by=self.chv, age_at_first_intercourse=18,
+            hiv_status='NEGATIVE', hpv_vaccination_status='UNKNOWN', contraceptive_use='NONE',
+            smoking_status='NEVER', ai_risk_score=0.5, risk_level=risk_level, ai_confidence=0.8,
+            recommended_action='Follow up', referral_needed=referral_needed
+        )
+        return ScreeningFollowUp.objects.create(
+            screening_record=record, follow_up_date=follow_up_date, status=status
+        )
+
+    def names(self, results):
+        by_id = {follow_up.pk: name for name, follow_up in self.follow_ups.items()}
+        return [by_id[result['id']] for result in results]
+
+    def queue(self, user, params=None):
+        request = self.factory.get('/api/screening/followups/queue/', params or {})
+        force_authenticate(request, user=user)
+        response = FollowUpQueueView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def lease(self, user, count):
+        request = self.factory.post('/api/screening/followups/queue/lease/', {'count': count}, format='json')
+        force_authenticate(request, user=user)
+        return self.names(follow_up_lease_view(request).data['results'])
+
+    def test_queue_order(self):
+        self.assertEqual(self.names(self.queue(self.first).data['results']), self.order)
+        # Each keyset page continues where the last one stopped
+        first_page = self.queue(self.first, {'page_size': 2})
+        cursor = parse_qs(urlparse(first_page.data['next']).query)['cursor'][0]
+        second_page = self.queue(self.first, {'page_size': 2, 'cursor': cursor})
+        self.assertEqual(
+            self.names(first_page.data['results'] + second_page.data['results']), self.order[:4]
+        )
+
+    def test_rescored_screening_moves_in_queue(self):
+        record = self.follow_ups['high_overdue'].screening_record
+        record.risk_level = 'LOW'
+        record.referral_needed = True
+        record.save()
+        follow_up = ScreeningFollowUp.objects.get(pk=self.follow_ups['high_overdue'].pk)
+        self.assertEqual((follow_up.priority, follow_up.referral_needed), (1, True))
+        self.assertEqual(
+            self.names(self.queue(self.first).data['results']),
+            ['high_today_referred', 'high_today', 'moderate_referred', 'low_overdue', 'high_overdue']
+        )
+
+    def test_leases_are_exclusive_until_released_or_expired(self):
+        self.assertEqual(self.lease(self.first, 2), self.order[:2])
+        self.assertEqual(self.lease(self.second, 2), self.order[2:4])
+        # Leasing again keeps what the user holds and never takes another user's follow-ups
+        self.assertEqual(self.lease(self.first, 3), self.order[:2] + self.order[4:])
+        self.assertEqual(self.names(self.queue(self.second).data['results']), self.order[2:4])
+
+        held = self.follow_ups[self.order[0]]
+        request = self.factory.post(f'/api/screening/followups/{held.pk}/release/')
+        force_authenticate(request, user=self.second)
+        self.assertEqual(follow_up_release_view(request, pk=held.pk).status_code, 404)
+        force_authenticate(request, user=self.first)
+        self.assertEqual(follow_up_release_view(request, pk=held.pk).status_code, 204)
+        self.assertEqual(self.lease(self.second, 1), self.order[:1])
+
+        ScreeningFollowUp.objects.filter(leased_by=self.first).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(self.lease(self.second, 5), self.order)
+
+
+@override_settings(SYNC_CHANGES_LAG_SECONDS=0)
+class ChangesFeedTests(TestCase):
+    """The changes feed resumes from its watermark and reports deletions to the owner"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.chv, self.other = (
+            User.objects.create_user(
+                email=f'feed{n}@example.com', username=f'feed{n}', password='pass', user_type='CHV'
+            )
+            for n in range(2)
+        )
+        self.admin = User.objects.create_user(
+            email='feedadmin@example.com', username='feedadmin', password='pass', user_type='ADMIN'
+        )
+        self.patient = Patient.objects.create(
+            first_name='Jane', last_name='Doe', date_of_birth=date(1985, 1, 1), phone_number='0700000001',
+            national_id='F1', county='Kisumu', sub_county='Kisumu East', location='Kondele',
+            marital_status='MARRIED', registered_by=self.chv, client_uuid=uuid.uuid4()
+        )
+        self.records = [self.screen() for _ in range(2)]
+        self.follow_up = ScreeningFollowUp.objects.create(
+            screening_record=self.records[0], follow_up_date=date(2030, 1, 1), client_uuid=uuid.uuid4()
+        )
+
+    def screen(self):
+        return ScreeningRecord.objects.create(
+            patient=self.patient, screened_by=self.chv, age_at_first_intercourse=18,
+            hiv_status='NEGATIVE', hpv_vaccination_status='UNKNOWN', contraceptive_use='NONE',
+            smoking_status='NEVER', ai_risk_score=0.2, risk_level='LOW', ai_confidence=0.8,
+            recommended_action='Routine screening', client_uuid=uuid.uuid4()
+        )
+
+    def feed(self, user, since=None, limit=100, expected_status=200):
+        params = {'limit': limit}
+        if since:
+            params['since'] = since
+        request = self.factory.get('/api/screening/changes/', params)
+        force_authenticate(request, user=user)
+        response = changes_feed_view(request)
+        self.assertEqual(response.status_code, expected_status, getattr(response, 'data', None))
+        return response.data
+
+    def ids(self, page, section='changes'):
+        return {name: [row['id'] for row in rows] for name, rows in page[section].items() if rows}
+
+    def test_watermark_pages_and_resumes(self):
+        first = self.feed(self.chv, limit=1)
+        self.assertTrue(first['has_more'])
+        self.assertEqual(self.ids(first), {
+            'patients': [self.patient.pk], 'screenings': [self.records[0].pk], 'follow_ups': [self.follow_up.pk],
+        })
+        second = self.feed(self.chv, first['watermark'], limit=1)
+        self.assertFalse(second['has_more'])
+        self.assertEqual(self.ids(second), {'screenings': [self.records[1].pk]})
+        self.assertEqual(self.ids(self.feed(self.chv, second['watermark'])), {})
+        # An edit brings the row back exactly once
+        self.records[0].recommended_action = 'Repeat in a year'
+        self.records[0].save()
+        third = self.feed(self.chv, second['watermark'])
+        self.assertEqual(self.ids(third), {'screenings': [self.records[0].pk]})
+        self.assertEqual(self.ids(self.feed(self.chv, third['watermark'])), {})
+        self.assertEqual(self.ids(self.feed(self.other)), {})
+
+    @override_settings(SYNC_CHANGES_LAG_SECONDS=60)
+    def test_rows_inside_the_lag_horizon_are_held_back(self):
+        page = self.feed(self.chv)
+        self.assertEqual(self.ids(page), {})
+        ScreeningRecord.objects.filter(pk=self.records[1].pk).update(
+            updated_at=timezone.now() - timedelta(minutes=2)
+        )
+        self.assertEqual(self.ids(self.feed(self.chv, page['watermark'])), {'screenings': [self.records[1].pk]})
+
+    def test_deletions_reach_the_owner(self):
+        watermark = self.feed(self.chv)['watermark']
+        client_uuid = self.records[1].client_uuid
+        pk = self.records[1].pk
+        self.records[1].delete()
+        page = self.feed(self.chv, watermark)
+        self.assertEqual(page['deleted']['screenings'], [{'id': pk, 'client_uuid': client_uuid}])
+        self.assertEqual(self.ids(self.feed(self.chv, page['watermark']), 'deleted'), {})
+        self.assertEqual(self.ids(self.feed(self.other), 'deleted'), {})
+        self.assertEqual(self.ids(self.feed(self.admin), 'deleted'), {'screenings': [pk]})
+
+    def test_reassigned_rows_leave_the_previous_owners_feed(self):
+        watermark = self.feed(self.chv)['watermark']
+        record = self.records[0]
+        record.screened_by = self.other
+        record.save()
+        self.assertEqual(
+            self.ids(self.feed(self.chv, watermark), 'deleted'),
+            {'screenings': [record.pk], 'follow_ups': [self.follow_up.pk]}
+        )
+        page = self.feed(self.other)
+        self.assertEqual(self.ids(page), {'screenings': [record.pk], 'follow_ups': [self.follow_up.pk]})
+        self.assertEqual(self.ids(page, 'deleted'), {})
+        self.assertEqual(self.ids(self.feed(self.admin), 'deleted'), {})
+
+        self.follow_up.screening_record = self.records[1]
+        self.follow_up.save()
+        self.assertEqual(self.ids(self.feed(self.other, page['watermark']), 'deleted'), {
+            'follow_ups': [self.follow_up.pk]
+        })
+
+    def test_pruned_tombstones_expire_old_watermarks(self):
+        watermark = self.feed(self.chv)['watermark']
+        self.records[1].delete()
+        SyncTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=100))
+        out = StringIO()
+        call_command('prune_sync_tombstones', '--dry-run', stdout=out)
+        self.assertIn('1 tombstones', out.getvalue())
+        self.assertEqual(SyncTombstone.objects.count(), 1)
+        call_command('prune_sync_tombstones', stdout=StringIO())
+        self.assertEqual(SyncTombstone.objects.count(), 0)
+
+        self.feed(self.chv, watermark)
+        with override_settings(SYNC_TOMBSTONE_RETAIN_DAYS=0):
+            self.feed(self.chv, watermark, expected_status=410)
+        # Issued before watermarks carried a horizon
+        legacy = encode_watermark({'deleted': 0})
+        self.feed(self.chv, legacy, expected_status=410)
+        self.feed(self.chv, 'not a watermark', expected_status=400)
@@ -3,10 +3,22 @@ from . import views
 
 urlpatterns = [
     path('patients/', views.PatientListCreateView.as_view(), name='patient-list-create'),
+    path('patients/search/', views.patient_search_view, name='patient-search'),
     path('patients/<int:pk>/', views.PatientDetailView.as_view(), name='patient-detail'),
     path('screenings/', views.ScreeningRecordListCreateView.as_view(), name='screeningrecord-list-create'),
     path('screenings/<int:pk>/', views.ScreeningRecordDetailView.as_view(), name='screeningrecord-detail'),
+    path('cytology/', views.cytology_upload_view, name='cytology-upload'),
     path('followups/', views.ScreeningFollowUpListCreateView.as_view(), name='screeningfollowup-list-create'),
+    path('followups/queue/', views.FollowUpQueueView.as_view(), name='followup-queue'),
+    path('followups/queue/lease/', views.follow_up_lease_view, name='followup-queue-lease'),
+    path('followups/<int:pk>/release/', views.follow_up_release_view, name='followup-release'),
+    path('outcomes/', views.outcome_cube_view, name='outcome-cube'),
+    path('export/', views.screening_export_view, name='screening-export'),
+    path('summary/', views.screening_summary_view, name='screening-summary'),
+    path('sync/', views.offline_sync_view, name='offline-sync'),
+    path('changes/', views.changes_feed_view, name='changes-feed'),
     # Add detail view for followups if needed
     path('predict-risk/', views.predict_risk_view, name='predict-risk'),
+    path('predict-risk/batch/', views.predict_risk_batch_view, name='predict-risk-batch'),
+    path('predict-risk/status/', views.risk_model_status_view, name='predict-risk-status'),
 ]
\ No newline at end of file
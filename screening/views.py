@@ -2,23 +2,47 @@
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Q, Count, Avg
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Count, Avg
 from django.utils import timezone
-from datetime import datetime, timedelta
-from .models import Patient, ScreeningRecord, ScreeningFollowUp, RiskFactorWeight
+from datetime import datetime
+from .models import Patient, ScreeningRecord, ScreeningFollowUp, RiskFactorWeight, ScreeningCounter
 from .serializers import (
-    PatientSerializer, PatientCreateSerializer, ScreeningRecordSerializer,
-    ScreeningRecordCreateSerializer, ScreeningFollowUpSerializer,
-    RiskFactorWeightSerializer, RiskPredictionInputSerializer,
-    RiskPredictionOutputSerializer, ScreeningSummarySerializer
+    PatientSerializer, PatientCreateSerializer, PatientSearchResultSerializer, ScreeningRecordSerializer,
+    ScreeningRecordListSerializer, ScreeningRecordSummarySerializer, CytologyImageSerializer, ScreeningRecordCreateSerializer, ScreeningFollowUpSerializer,
+    RiskFactorWeightSerializer, FollowUpQueueItemSerializer, RiskPredictionInputSerializer,
+    RiskPredictionBatchInputSerializer, RiskPredictionOutputSerializer, ScreeningSummarySerializer,
+    OfflineSyncSerializer, OutcomeCubeQuerySerializer
 )
 from .ai_service import risk_predictor
+from .batching import predict_risk, risk_batcher
+from .sync import OfflineSync
+from .results import auto_follow_up, prediction_fields, prediction_input
+from .changes import collect_changes
+from .search import search_patient_ids, search_patients
+from .pagination import KeysetPaginationMixin, FollowUpQueuePagination
+from .work_queue import queue_queryset, lease_follow_ups, release_follow_up
+from .counters import get_summary
+from .cube import CUBE_MEASURES, query_cube, query_screenings
+from .cytology import HashingTemporaryFileUploadHandler, store_upload
+from .export import export_rows, parse_filters, parquet_available, stream_csv, stream_parquet
 import logging
 
 logger = logging.getLogger(__name__)
 
-class PatientListCreateView(generics.ListCreateAPIView):
+class PatientListCreateView(KeysetPaginationMixin, generics.ListCreateAPIView):
+    """Patients, newest first.
+    
+    ?search= is answered from the patient search index. On SQLite and
+    Postgres it matches word prefixes of names and prefixes of the national
+    ID or phone number (Postgres also matches similar names), not arbitrary
+    substrings. At most PATIENT_SEARCH_MAX_RESULTS (500) best matches are
+    listed. Other databases keep substring matching.
+    """
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('-created_at', '-id')
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -33,21 +57,36 @@ class PatientListCreateView(generics.ListCreateAPIView):
         if user.user_type in ['CHV', 'CLINICIAN']:
             queryset = queryset.filter(registered_by=user)
         
-        # Search functionality
+        # Search functionality, answered from the patient search index
         search = self.request.query_params.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(national_id__icontains=search) |
-                Q(phone_number__icontains=search)
-            )
+            matches = search_patient_ids(search, user, settings.PATIENT_SEARCH_MAX_RESULTS)
+            queryset = queryset.filter(id__in=[pk for pk, _ in matches])
         
-        return queryset.order_by('-created_at')
+        return queryset.order_by('-created_at', '-id')
     
     def perform_create(self, serializer):
         serializer.save(registered_by=self.request.user)
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def patient_search_view(request):
+    """Top-k patient matches for the search box, ranked by relevance"""
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = int(request.query_params.get('limit', settings.PATIENT_SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, settings.PATIENT_SEARCH_MAX_RESULTS))
+    
+    patients = search_patients(query, request.user, limit)
+    return Response(
+        {'results': PatientSearchResultSerializer(patients, many=True).data},
+        status=status.HTTP_200_OK
+    )
+
 class PatientDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = PatientSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -58,17 +97,24 @@ class PatientDetailView(generics.RetrieveUpdateDestroyAPIView):
             return Patient.objects.filter(registered_by=user)
         return Patient.objects.all()
 
-class ScreeningRecordListCreateView(generics.ListCreateAPIView):
+class ScreeningRecordListCreateView(KeysetPaginationMixin, generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('-screening_date', '-id')
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return ScreeningRecordCreateSerializer
-        return ScreeningRecordSerializer
+        if self.request.query_params.get('view') == 'summary':
+            return ScreeningRecordSummarySerializer
+        return ScreeningRecordListSerializer
     
     def get_queryset(self):
         user = self.request.user
-        queryset = ScreeningRecord.objects.select_related('patient', 'screened_by')
+        if self.request.query_params.get('view') == 'summary':
+            queryset = ScreeningRecord.objects.select_related('patient', 'screened_by', 'cytology')
+        else:
+            # The full representation nests the screener's profile
+            queryset = ScreeningRecord.objects.select_related('patient', 'screened_by__profile', 'cytology')
         
         # Filter by user type
         if user.user_type in ['CHV', 'CLINICIAN']:
@@ -92,53 +138,29 @@ class ScreeningRecordListCreateView(generics.ListCreateAPIView):
         if end_date:
             queryset = queryset.filter(screening_date__lte=end_date)
         
-        return queryset.order_by('-screening_date')
+        return queryset.order_by('-screening_date', '-id')
     
     def perform_create(self, serializer):
-        # Get the validated data
-        validated_data = serializer.validated_data
-        
-        # Prepare data for AI prediction
-        patient = validated_data['patient']
-        prediction_data = {
-            'age': patient.age,
-            'age_at_first_intercourse': validated_data['age_at_first_intercourse'],
-            'number_of_sexual_partners': validated_data['number_of_sexual_partners'],
-            'parity': validated_data['parity'],
-            'hiv_status': validated_data['hiv_status'],
-            'hpv_vaccination_status': validated_data['hpv_vaccination_status'],
-            'contraceptive_use': validated_data['contraceptive_use'],
-            'smoking_status': validated_data['smoking_status'],
-            'family_history_cervical_cancer': validated_data['family_history_cervical_cancer'],
-            'previous_abnormal_pap': validated_data['previous_abnormal_pap'],
-            'via_result': validated_data.get('via_result'),
-            'bethesda_category': validated_data.get('bethesda_category'),
-        }
+        # Prepare data for AI prediction; an unsaved record fills in the model defaults,
+        # the same input offline sync gives the predictor
+        patient = serializer.validated_data['patient']
+        prediction_data = prediction_input(ScreeningRecord(**serializer.validated_data))
         
         # Get AI prediction
         try:
-            prediction = risk_predictor.predict(prediction_data)
+            prediction = predict_risk(prediction_data)
             
-            # Save screening record with AI results
-            screening_record = serializer.save(
-                screened_by=self.request.user,
-                ai_risk_score=prediction['risk_score'],
-                risk_level=prediction['risk_level'],
-                ai_confidence=prediction['confidence'],
-                recommended_action=prediction['recommended_action'],
-                referral_needed=prediction['referral_needed']
-            )
-            
-            # Create follow-up if needed
-            if prediction['follow_up_months'] <= 12:  # Create follow-up for <= 1 year
-                follow_up_date = timezone.now().date() + timedelta(
-                    days=prediction['follow_up_months'] * 30
-                )
-                ScreeningFollowUp.objects.create(
-                    screening_record=screening_record,
-                    follow_up_date=follow_up_date,
-                    status='PENDING'
+            # The record and its follow-up are saved together
+            with transaction.atomic():
+                # Save screening record with AI results
+                screening_record = serializer.save(
+                    screened_by=self.request.user, **prediction_fields(prediction)
                 )
+                
+                # Create follow-up if needed
+                follow_up = auto_follow_up(screening_record, prediction, timezone.now().date())
+                if follow_up is not None:
+                    follow_up.save()
             
             logger.info(f"Screening completed for patient {patient.id} with risk level {prediction['risk_level']}")
             
@@ -160,9 +182,158 @@ class ScreeningRecordDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     def get_queryset(self):
         user = self.request.user
+        queryset = ScreeningRecord.objects.select_related('patient', 'screened_by__profile', 'cytology')
         if user.user_type in ['CHV', 'CLINICIAN']:
-            return ScreeningRecord.objects.filter(screened_by=user)
-        return ScreeningRecord.objects.all()
+            return queryset.filter(screened_by=user)
+        return queryset
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def cytology_upload_view(request):
+    """Store a cytology slide photo; the thumbnail is generated in the background"""
+    # Stream to a temporary file and hash while receiving; must be set before request.data is read
+    upload_handler = HashingTemporaryFileUploadHandler(request._request)
+    request._request.upload_handlers = [upload_handler]
+    uploaded = request.FILES.get('image')
+    if upload_handler.too_large:
+        return Response(
+            {'error': f'image must be at most {settings.CYTOLOGY_MAX_UPLOAD_MB} MB'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if uploaded is None:
+        return Response({'error': 'image file is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    record = None
+    record_id = request.data.get('screening_record')
+    if record_id:
+        records = ScreeningRecord.objects.all()
+        if request.user.user_type in ['CHV', 'CLINICIAN']:
+            records = records.filter(screened_by=request.user)
+        record = records.filter(pk=record_id).first() if str(record_id).isdigit() else None
+        if record is None:
+            return Response({'error': 'Screening record not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        image, created = store_upload(uploaded, request.user)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if record is not None:
+        record.cytology = image
+        record.save(update_fields=['cytology', 'updated_at'])
+    
+    data = CytologyImageSerializer(image, context={'request': request}).data
+    data['created'] = created
+    return Response(data, status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def offline_sync_view(request):
+    """Bulk sync of patients, screenings and follow-ups captured offline"""
+    serializer = OfflineSyncSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    result = OfflineSync(
+        request.user,
+        serializer.validated_data.get('patients', []),
+        serializer.validated_data.get('screenings', []),
+        serializer.validated_data.get('follow_ups', []),
+    ).run()
+    
+    logger.info(
+        f"Offline sync by user {request.user.id}: "
+        f"{sum(item['created'] for item in result['patients'])} patients, "
+        f"{sum(item['created'] for item in result['screenings'])} screenings, "
+        f"{sum(item['created'] for item in result['follow_ups'])} follow-ups created"
+    )
+    return Response(result, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def screening_summary_view(request):
+    """Screening totals for the home screen, read from the summary counters"""
+    user = request.user
+    if user.user_type in ['CHV', 'CLINICIAN']:
+        summary = get_summary(ScreeningCounter.USER, str(user.id))
+    elif request.query_params.get('county'):
+        summary = get_summary(ScreeningCounter.COUNTY, request.query_params['county'])
+    else:
+        summary = get_summary(ScreeningCounter.GLOBAL)
+    
+    serializer = ScreeningSummarySerializer(summary)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def outcome_cube_view(request):
+    """Screening outcomes rolled up by any of county, sub-county, month, risk level, HIV status and age band.
+
+    Like the summary, CHVs and clinicians only see their own screenings.
+    """
+    user = request.user
+    if user.user_type == 'PATIENT':
+        return Response({'error': 'Not available to patients'}, status=status.HTTP_403_FORBIDDEN)
+    serializer = OutcomeCubeQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    group_by = serializer.validated_data.get('group_by', [])
+    
+    query = (
+        serializer.filters(),
+        serializer.validated_data.get('start_month'),
+        serializer.validated_data.get('end_month'),
+    )
+    if user.user_type in ['CHV', 'CLINICIAN']:
+        rows = query_screenings(ScreeningRecord.objects.filter(screened_by=user), group_by, *query)
+    else:
+        rows = query_cube(group_by, *query)
+    for row in rows:
+        if 'month' in row:
+            row['month'] = row['month'].strftime('%Y-%m')
+    return Response(
+        {'dimensions': group_by, 'measures': list(CUBE_MEASURES), 'results': rows},
+        status=status.HTTP_200_OK
+    )
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def screening_export_view(request):
+    """Stream screenings filtered by county, date range and risk level as CSV or Parquet"""
+    if request.user.user_type != 'ADMIN' and not request.user.is_staff:
+        return Response({'error': 'Only administrators can export screening data'}, status=status.HTTP_403_FORBIDDEN)
+    
+    # Not `format`, which DRF reserves for renderer selection
+    output = request.query_params.get('output', 'csv')
+    if output not in ('csv', 'parquet'):
+        return Response({'error': 'output must be csv or parquet'}, status=status.HTTP_400_BAD_REQUEST)
+    if output == 'parquet' and not parquet_available():
+        return Response({'error': 'Parquet export needs pyarrow installed'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        filters = parse_filters(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    chunk_size = settings.SCREENING_EXPORT_CHUNK_SIZE
+    rows = export_rows(filters, chunk_size)
+    if output == 'parquet':
+        response = StreamingHttpResponse(stream_parquet(rows, chunk_size), content_type='application/vnd.apache.parquet')
+    else:
+        response = StreamingHttpResponse(stream_csv(rows, chunk_size), content_type='text/csv')
+    filename = f"screenings_{timezone.localdate():%Y%m%d}.{output}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    logger.info(f"Screening export ({output}) by user {request.user.id} with filters {request.query_params.dict()}")
+    return response
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def changes_feed_view(request):
+    """Rows created, updated or deleted since the client's watermark"""
+    try:
+        limit = int(request.query_params.get('limit', settings.SYNC_CHANGES_PAGE_SIZE))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, settings.SYNC_CHANGES_MAX_PAGE_SIZE))
+    
+    result = collect_changes(request.user, request.query_params.get('since'), limit, request=request)
+    return Response(result, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -171,7 +342,7 @@ def predict_risk_view(request):
     serializer = RiskPredictionInputSerializer(data=request.data)
     if serializer.is_valid():
         try:
-            prediction = risk_predictor.predict(serializer.validated_data)
+            prediction = predict_risk(serializer.validated_data)
             output_serializer = RiskPredictionOutputSerializer(prediction)
             return Response(output_serializer.data, status=status.HTTP_200_OK)
         except Exception as e:
@@ -183,14 +354,42 @@ def predict_risk_view(request):
     else:
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ScreeningFollowUpListCreateView(generics.ListCreateAPIView):
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def predict_risk_batch_view(request):
+    """Batched AI risk prediction endpoint, results follow input order"""
+    serializer = RiskPredictionBatchInputSerializer(data=request.data)
+    if serializer.is_valid():
+        try:
+            predictions = risk_predictor.predict_batch(serializer.validated_data['screenings'])
+            output_serializer = RiskPredictionOutputSerializer(predictions, many=True)
+            return Response({'results': output_serializer.data}, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error in batch risk prediction: {e}")
+            return Response({
+                'error': 'Risk prediction failed',
+                'detail': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    else:
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def risk_model_status_view(request):
+    """Load state, timing and batching metrics for the AI risk model in this worker"""
+    stats = risk_predictor.stats()
+    stats['microbatch'] = risk_batcher.stats() if settings.RISK_PREDICTION_MICROBATCH else None
+    return Response(stats, status=status.HTTP_200_OK)
+
+class ScreeningFollowUpListCreateView(KeysetPaginationMixin, generics.ListCreateAPIView):
     serializer_class = ScreeningFollowUpSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('-follow_up_date', '-id')
     
     def get_queryset(self):
         user = self.request.user
         queryset = ScreeningFollowUp.objects.select_related(
-            'screening_record__patient', 'contacted_by'
+            'screening_record__patient', 'contacted_by__profile'
         )
         
         # Filter by user type
@@ -206,6 +405,41 @@ class ScreeningFollowUpListCreateView(generics.ListCreateAPIView):
         overdue_only = self.request.query_params.get('overdue_only', 'false')
         if overdue_only.lower() == 'true':
             queryset = queryset.filter(
-            follow_up_date__lt=timezone.now().date(),
-            status='PENDING'
-            )        
\ No newline at end of file
+                follow_up_date__lt=timezone.now().date(),
+                status='PENDING'
+            )
+        
+        return queryset.order_by('-follow_up_date', '-id')
+
+class FollowUpQueueView(generics.ListAPIView):
+    """Due and overdue follow-ups in call order: risk level, days overdue, then referral"""
+    serializer_class = FollowUpQueueItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = FollowUpQueuePagination
+    
+    def get_queryset(self):
+        return queue_queryset(self.request.user).select_related('screening_record__patient')
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def follow_up_lease_view(request):
+    """Reserve the next follow-ups in the queue for the calling user"""
+    try:
+        count = int(request.data.get('count', 1))
+    except (TypeError, ValueError):
+        return Response({'error': 'count must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    count = max(1, min(count, settings.FOLLOW_UP_MAX_LEASE_COUNT))
+    
+    follow_ups = lease_follow_ups(request.user, count)
+    return Response(
+        {'results': FollowUpQueueItemSerializer(follow_ups, many=True).data},
+        status=status.HTTP_200_OK
+    )
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def follow_up_release_view(request, pk):
+    """Return a leased follow-up to the queue"""
+    if not release_follow_up(request.user, pk):
+        return Response({'error': 'Follow-up is not leased to you'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,80 @@
+# screening/work_queue.py
+from datetime import timedelta
+from typing import List
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ScreeningFollowUp
+
+QUEUE_ORDERING = ('-priority', 'follow_up_date', '-referral_needed', 'id')
+
+
+def _lease_free(user, now):
+    """Follow-ups nobody holds, or held by this user"""
+    return Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now) | Q(leased_by=user)
+
+
+def queue_queryset(user, now=None):
+    """Due and overdue pending follow-ups the user may work on, in queue order"""
+    now = now or timezone.now()
+    queryset = ScreeningFollowUp.objects.filter(
+        status='PENDING',
+        follow_up_date__lte=timezone.localdate(now),
+    ).filter(_lease_free(user, now))
+    if user.user_type in ['CHV', 'CLINICIAN']:
+        queryset = queryset.filter(screening_record__screened_by=user)
+    return queryset.order_by(*QUEUE_ORDERING)
+
+
+def lease_follow_ups(user, count: int) -> List[ScreeningFollowUp]:
+    """Reserve the next `count` follow-ups in the queue for this user.
+
+    Candidates are locked with SKIP LOCKED where the database supports it,
+    so concurrent callers take different rows instead of waiting. The
+    conditional UPDATE re-checks the lease, so a follow-up is never handed
+    to two users even where row locks are unavailable.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(minutes=settings.FOLLOW_UP_LEASE_MINUTES)
+    with transaction.atomic():
+        candidates = queue_queryset(user, now)
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True, of=('self',))
+        ids = list(candidates.values_list('id', flat=True)[:count])
+        ScreeningFollowUp.objects.filter(id__in=ids).filter(_lease_free(user, now)).update(
+            leased_by=user, lease_expires_at=expires_at, updated_at=now
+        )
+    return list(
+        ScreeningFollowUp.objects.filter(id__in=ids, leased_by=user, lease_expires_at=expires_at)
+        .select_related('screening_record__patient')
+        .order_by(*QUEUE_ORDERING)
+    )
+
+
+def release_follow_up(user, pk) -> bool:
+    """Give up a lease held by this user; False if the user does not hold it"""
+    return bool(
+        ScreeningFollowUp.objects.filter(pk=pk, leased_by=user).update(
+            leased_by=None, lease_expires_at=None, updated_at=timezone.now()
+        )
+    )
+
+
+def update_priorities(record_results) -> None:
+    """Re-prioritise the follow-ups of screenings whose risk results changed.
+
+    record_results maps screening record id to its new (risk_level,
+    referral_needed); one UPDATE is issued per distinct pair.
+    """
+    by_key = {}
+    for record_id, (risk_level, referral_needed) in record_results.items():
+        key = (ScreeningFollowUp.priority_for(risk_level), bool(referral_needed))
+        by_key.setdefault(key, []).append(record_id)
+    now = timezone.now()
+    for (priority, referral_needed), record_ids in by_key.items():
+        ScreeningFollowUp.objects.filter(screening_record_id__in=record_ids).exclude(
+            priority=priority, referral_needed=referral_needed
+        ).update(priority=priority, referral_needed=referral_needed, updated_at=now)